@@ -1,4 +1,5 @@
 """Provide pre-made queries on top of the recorder component."""
+import asyncio
 from collections import defaultdict
 from datetime import datetime as dt, timedelta
 from itertools import groupby
@@ -12,19 +13,27 @@ from sqlalchemy import and_, bindparam, func, not_, or_
 from sqlalchemy.ext import baked
 import voluptuous as vol
 
-from homeassistant.components import recorder
+from homeassistant.components import recorder, websocket_api
 from homeassistant.components.http import HomeAssistantView
 from homeassistant.components.recorder.models import (
+    StateAttributes,
     States,
     process_timestamp,
     process_timestamp_to_utc_isoformat,
 )
+from homeassistant.components.recorder.statistics import (
+    PERIOD_5MINUTE,
+    PERIOD_HOUR,
+    statistics_during_period,
+)
 from homeassistant.components.recorder.util import execute, session_scope
 from homeassistant.const import (
     CONF_DOMAINS,
     CONF_ENTITIES,
     CONF_EXCLUDE,
     CONF_INCLUDE,
+    CONTENT_TYPE_JSON,
+    EVENT_STATE_CHANGED,
     HTTP_BAD_REQUEST,
 )
 from homeassistant.core import Context, State, split_entity_id
@@ -33,9 +42,12 @@ from homeassistant.helpers.entityfilter import (
     CONF_ENTITY_GLOBS,
     INCLUDE_EXCLUDE_BASE_FILTER_SCHEMA,
 )
+from homeassistant.helpers.json import json_bytes
 from homeassistant.helpers.typing import HomeAssistantType
 import homeassistant.util.dt as dt_util
 
+from .cache import RecentStatesCache
+
 # mypy: allow-untyped-defs, no-check-untyped-defs
 
 _LOGGER = logging.getLogger(__name__)
@@ -46,6 +58,11 @@ CONF_ORDER = "use_include_order"
 STATE_KEY = "state"
 LAST_CHANGED_KEY = "last_changed"
 
+# Rows fetched from the database at a time when streaming
+STREAM_YIELD_PER = 1000
+# Bytes of JSON buffered before they are written to the response
+STREAM_CHUNK_SIZE = 65536
+
 GLOB_TO_SQL_CHARS = {
     42: "%",  # *
     46: "_",  # .
@@ -80,11 +97,30 @@ QUERY_STATES = [
     States.entity_id,
     States.state,
     States.attributes,
+    StateAttributes.shared_attrs,
     States.last_changed,
     States.last_updated,
 ]
 
+# The columnar format only needs the state and when it changed
+QUERY_STATES_COLUMNAR = [
+    States.entity_id,
+    States.state,
+    States.last_changed,
+]
+
 HISTORY_BAKERY = "history_bakery"
+DATA_RECENT_STATES = "history_recent_states"
+
+# The number of recent states kept in memory for each entity
+RECENT_STATES_PER_ENTITY = 1024
+
+
+def _query_states(session):
+    """Query the state columns joined with their shared attributes."""
+    return session.query(*QUERY_STATES).outerjoin(
+        StateAttributes, States.attributes_id == StateAttributes.attributes_id
+    )
 
 
 def get_significant_states(hass, *args, **kwargs):
@@ -103,6 +139,7 @@ def _get_significant_states(
     include_start_time_state=True,
     significant_changes_only=True,
     minimal_response=False,
+    columnar=False,
 ):
     """
     Return states changes during UTC period start_time - end_time.
@@ -110,13 +147,60 @@ def _get_significant_states(
     Significant states are all states where there is a state change,
     as well as all states from certain domains (for instance
     thermostat so that we get current temperature in our graphs).
+
+    With columnar the states of each entity are returned as a dict
+    with parallel lists of states and their last changed timestamps.
     """
     timer_start = time.perf_counter()
 
-    baked_query = hass.data[HISTORY_BAKERY](
-        lambda session: session.query(*QUERY_STATES)
+    states = execute(
+        _significant_states_query(
+            hass,
+            session,
+            start_time,
+            end_time,
+            entity_ids,
+            filters,
+            significant_changes_only,
+            columnar,
+        )
+    )
+
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        elapsed = time.perf_counter() - timer_start
+        _LOGGER.debug("get_significant_states took %fs", elapsed)
+
+    return _sorted_states_to_json(
+        hass,
+        session,
+        states,
+        start_time,
+        entity_ids,
+        filters,
+        include_start_time_state,
+        minimal_response,
+        columnar,
     )
 
+
+def _significant_states_query(
+    hass,
+    session,
+    start_time,
+    end_time,
+    entity_ids,
+    filters,
+    significant_changes_only,
+    columnar=False,
+):
+    """Return the query for the significant states sorted by entity_id."""
+    if columnar:
+        baked_query = hass.data[HISTORY_BAKERY](
+            lambda session: session.query(*QUERY_STATES_COLUMNAR)
+        )
+    else:
+        baked_query = hass.data[HISTORY_BAKERY](lambda session: _query_states(session))
+
     if significant_changes_only:
         baked_query += lambda q: q.filter(
             (
@@ -142,34 +226,15 @@ def _get_significant_states(
 
     baked_query += lambda q: q.order_by(States.entity_id, States.last_updated)
 
-    states = execute(
-        baked_query(session).params(
-            start_time=start_time, end_time=end_time, entity_ids=entity_ids
-        )
-    )
-
-    if _LOGGER.isEnabledFor(logging.DEBUG):
-        elapsed = time.perf_counter() - timer_start
-        _LOGGER.debug("get_significant_states took %fs", elapsed)
-
-    return _sorted_states_to_json(
-        hass,
-        session,
-        states,
-        start_time,
-        entity_ids,
-        filters,
-        include_start_time_state,
-        minimal_response,
+    return baked_query(session).params(
+        start_time=start_time, end_time=end_time, entity_ids=entity_ids
     )
 
 
 def state_changes_during_period(hass, start_time, end_time=None, entity_id=None):
     """Return states changes during UTC period start_time - end_time."""
     with session_scope(hass=hass) as session:
-        baked_query = hass.data[HISTORY_BAKERY](
-            lambda session: session.query(*QUERY_STATES)
-        )
+        baked_query = hass.data[HISTORY_BAKERY](lambda session: _query_states(session))
 
         baked_query += lambda q: q.filter(
             (States.last_changed == States.last_updated)
@@ -182,7 +247,9 @@ def state_changes_during_period(hass, start_time, end_time=None, entity_id=None)
             )
 
         if entity_id is not None:
-            baked_query += lambda q: q.filter_by(entity_id=bindparam("entity_id"))
+            baked_query += lambda q: q.filter(
+                States.entity_id == bindparam("entity_id")
+            )
             entity_id = entity_id.lower()
 
         baked_query += lambda q: q.order_by(States.entity_id, States.last_updated)
@@ -203,13 +270,13 @@ def get_last_state_changes(hass, number_of_states, entity_id):
     start_time = dt_util.utcnow()
 
     with session_scope(hass=hass) as session:
-        baked_query = hass.data[HISTORY_BAKERY](
-            lambda session: session.query(*QUERY_STATES)
-        )
+        baked_query = hass.data[HISTORY_BAKERY](lambda session: _query_states(session))
         baked_query += lambda q: q.filter(States.last_changed == States.last_updated)
 
         if entity_id is not None:
-            baked_query += lambda q: q.filter_by(entity_id=bindparam("entity_id"))
+            baked_query += lambda q: q.filter(
+                States.entity_id == bindparam("entity_id")
+            )
             entity_id = entity_id.lower()
 
         baked_query += lambda q: q.order_by(
@@ -270,7 +337,7 @@ def _get_states_with_session(
     # We have more than one entity to look at (most commonly we want
     # all entities,) so we need to do a search on all states since the
     # last recorder run started.
-    query = session.query(*QUERY_STATES)
+    query = _query_states(session)
 
     most_recent_states_by_date = session.query(
         States.entity_id.label("max_entity_id"),
@@ -318,9 +385,7 @@ def _get_states_with_session(
 def _get_single_entity_states_with_session(hass, session, utc_point_in_time, entity_id):
     # Use an entirely different (and extremely fast) query if we only
     # have a single entity id
-    baked_query = hass.data[HISTORY_BAKERY](
-        lambda session: session.query(*QUERY_STATES)
-    )
+    baked_query = hass.data[HISTORY_BAKERY](lambda session: _query_states(session))
     baked_query += lambda q: q.filter(
         States.last_updated < bindparam("utc_point_in_time"),
         States.entity_id == bindparam("entity_id"),
@@ -344,6 +409,8 @@ def _sorted_states_to_json(
     filters=None,
     include_start_time_state=True,
     minimal_response=False,
+    columnar=False,
+    initial_states=None,
 ):
     """Convert SQL results into JSON friendly data structure.
 
@@ -354,7 +421,8 @@ def _sorted_states_to_json(
 
     We also need to go back and create a synthetic zero data point for
     each list of states, otherwise our graphs won't start on the Y
-    axis correctly.
+    axis correctly. Rows of these states can be passed as initial_states
+    when they are known already.
     """
     result = defaultdict(list)
     # Set all entity IDs to empty lists in result set to maintain the order
@@ -363,65 +431,169 @@ def _sorted_states_to_json(
             result[ent_id] = []
 
     # Get the states at the start time
-    timer_start = time.perf_counter()
     if include_start_time_state:
-        run = recorder.run_information_from_instance(hass, start_time)
-        for state in _get_states_with_session(
-            hass, session, start_time, entity_ids, run=run, filters=filters
-        ):
-            state.last_changed = start_time
-            state.last_updated = start_time
+        if initial_states is None:
+            start_time_states = _get_start_time_states(
+                hass, session, start_time, entity_ids, filters
+            )
+        else:
+            start_time_states = [LazyState(row) for row in initial_states]
+            for state in start_time_states:
+                state.last_changed = start_time
+                state.last_updated = start_time
+        for state in start_time_states:
             result[state.entity_id].append(state)
 
+    if columnar:
+        changes = {}
+        for ent_id, group in groupby(states, lambda state: state.entity_id):
+            changes[ent_id] = list(group)
+            result.setdefault(ent_id, [])
+        return {
+            ent_id: _entity_states_to_columnar(
+                hass, ent_id, ent_states, changes.get(ent_id, ())
+            )
+            for ent_id, ent_states in result.items()
+            if ent_states or ent_id in changes
+        }
+
+    # Append all changes to it
+    for ent_id, group in groupby(states, lambda state: state.entity_id):
+        _entity_states_to_json(result[ent_id], ent_id, group, minimal_response)
+
+    # Filter out the empty lists if some states had 0 results.
+    return {key: val for key, val in result.items() if val}
+
+
+def _iter_sorted_states_json(
+    hass,
+    session,
+    states,
+    start_time,
+    entity_ids,
+    filters=None,
+    include_start_time_state=True,
+    minimal_response=False,
+    columnar=False,
+):
+    """Yield the JSON friendly states of one entity at a time.
+
+    Works like _sorted_states_to_json, except that the states can be
+    consumed while they are fetched from the database. The entities
+    with changes come in the order of the database, the entities
+    that only have a state at the start time follow sorted by their
+    entity_id. The collation of the database does not always sort
+    entity_ids like Python, so the two are not merged.
+    """
+    initial_states = {}
+    if include_start_time_state:
+        for state in _get_start_time_states(
+            hass, session, start_time, entity_ids, filters
+        ):
+            initial_states[state.entity_id] = [state]
+
+    for ent_id, group in groupby(states, lambda state: state.entity_id):
+        ent_results = initial_states.pop(ent_id, [])
+        if columnar:
+            yield _entity_states_to_columnar(hass, ent_id, ent_results, group)
+            continue
+        _entity_states_to_json(ent_results, ent_id, group, minimal_response)
+        yield ent_results
+
+    # Entities without changes
+    for ent_id in sorted(initial_states):
+        if columnar:
+            yield _entity_states_to_columnar(hass, ent_id, initial_states[ent_id], ())
+        else:
+            yield initial_states[ent_id]
+
+
+def _get_start_time_states(hass, session, start_time, entity_ids, filters):
+    """Return the states at the start time as the first datapoints."""
+    timer_start = time.perf_counter()
+    run = recorder.run_information_from_instance(hass, start_time)
+    states = _get_states_with_session(
+        hass, session, start_time, entity_ids, run=run, filters=filters
+    )
+    for state in states:
+        state.last_changed = start_time
+        state.last_updated = start_time
+
     if _LOGGER.isEnabledFor(logging.DEBUG):
         elapsed = time.perf_counter() - timer_start
-        _LOGGER.debug("getting %d first datapoints took %fs", len(result), elapsed)
+        _LOGGER.debug("getting %d first datapoints took %fs", len(states), elapsed)
+
+    return states
+
 
+def _entity_states_to_columnar(hass, ent_id, ent_states, group):
+    """Return the states of an entity as parallel lists.
+
+    The attributes are only included once, from the current state.
+    Consecutive rows with the same state are left out.
+    """
+    states = []
+    last_changed = []
+    for state in ent_states:
+        states.append(state.state)
+        last_changed.append(state.last_changed.timestamp())
+
+    for db_state in group:
+        if states and db_state.state == states[-1]:
+            continue
+        states.append(db_state.state)
+        last_changed.append(process_timestamp(db_state.last_changed).timestamp())
+
+    current_state = hass.states.get(ent_id)
+    return {
+        "entity_id": ent_id,
+        "attributes": dict(current_state.attributes) if current_state else {},
+        STATE_KEY: states,
+        LAST_CHANGED_KEY: last_changed,
+    }
+
+
+def _entity_states_to_json(ent_results, ent_id, group, minimal_response):
+    """Append the states of an entity, sorted by last_updated, to ent_results."""
     # Called in a tight loop so cache the function
     # here
     _process_timestamp_to_utc_isoformat = process_timestamp_to_utc_isoformat
 
-    # Append all changes to it
-    for ent_id, group in groupby(states, lambda state: state.entity_id):
-        domain = split_entity_id(ent_id)[0]
-        ent_results = result[ent_id]
-        if not minimal_response or domain in NEED_ATTRIBUTE_DOMAINS:
-            ent_results.extend(LazyState(db_state) for db_state in group)
-
-        # With minimal response we only provide a native
-        # State for the first and last response. All the states
-        # in-between only provide the "state" and the
-        # "last_changed".
-        if not ent_results:
-            ent_results.append(LazyState(next(group)))
-
-        prev_state = ent_results[-1]
-        initial_state_count = len(ent_results)
-
-        for db_state in group:
-            # With minimal response we do not care about attribute
-            # changes so we can filter out duplicate states
-            if db_state.state == prev_state.state:
-                continue
-
-            ent_results.append(
-                {
-                    STATE_KEY: db_state.state,
-                    LAST_CHANGED_KEY: _process_timestamp_to_utc_isoformat(
-                        db_state.last_changed
-                    ),
-                }
-            )
-            prev_state = db_state
-
-        if prev_state and len(ent_results) != initial_state_count:
-            # There was at least one state change
-            # replace the last minimal state with
-            # a full state
-            ent_results[-1] = LazyState(prev_state)
+    domain = split_entity_id(ent_id)[0]
+    if not minimal_response or domain in NEED_ATTRIBUTE_DOMAINS:
+        ent_results.extend(LazyState(db_state) for db_state in group)
+
+    # With minimal response we only provide a native
+    # State for the first and last response. All the states
+    # in-between only provide the "state" and the
+    # "last_changed".
+    if not ent_results:
+        ent_results.append(LazyState(next(group)))
+
+    prev_state = ent_results[-1]
+    initial_state_count = len(ent_results)
+
+    for db_state in group:
+        # With minimal response we do not care about attribute
+        # changes so we can filter out duplicate states
+        if db_state.state == prev_state.state:
+            continue
+
+        ent_results.append(
+            {
+                STATE_KEY: db_state.state,
+                LAST_CHANGED_KEY: _process_timestamp_to_utc_isoformat(
+                    db_state.last_changed
+                ),
+            }
+        )
+        prev_state = db_state
 
-    # Filter out the empty lists if some states had 0 results.
-    return {key: val for key, val in result.items() if val}
+    if prev_state and len(ent_results) != initial_state_count:
+        # There was at least one state change
+        # replace the last minimal state with
+        # a full state
+        ent_results[-1] = LazyState(prev_state)
 
 
 def get_state(hass, utc_point_in_time, entity_id, run=None):
@@ -440,14 +612,62 @@ async def async_setup(hass, config):
 
     use_include_order = conf.get(CONF_ORDER)
 
+    instance = hass.data.get(recorder.DATA_INSTANCE)
+    if instance is not None and EVENT_STATE_CHANGED not in instance.exclude_t:
+        # Only keep the states the recorder stores
+        recent_states = hass.data[DATA_RECENT_STATES] = RecentStatesCache(
+            hass, instance.entity_filter, RECENT_STATES_PER_ENTITY
+        )
+        recent_states.async_setup()
+
     hass.http.register_view(HistoryPeriodView(filters, use_include_order))
     hass.components.frontend.async_register_built_in_panel(
         "history", "history", "hass:poll-box"
     )
+    websocket_api.async_register_command(hass, ws_get_statistics_during_period)
 
     return True
 
 
+@websocket_api.async_response
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "history/statistics_during_period",
+        vol.Required("start_time"): str,
+        vol.Optional("end_time"): str,
+        vol.Optional("statistic_ids"): [str],
+        vol.Optional("period", default=PERIOD_HOUR): vol.In(
+            (PERIOD_5MINUTE, PERIOD_HOUR)
+        ),
+    }
+)
+async def ws_get_statistics_during_period(hass, connection, msg):
+    """Handle statistics websocket command."""
+    start_time = dt_util.parse_datetime(msg["start_time"])
+    if start_time is None:
+        connection.send_error(msg["id"], "invalid_start_time", "Invalid start_time")
+        return
+    start_time = dt_util.as_utc(start_time)
+
+    end_time = None
+    if "end_time" in msg:
+        end_time = dt_util.parse_datetime(msg["end_time"])
+        if end_time is None:
+            connection.send_error(msg["id"], "invalid_end_time", "Invalid end_time")
+            return
+        end_time = dt_util.as_utc(end_time)
+
+    statistics = await hass.async_add_executor_job(
+        statistics_during_period,
+        hass,
+        start_time,
+        end_time,
+        msg.get("statistic_ids"),
+        msg["period"],
+    )
+    connection.send_result(msg["id"], statistics)
+
+
 class HistoryPeriodView(HomeAssistantView):
     """Handle history period requests."""
 
@@ -501,6 +721,12 @@ class HistoryPeriodView(HomeAssistantView):
         )
 
         minimal_response = "minimal_response" in request.query
+        columnar = "columnar" in request.query
+        # The streamed entities are sorted by entity_id, which
+        # would not respect the configured include order
+        stream = "stream" in request.query and not (
+            self.filters and self.use_include_order
+        )
 
         hass = request.app["hass"]
 
@@ -511,6 +737,36 @@ class HistoryPeriodView(HomeAssistantView):
         ):
             return self.json([])
 
+        recent_states = None
+        if entity_ids and not stream and DATA_RECENT_STATES in hass.data:
+            recent_states = hass.data[DATA_RECENT_STATES].async_get_states(
+                start_time,
+                end_time,
+                entity_ids,
+                SIGNIFICANT_DOMAINS,
+                significant_changes_only,
+            )
+
+        if stream:
+            response = web.StreamResponse()
+            response.content_type = CONTENT_TYPE_JSON
+            response.enable_compression()
+            await response.prepare(request)
+            await hass.async_add_executor_job(
+                self._stream_significant_states_json,
+                hass,
+                response,
+                start_time,
+                end_time,
+                entity_ids,
+                include_start_time_state,
+                significant_changes_only,
+                minimal_response,
+                columnar,
+            )
+            await response.write_eof()
+            return response
+
         return cast(
             web.Response,
             await hass.async_add_executor_job(
@@ -522,6 +778,8 @@ class HistoryPeriodView(HomeAssistantView):
                 include_start_time_state,
                 significant_changes_only,
                 minimal_response,
+                columnar,
+                recent_states,
             ),
         )
 
@@ -534,27 +792,56 @@ class HistoryPeriodView(HomeAssistantView):
         include_start_time_state,
         significant_changes_only,
         minimal_response,
+        columnar,
+        recent_states=None,
     ):
-        """Fetch significant stats from the database as json."""
+        """Fetch significant stats from the database as json.
+
+        The states can be passed as recent_states when they are
+        in the recent states cache.
+        """
         timer_start = time.perf_counter()
 
-        with session_scope(hass=hass) as session:
-            result = _get_significant_states(
+        if recent_states is not None:
+            initial_states, states = recent_states
+            result = _sorted_states_to_json(
                 hass,
-                session,
+                None,
+                states,
                 start_time,
-                end_time,
                 entity_ids,
                 self.filters,
                 include_start_time_state,
-                significant_changes_only,
                 minimal_response,
+                columnar,
+                initial_states,
             )
+        else:
+            with session_scope(hass=hass) as session:
+                result = _get_significant_states(
+                    hass,
+                    session,
+                    start_time,
+                    end_time,
+                    entity_ids,
+                    self.filters,
+                    include_start_time_state,
+                    significant_changes_only,
+                    minimal_response,
+                    columnar,
+                )
 
         result = list(result.values())
         if _LOGGER.isEnabledFor(logging.DEBUG):
             elapsed = time.perf_counter() - timer_start
-            _LOGGER.debug("Extracted %d states in %fs", sum(map(len, result)), elapsed)
+            _LOGGER.debug(
+                "Extracted %d states in %fs",
+                sum(
+                    len(ent_results[STATE_KEY] if columnar else ent_results)
+                    for ent_results in result
+                ),
+                elapsed,
+            )
 
         # Optionally reorder the result to respect the ordering given
         # by any entities explicitly included in the configuration.
@@ -562,7 +849,7 @@ class HistoryPeriodView(HomeAssistantView):
             sorted_result = []
             for order_entity in self.filters.included_entities:
                 for state_list in result:
-                    if state_list[0].entity_id == order_entity:
+                    if _result_entity_id(state_list) == order_entity:
                         sorted_result.append(state_list)
                         result.remove(state_list)
                         break
@@ -571,6 +858,80 @@ class HistoryPeriodView(HomeAssistantView):
 
         return self.json(result)
 
+    def _stream_significant_states_json(
+        self,
+        hass,
+        response,
+        start_time,
+        end_time,
+        entity_ids,
+        include_start_time_state,
+        significant_changes_only,
+        minimal_response,
+        columnar,
+    ):
+        """Stream significant states from the database as json.
+
+        The rows are fetched in batches and the states are written
+        to the response one entity at a time, so the memory use
+        does not depend on the length of the period.
+        """
+        timer_start = time.perf_counter()
+        chunk = [b"["]
+        chunk_size = 0
+        count = 0
+
+        def write(data):
+            asyncio.run_coroutine_threadsafe(response.write(data), hass.loop).result()
+
+        with session_scope(hass=hass) as session:
+            query = _significant_states_query(
+                hass,
+                session,
+                start_time,
+                end_time,
+                entity_ids,
+                self.filters,
+                significant_changes_only,
+                columnar,
+            ).with_post_criteria(lambda q: q.yield_per(STREAM_YIELD_PER))
+
+            for ent_results in _iter_sorted_states_json(
+                hass,
+                session,
+                query,
+                start_time,
+                entity_ids,
+                self.filters,
+                include_start_time_state,
+                minimal_response,
+                columnar,
+            ):
+                if count:
+                    chunk.append(b",")
+                data = json_bytes(ent_results)
+                chunk.append(data)
+                chunk_size += len(data)
+                count += len(ent_results[STATE_KEY] if columnar else ent_results)
+                if chunk_size >= STREAM_CHUNK_SIZE:
+                    write(b"".join(chunk))
+                    chunk = []
+                    chunk_size = 0
+
+        chunk.append(b"]")
+        write(b"".join(chunk))
+
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            elapsed = time.perf_counter() - timer_start
+            _LOGGER.debug("Streamed %d states in %fs", count, elapsed)
+
+
+def _result_entity_id(ent_results):
+    """Return the entity_id of the states of an entity in a result."""
+    if isinstance(ent_results, dict):
+        return ent_results["entity_id"]
+    return ent_results[0].entity_id
+
 
 def sqlalchemy_filter_from_include_exclude_conf(conf):
     """Build a sql filter from config."""
@@ -709,8 +1070,13 @@ class LazyState(State):
     def attributes(self):
         """State attributes."""
         if not self._attributes:
+            attributes = self._row.shared_attrs or self._row.attributes
+            if not isinstance(attributes, str):
+                # Rows of the recent states cache are not serialized
+                self._attributes = attributes
+                return attributes
             try:
-                self._attributes = json.loads(self._row.attributes)
+                self._attributes = json.loads(attributes)
             except ValueError:
                 # When json.loads fails
                 _LOGGER.exception("Error converting row to state: %s", self)
@@ -0,0 +1,135 @@
+"""Keep the recent states of each entity in memory."""
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, State, callback, split_entity_id
+
+
+class CachedStateRow:
+    """A recent state in the shape of a states table row."""
+
+    __slots__ = ["entity_id", "state", "attributes", "last_changed", "last_updated"]
+
+    shared_attrs = None
+
+    def __init__(
+        self,
+        entity_id: str,
+        state: Optional[str],
+        attributes: Mapping,
+        last_changed: datetime,
+        last_updated: datetime,
+    ) -> None:
+        """Initialize the row."""
+        self.entity_id = entity_id
+        self.state = state
+        # The attributes are kept decoded, unlike the stored rows
+        self.attributes = attributes
+        self.last_changed = last_changed
+        self.last_updated = last_updated
+
+    @classmethod
+    def from_state(cls, state: State) -> "CachedStateRow":
+        """Create a row from a state."""
+        return cls(
+            state.entity_id,
+            state.state,
+            state.attributes,
+            state.last_changed,
+            state.last_updated,
+        )
+
+
+class RecentStatesCache:
+    """Answer history requests for recent periods without the database.
+
+    Every state change is kept in a bounded deque per entity. A period
+    can be answered once the oldest kept state of each requested entity
+    is older than its start, otherwise the database has to be used.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entity_filter: Callable[[str], bool],
+        max_states: int,
+    ) -> None:
+        """Initialize the cache."""
+        self.hass = hass
+        self._entity_filter = entity_filter
+        self._max_states = max_states
+        self._states: Dict[str, Deque[CachedStateRow]] = {}
+
+    @callback
+    def async_setup(self) -> None:
+        """Start with the current states and follow their changes."""
+        for state in self.hass.states.async_all():
+            self._async_add(CachedStateRow.from_state(state))
+        self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Add a changed state."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+        if new_state is not None:
+            self._async_add(CachedStateRow.from_state(new_state))
+        else:
+            # The recorder stores a removed entity as a state without value
+            self._async_add(
+                CachedStateRow(entity_id, None, {}, event.time_fired, event.time_fired)
+            )
+
+    @callback
+    def _async_add(self, row: CachedStateRow) -> None:
+        """Add a state row of an entity."""
+        if not self._entity_filter(row.entity_id):
+            return
+        states = self._states.get(row.entity_id)
+        if states is None:
+            states = self._states[row.entity_id] = deque(maxlen=self._max_states)
+        states.append(row)
+
+    @callback
+    def async_get_states(
+        self,
+        start_time: datetime,
+        end_time: Optional[datetime],
+        entity_ids: Iterable[str],
+        significant_domains: Iterable[str],
+        significant_changes_only: bool = True,
+    ) -> Optional[Tuple[List[CachedStateRow], List[CachedStateRow]]]:
+        """Return the states at start_time and the changes during the period.
+
+        Returns None when a state at start_time is not in the cache.
+        """
+        initial_states = []
+        changes = []
+
+        for entity_id in entity_ids:
+            states = self._states.get(entity_id)
+            if not states or states[0].last_updated >= start_time:
+                return None
+
+            significant = split_entity_id(entity_id)[0] in significant_domains
+            initial_state = states[0]
+            for row in states:
+                if row.last_updated < start_time:
+                    initial_state = row
+                    continue
+                if end_time is not None and row.last_updated >= end_time:
+                    break
+                if row.last_updated == start_time:
+                    continue
+                if (
+                    significant_changes_only
+                    and not significant
+                    and row.last_changed != row.last_updated
+                ):
+                    continue
+                changes.append(row)
+            initial_states.append(initial_state)
+
+        return initial_states, changes
@@ -1,5 +1,8 @@
 """Offer numeric state listening automation rules."""
+from bisect import bisect_left, bisect_right
+from itertools import count
 import logging
+from typing import Callable, Dict, List, Optional, Tuple
 
 import voluptuous as vol
 
@@ -12,8 +15,10 @@ from homeassistant.const import (
     CONF_FOR,
     CONF_PLATFORM,
     CONF_VALUE_TEMPLATE,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
 )
-from homeassistant.core import CALLBACK_TYPE, HassJob, callback
+from homeassistant.core import CALLBACK_TYPE, Event, HassJob, State, callback
 from homeassistant.helpers import condition, config_validation as cv, template
 from homeassistant.helpers.event import (
     async_track_same_state,
@@ -58,6 +63,262 @@ TRIGGER_SCHEMA = vol.All(
 
 _LOGGER = logging.getLogger(__name__)
 
+DATA_THRESHOLD_INDEX = "numeric_state_threshold_index"
+
+
+class _Threshold:
+    """The above and below boundaries of a trigger for an entity."""
+
+    __slots__ = ["above", "below", "action", "order", "matching"]
+
+    def __init__(
+        self,
+        above: Optional[float],
+        below: Optional[float],
+        action: Callable[[Event, bool], Optional[bool]],
+        order: int,
+    ) -> None:
+        """Initialize the threshold."""
+        self.above = above
+        self.below = below
+        self.action = action
+        self.order = order
+        # Unknown until the first state change, which is always handled
+        self.matching: Optional[bool] = None
+
+    def matches(self, value: Optional[float]) -> bool:
+        """Return if the value is between the boundaries."""
+        return (
+            value is not None
+            and (self.above is None or value > self.above)
+            and (self.below is None or value < self.below)
+        )
+
+
+class _EntityThresholds:
+    """The thresholds of the triggers on the value of an entity.
+
+    The above and below boundaries are kept sorted, so the thresholds a
+    change of the value crosses are found by bisecting between the old
+    and the new value.
+    """
+
+    def __init__(self, attribute: Optional[str]) -> None:
+        """Initialize the thresholds."""
+        self.attribute = attribute
+        self.value: Optional[float] = None
+        self.thresholds: Dict[_Threshold, None] = {}
+        self._unknown: Dict[_Threshold, None] = {}
+        self._above_values: List[float] = []
+        self._above: List[_Threshold] = []
+        self._below_values: List[float] = []
+        self._below: List[_Threshold] = []
+
+    @callback
+    def async_add(self, threshold: _Threshold) -> None:
+        """Add a threshold."""
+        self.thresholds[threshold] = None
+        self._unknown[threshold] = None
+        if threshold.above is not None:
+            _insert(self._above_values, self._above, threshold.above, threshold)
+        if threshold.below is not None:
+            _insert(self._below_values, self._below, threshold.below, threshold)
+
+    @callback
+    def async_remove(self, threshold: _Threshold) -> None:
+        """Remove a threshold."""
+        del self.thresholds[threshold]
+        self._unknown.pop(threshold, None)
+        if threshold.above is not None:
+            _remove(self._above_values, self._above, threshold.above, threshold)
+        if threshold.below is not None:
+            _remove(self._below_values, self._below, threshold.below, threshold)
+
+    @callback
+    def async_update(self, state: Optional[State]) -> List[Tuple[_Threshold, bool]]:
+        """Set the new value and return the thresholds it changed."""
+        old_value = self.value
+        value = self.value = _numeric_value(state, self.attribute)
+
+        if old_value is None or value is None:
+            candidates = list(self.thresholds)
+        else:
+            low, high = min(old_value, value), max(old_value, value)
+            # value > above changes when above is in [low, high)
+            candidates = self._above[
+                bisect_left(self._above_values, low) : bisect_left(
+                    self._above_values, high
+                )
+            ]
+            # value < below changes when below is in (low, high]
+            candidates.extend(
+                self._below[
+                    bisect_right(self._below_values, low) : bisect_right(
+                        self._below_values, high
+                    )
+                ]
+            )
+            candidates.extend(self._unknown)
+        self._unknown.clear()
+
+        changed = []
+        for threshold in candidates:
+            matching = threshold.matches(value)
+            if matching != threshold.matching:
+                threshold.matching = matching
+                changed.append((threshold, matching))
+        return changed
+
+    @callback
+    def async_reset(self, threshold: _Threshold) -> None:
+        """Handle the next state change for the threshold like the first one."""
+        if threshold in self.thresholds:
+            threshold.matching = None
+            self._unknown[threshold] = None
+
+
+def _insert(
+    values: List[float],
+    thresholds: List[_Threshold],
+    value: float,
+    threshold: _Threshold,
+) -> None:
+    """Insert a threshold after the ones with the same boundary."""
+    index = bisect_right(values, value)
+    values.insert(index, value)
+    thresholds.insert(index, threshold)
+
+
+def _remove(
+    values: List[float],
+    thresholds: List[_Threshold],
+    value: float,
+    threshold: _Threshold,
+) -> None:
+    """Remove a threshold from the ones with the same boundary."""
+    index = bisect_left(values, value)
+    while thresholds[index] is not threshold:
+        index += 1
+    del values[index]
+    del thresholds[index]
+
+
+def _numeric_value(state: Optional[State], attribute: Optional[str]) -> Optional[float]:
+    """Return the value of the state or its attribute as a number."""
+    if state is None:
+        return None
+
+    if attribute is None:
+        value = state.state
+    elif attribute in state.attributes:
+        value = state.attributes[attribute]
+    else:
+        return None
+
+    if value in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        _LOGGER.warning(
+            "Value cannot be processed as a number: %s (Offending entity: %s)",
+            state,
+            value,
+        )
+        return None
+
+
+class _ThresholdIndex:
+    """Share the state listener and value of an entity between triggers.
+
+    The new state of an entity is converted once per attribute and only
+    the triggers whose boundaries it crossed are called.
+    """
+
+    def __init__(self, hass) -> None:
+        """Initialize the index."""
+        self.hass = hass
+        self._entities: Dict[str, Dict[Optional[str], _EntityThresholds]] = {}
+        self._unsubs: Dict[str, CALLBACK_TYPE] = {}
+        self._order = count()
+
+    @callback
+    def async_add(
+        self,
+        entity_id: str,
+        attribute: Optional[str],
+        above: Optional[float],
+        below: Optional[float],
+        action: Callable[[Event, bool], Optional[bool]],
+    ) -> CALLBACK_TYPE:
+        """Call action when the value of the entity crosses a boundary.
+
+        When action returns False the threshold is considered crossed
+        again by the next state change.
+        """
+        attributes = self._entities.get(entity_id)
+        if attributes is None:
+            attributes = self._entities[entity_id] = {}
+            self._unsubs[entity_id] = async_track_state_change_event(
+                self.hass, entity_id, self._async_state_changed
+            )
+        thresholds = attributes.get(attribute)
+        if thresholds is None:
+            thresholds = attributes[attribute] = _EntityThresholds(attribute)
+
+        threshold = _Threshold(above, below, action, next(self._order))
+        thresholds.async_add(threshold)
+
+        @callback
+        def async_remove() -> None:
+            """Remove the threshold."""
+            thresholds.async_remove(threshold)
+            if thresholds.thresholds:
+                return
+            del attributes[attribute]
+            if not attributes:
+                del self._entities[entity_id]
+                self._unsubs.pop(entity_id)()
+
+        return async_remove
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Call the actions of the thresholds the new state crossed."""
+        attributes = self._entities.get(event.data["entity_id"])
+        if attributes is None:
+            # All triggers of the entity were removed during the dispatch
+            return
+
+        new_state = event.data.get("new_state")
+        changed = [
+            (thresholds, threshold, matching)
+            for thresholds in attributes.values()
+            for threshold, matching in thresholds.async_update(new_state)
+        ]
+        changed.sort(key=lambda item: item[1].order)
+        for thresholds, threshold, matching in changed:
+            try:
+                crossed = threshold.action(event, matching)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception(
+                    "Error while processing numeric state change for %s",
+                    event.data["entity_id"],
+                )
+                continue
+            if crossed is False:
+                thresholds.async_reset(threshold)
+
+
+@callback
+def _threshold_index(hass) -> _ThresholdIndex:
+    """Return the threshold index of hass."""
+    index = hass.data.get(DATA_THRESHOLD_INDEX)
+    if index is None:
+        index = hass.data[DATA_THRESHOLD_INDEX] = _ThresholdIndex(hass)
+    return index
+
 
 async def async_attach_trigger(
     hass, config, action, automation_info, *, platform_type="numeric_state"
@@ -101,8 +362,11 @@ async def async_attach_trigger(
         )
 
     @callback
-    def state_automation_listener(event):
-        """Listen for state changes and calls action."""
+    def state_automation_listener(event, matching):
+        """Handle a state change that changed if the criteria are met.
+
+        Returns False when the state change has to be handled again.
+        """
         entity_id = event.data.get("entity_id")
         from_s = event.data.get("old_state")
         to_s = event.data.get("new_state")
@@ -127,8 +391,6 @@ async def async_attach_trigger(
                 to_s.context,
             )
 
-        matching = check_numeric_state(entity_id, from_s, to_s)
-
         if not matching:
             entities_triggered.discard(entity_id)
         elif entity_id not in entities_triggered:
@@ -146,7 +408,7 @@ async def async_attach_trigger(
                         ex,
                     )
                     entities_triggered.discard(entity_id)
-                    return
+                    return False
 
                 unsub_track_same[entity_id] = async_track_same_state(
                     hass,
@@ -158,12 +420,38 @@ async def async_attach_trigger(
             else:
                 call_action()
 
-    unsub = async_track_state_change_event(hass, entity_ids, state_automation_listener)
+    if value_template is None:
+        # The value of each entity is converted once for all triggers
+        index = _threshold_index(hass)
+        unsubs = [
+            index.async_add(
+                entity_id, attribute, above, below, state_automation_listener
+            )
+            for entity_id in entity_ids
+        ]
+    else:
+
+        @callback
+        def state_template_listener(event):
+            """Render the value template of the new state."""
+            state_automation_listener(
+                event,
+                check_numeric_state(
+                    event.data.get("entity_id"),
+                    event.data.get("old_state"),
+                    event.data.get("new_state"),
+                ),
+            )
+
+        unsubs = [
+            async_track_state_change_event(hass, entity_ids, state_template_listener)
+        ]
 
     @callback
     def async_remove():
         """Remove state listeners async."""
-        unsub()
+        for unsub in unsubs:
+            unsub()
         for async_remove in unsub_track_same.values():
             async_remove()
         unsub_track_same.clear()
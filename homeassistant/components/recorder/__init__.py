@@ -1,6 +1,6 @@
 """Support for recording details."""
 import asyncio
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 import concurrent.futures
 from datetime import datetime
 import logging
@@ -9,7 +9,14 @@ import threading
 import time
 from typing import Any, Callable, List, Optional
 
-from sqlalchemy import create_engine, event as sqlalchemy_event, exc, select
+from sqlalchemy import (
+    create_engine,
+    event as sqlalchemy_event,
+    exc,
+    func,
+    insert,
+    select,
+)
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.pool import StaticPool
 import voluptuous as vol
@@ -17,6 +24,7 @@ import voluptuous as vol
 from homeassistant.components import persistent_notification
 from homeassistant.const import (
     ATTR_ENTITY_ID,
+    ATTR_NOW,
     CONF_EXCLUDE,
     EVENT_HOMEASSISTANT_START,
     EVENT_HOMEASSISTANT_STOP,
@@ -24,7 +32,7 @@ from homeassistant.const import (
     EVENT_TIME_CHANGED,
     MATCH_ALL,
 )
-from homeassistant.core import CoreState, HomeAssistant, callback
+from homeassistant.core import CoreState, Event, HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.entityfilter import (
     INCLUDE_EXCLUDE_BASE_FILTER_SCHEMA,
@@ -34,9 +42,19 @@ from homeassistant.helpers.entityfilter import (
 from homeassistant.helpers.typing import ConfigType
 import homeassistant.util.dt as dt_util
 
-from . import migration, purge
-from .const import CONF_DB_INTEGRITY_CHECK, DATA_INSTANCE, DOMAIN, SQLITE_URL_PREFIX
-from .models import Base, Events, RecorderRuns, States
+from . import migration, purge, statistics, websocket_api
+from .const import (
+    CONF_DB_INTEGRITY_CHECK,
+    DATA_INSTANCE,
+    DOMAIN,
+    MAX_ROWS_PER_INSERT,
+    OVERLOAD_POLICY_DROP_ALL,
+    OVERLOAD_POLICY_DROP_LOW_PRIORITY,
+    SQLITE_AUTO_VACUUM_INCREMENTAL,
+    SQLITE_MAX_BIND_VARS,
+    SQLITE_URL_PREFIX,
+)
+from .models import Base, Events, RecorderRuns, StateAttributes, States
 from .util import session_scope, validate_or_move_away_sqlite_database
 
 _LOGGER = logging.getLogger(__name__)
@@ -59,11 +77,15 @@ DEFAULT_DB_INTEGRITY_CHECK = True
 DEFAULT_DB_MAX_RETRIES = 10
 DEFAULT_DB_RETRY_WAIT = 3
 DEFAULT_COMMIT_INTERVAL = 1
+DEFAULT_MAX_BACKLOG = 40000
+DEFAULT_PURGE_BATCH_SIZE = 1000
+DEFAULT_PURGE_TIME_BUDGET = 1
+DEFAULT_OVERLOAD_POLICY = OVERLOAD_POLICY_DROP_LOW_PRIORITY
 KEEPALIVE_TIME = 30
 
-# Controls how often we clean up
-# States and Events objects
-EXPIRE_AFTER_COMMITS = 120
+# The number of most recently used state attributes
+# to keep the attributes_id for in memory
+STATE_ATTRIBUTES_ID_CACHE_SIZE = 2048
 
 CONF_AUTO_PURGE = "auto_purge"
 CONF_DB_URL = "db_url"
@@ -71,8 +93,12 @@ CONF_DB_MAX_RETRIES = "db_max_retries"
 CONF_DB_RETRY_WAIT = "db_retry_wait"
 CONF_PURGE_KEEP_DAYS = "purge_keep_days"
 CONF_PURGE_INTERVAL = "purge_interval"
+CONF_PURGE_BATCH_SIZE = "purge_batch_size"
+CONF_PURGE_TIME_BUDGET = "purge_time_budget"
 CONF_EVENT_TYPES = "event_types"
 CONF_COMMIT_INTERVAL = "commit_interval"
+CONF_MAX_BACKLOG = "max_backlog"
+CONF_OVERLOAD_POLICY = "overload_policy"
 
 EXCLUDE_SCHEMA = INCLUDE_EXCLUDE_FILTER_SCHEMA_INNER.extend(
     {vol.Optional(CONF_EVENT_TYPES): vol.All(cv.ensure_list, [cv.string])}
@@ -93,6 +119,12 @@ CONFIG_SCHEMA = vol.Schema(
                         vol.Coerce(int), vol.Range(min=1)
                     ),
                     vol.Optional(CONF_PURGE_INTERVAL, default=1): cv.positive_int,
+                    vol.Optional(
+                        CONF_PURGE_BATCH_SIZE, default=DEFAULT_PURGE_BATCH_SIZE
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Optional(
+                        CONF_PURGE_TIME_BUDGET, default=DEFAULT_PURGE_TIME_BUDGET
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
                     vol.Optional(CONF_DB_URL): cv.string,
                     vol.Optional(
                         CONF_COMMIT_INTERVAL, default=DEFAULT_COMMIT_INTERVAL
@@ -106,6 +138,14 @@ CONFIG_SCHEMA = vol.Schema(
                     vol.Optional(
                         CONF_DB_INTEGRITY_CHECK, default=DEFAULT_DB_INTEGRITY_CHECK
                     ): cv.boolean,
+                    vol.Optional(
+                        CONF_MAX_BACKLOG, default=DEFAULT_MAX_BACKLOG
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_OVERLOAD_POLICY, default=DEFAULT_OVERLOAD_POLICY
+                    ): vol.In(
+                        [OVERLOAD_POLICY_DROP_LOW_PRIORITY, OVERLOAD_POLICY_DROP_ALL]
+                    ),
                 }
             ),
         )
@@ -160,10 +200,14 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     entity_filter = convert_include_exclude_filter(conf)
     auto_purge = conf[CONF_AUTO_PURGE]
     keep_days = conf[CONF_PURGE_KEEP_DAYS]
+    purge_batch_size = conf[CONF_PURGE_BATCH_SIZE]
+    purge_time_budget = conf[CONF_PURGE_TIME_BUDGET]
     commit_interval = conf[CONF_COMMIT_INTERVAL]
     db_max_retries = conf[CONF_DB_MAX_RETRIES]
     db_retry_wait = conf[CONF_DB_RETRY_WAIT]
     db_integrity_check = conf[CONF_DB_INTEGRITY_CHECK]
+    max_backlog = conf[CONF_MAX_BACKLOG]
+    overload_policy = conf[CONF_OVERLOAD_POLICY]
 
     db_url = conf.get(CONF_DB_URL)
     if not db_url:
@@ -181,6 +225,10 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         entity_filter=entity_filter,
         exclude_t=exclude_t,
         db_integrity_check=db_integrity_check,
+        max_backlog=max_backlog,
+        overload_policy=overload_policy,
+        purge_batch_size=purge_batch_size,
+        purge_time_budget=purge_time_budget,
     )
     instance.async_initialize()
     instance.start()
@@ -192,12 +240,19 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     hass.services.async_register(
         DOMAIN, SERVICE_PURGE, async_handle_purge_service, schema=SERVICE_PURGE_SCHEMA
     )
+    websocket_api.async_setup(hass)
 
     return await instance.async_db_ready
 
 
 PurgeTask = namedtuple("PurgeTask", ["keep_days", "repack"])
 
+StatisticsTask = namedtuple("StatisticsTask", [])
+
+CommitStats = namedtuple(
+    "CommitStats", ["events", "states", "state_attributes", "flush_time"]
+)
+
 
 class WaitTask:
     """An object to insert into the recorder queue to tell it set the _queue_watch event."""
@@ -218,6 +273,10 @@ class Recorder(threading.Thread):
         entity_filter: Callable[[str], bool],
         exclude_t: List[str],
         db_integrity_check: bool,
+        max_backlog: int = DEFAULT_MAX_BACKLOG,
+        overload_policy: str = DEFAULT_OVERLOAD_POLICY,
+        purge_batch_size: int = DEFAULT_PURGE_BATCH_SIZE,
+        purge_time_budget: float = DEFAULT_PURGE_TIME_BUDGET,
     ) -> None:
         """Initialize the recorder."""
         threading.Thread.__init__(self, name="Recorder")
@@ -225,6 +284,8 @@ class Recorder(threading.Thread):
         self.hass = hass
         self.auto_purge = auto_purge
         self.keep_days = keep_days
+        self.purge_batch_size = purge_batch_size
+        self.purge_time_budget = purge_time_budget
         self.commit_interval = commit_interval
         self.queue: Any = queue.SimpleQueue()
         self.recording_start = dt_util.utcnow()
@@ -232,6 +293,11 @@ class Recorder(threading.Thread):
         self.db_max_retries = db_max_retries
         self.db_retry_wait = db_retry_wait
         self.db_integrity_check = db_integrity_check
+        self.max_backlog = max_backlog
+        self.overload_policy = overload_policy
+        self.dropped_events = 0
+        self._overloaded = False
+        self._processing_time_fired: Optional[datetime] = None
         self.async_db_ready = asyncio.Future()
         self._queue_watch = threading.Event()
         self.engine: Any = None
@@ -241,10 +307,12 @@ class Recorder(threading.Thread):
         self.exclude_t = exclude_t
 
         self._timechanges_seen = 0
-        self._commits_without_expire = 0
         self._keepalive_count = 0
         self._old_states = {}
-        self._pending_expunge = []
+        self._last_shared_attrs = {}
+        self._state_attributes_ids = OrderedDict()
+        self._pending_events = []
+        self.last_commit_stats: Optional[CommitStats] = None
         self.event_session = None
         self.get_session = None
         self._completed_database_setup = False
@@ -253,6 +321,7 @@ class Recorder(threading.Thread):
     def async_initialize(self):
         """Initialize the recorder."""
         self.hass.bus.async_listen(MATCH_ALL, self.event_listener)
+        self.hass.timer.async_listen(self._async_time_changed)
 
     def do_adhoc_purge(self, **kwargs):
         """Trigger an adhoc purge retaining keep_days worth of data."""
@@ -348,6 +417,22 @@ class Recorder(threading.Thread):
                 async_purge, hour=4, minute=12, second=0
             )
 
+        @callback
+        def async_compile_statistics(now):
+            """Trigger the statistics compilation."""
+            self.queue.put(StatisticsTask())
+
+        # Compile statistics every five minutes, leaving the
+        # states of the finished period time to be committed
+        self.hass.helpers.event.track_utc_time_change(
+            async_compile_statistics, minute=range(0, 60, 5), second=10
+        )
+
+        # Catch up on the periods missed while stopped, the rest
+        # is queued so events are written in between
+        if not statistics.compile_missing_statistics(self, dt_util.utcnow()):
+            self.queue.put(StatisticsTask())
+
         self.event_session = self.get_session()
         self.event_session.expire_on_commit = False
         # Use a session for the event read loop
@@ -360,13 +445,24 @@ class Recorder(threading.Thread):
                 self._close_connection()
                 return
             if isinstance(event, PurgeTask):
+                # Commit pending states first so attributes they
+                # reference are not considered unused by the purge
+                self._commit_event_session_or_retry()
                 # Schedule a new purge task if this one didn't finish
                 if not purge.purge_old_data(self, event.keep_days, event.repack):
                     self.queue.put(PurgeTask(event.keep_days, event.repack))
                 continue
+            if isinstance(event, StatisticsTask):
+                # Commit pending states first so they are compiled
+                self._commit_event_session_or_retry()
+                # Schedule a new statistics task if periods are left
+                if not statistics.compile_missing_statistics(self, dt_util.utcnow()):
+                    self.queue.put(StatisticsTask())
+                continue
             if isinstance(event, WaitTask):
                 self._queue_watch.set()
                 continue
+            self._processing_time_fired = event.time_fired
             if event.event_type == EVENT_TIME_CHANGED:
                 self._keepalive_count += 1
                 if self._keepalive_count >= KEEPALIVE_TIME:
@@ -392,31 +488,24 @@ class Recorder(threading.Thread):
                 else:
                     dbevent = Events.from_event(event)
                 dbevent.created = event.time_fired
-                self.event_session.add(dbevent)
+                event_params = _row_params(dbevent)
             except (TypeError, ValueError):
                 _LOGGER.warning("Event is not JSON serializable: %s", event)
+                continue
             except Exception as err:  # pylint: disable=broad-except
                 # Must catch the exception to prevent the loop from collapsing
                 _LOGGER.exception("Error adding event: %s", err)
+                continue
 
-            if dbevent and event.event_type == EVENT_STATE_CHANGED:
+            state_params = shared_attrs = None
+            if event.event_type == EVENT_STATE_CHANGED:
                 try:
                     dbstate = States.from_event(event)
-                    has_new_state = event.data.get("new_state")
-                    if dbstate.entity_id in self._old_states:
-                        old_state = self._old_states.pop(dbstate.entity_id)
-                        if old_state.state_id:
-                            dbstate.old_state_id = old_state.state_id
-                        else:
-                            dbstate.old_state = old_state
-                    if not has_new_state:
+                    if not event.data.get("new_state"):
                         dbstate.state = None
-                    dbstate.event = dbevent
                     dbstate.created = event.time_fired
-                    self.event_session.add(dbstate)
-                    if has_new_state:
-                        self._old_states[dbstate.entity_id] = dbstate
-                        self._pending_expunge.append(dbstate)
+                    shared_attrs = self._shared_attrs_from_event(event)
+                    state_params = _row_params(dbstate)
                 except (TypeError, ValueError):
                     _LOGGER.warning(
                         "State is not JSON serializable: %s",
@@ -426,11 +515,86 @@ class Recorder(threading.Thread):
                     # Must catch the exception to prevent the loop from collapsing
                     _LOGGER.exception("Error adding state change: %s", err)
 
+            # The rows are buffered until the next commit so they
+            # can be written without the overhead of the ORM
+            self._pending_events.append((event_params, state_params, shared_attrs))
+
             # If they do not have a commit interval
             # than we commit right away
             if not self.commit_interval:
                 self._commit_event_session_or_retry()
 
+    def _shared_attrs_from_event(self, event):
+        """Return the shared attributes json for a state_changed event.
+
+        The json of the previous state of the entity is reused when
+        its attributes are the very same mapping.
+        """
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+        if new_state is None:
+            self._last_shared_attrs.pop(entity_id, None)
+            return StateAttributes.shared_attrs_from_event(event)
+
+        last = self._last_shared_attrs.get(entity_id)
+        if last is not None and last[0] is new_state.attributes:
+            return last[1]
+
+        shared_attrs = StateAttributes.shared_attrs_from_event(event)
+        self._last_shared_attrs[entity_id] = (new_state.attributes, shared_attrs)
+        return shared_attrs
+
+    def _state_attributes_id(self, connection, shared_attrs, new_attributes_ids):
+        """Return the attributes_id of the shared attributes.
+
+        Attributes that are not stored yet are inserted.
+        """
+        attributes_id = self._state_attributes_ids.get(shared_attrs)
+        if attributes_id is not None:
+            self._state_attributes_ids.move_to_end(shared_attrs)
+            return attributes_id
+
+        attributes_id = new_attributes_ids.get(shared_attrs)
+        if attributes_id is not None:
+            return attributes_id
+
+        attr_hash = StateAttributes.hash_shared_attrs(shared_attrs)
+        row = connection.execute(
+            select([StateAttributes.attributes_id])
+            .where(StateAttributes.hash == attr_hash)
+            .where(StateAttributes.shared_attrs == shared_attrs)
+        ).first()
+        if row is not None:
+            self._cache_state_attributes_id(shared_attrs, row.attributes_id)
+            return row.attributes_id
+
+        attributes_id = connection.execute(
+            insert(StateAttributes.__table__),
+            {"hash": attr_hash, "shared_attrs": shared_attrs},
+        ).inserted_primary_key[0]
+        new_attributes_ids[shared_attrs] = attributes_id
+        return attributes_id
+
+    def _cache_state_attributes_id(self, shared_attrs, attributes_id):
+        """Remember the attributes_id of recently used state attributes."""
+        self._state_attributes_ids[shared_attrs] = attributes_id
+        if len(self._state_attributes_ids) > STATE_ATTRIBUTES_ID_CACHE_SIZE:
+            self._state_attributes_ids.popitem(last=False)
+
+    def evict_purged_states(self, state_ids):
+        """Forget the state_ids of last states that were removed by a purge."""
+        purged = set(state_ids)
+        for entity_id, state_id in list(self._old_states.items()):
+            if state_id in purged:
+                del self._old_states[entity_id]
+
+    def evict_purged_state_attributes(self, attributes_ids):
+        """Forget the attributes_ids that were removed by a purge."""
+        purged = set(attributes_ids)
+        for shared_attrs, attributes_id in list(self._state_attributes_ids.items()):
+            if attributes_id in purged:
+                del self._state_attributes_ids[shared_attrs]
+
     def _send_keep_alive(self):
         try:
             _LOGGER.debug("Sending keepalive")
@@ -494,6 +658,8 @@ class Recorder(threading.Thread):
             # Must catch the exception to prevent the loop from collapsing
             _LOGGER.exception("Error while closing event session: %s", err)
 
+        self._pending_events = []
+
         try:
             self.event_session = self.get_session()
             self.event_session.expire_on_commit = False
@@ -502,17 +668,8 @@ class Recorder(threading.Thread):
             _LOGGER.exception("Error while creating new event session: %s", err)
 
     def _commit_event_session(self):
-        self._commits_without_expire += 1
-
         try:
-            if self._pending_expunge:
-                self.event_session.flush()
-                for dbstate in self._pending_expunge:
-                    # Expunge the state so its not expired
-                    # until we use it later for dbstate.old_state
-                    if dbstate in self.event_session:
-                        self.event_session.expunge(dbstate)
-                self._pending_expunge = []
+            old_states, new_attributes_ids, stats = self._write_pending_events()
             self.event_session.commit()
         except exc.IntegrityError as err:
             _LOGGER.error(
@@ -521,24 +678,172 @@ class Recorder(threading.Thread):
             )
             self.event_session.rollback()
             self._old_states = {}
+            self._state_attributes_ids.clear()
+            self._pending_events = []
             raise
         except Exception as err:
             _LOGGER.error("Error executing query: %s", err)
             self.event_session.rollback()
+            self._pending_events = []
             raise
 
-        # Expire is an expensive operation (frequently more expensive
-        # than the flush and commit itself) so we only
-        # do it after EXPIRE_AFTER_COMMITS commits
-        if self._commits_without_expire == EXPIRE_AFTER_COMMITS:
-            self._commits_without_expire = 0
-            self.event_session.expire_all()
+        self._pending_events = []
+        for entity_id, state_id in old_states.items():
+            if state_id is None:
+                self._old_states.pop(entity_id, None)
+            else:
+                self._old_states[entity_id] = state_id
+        for shared_attrs, attributes_id in new_attributes_ids.items():
+            self._cache_state_attributes_id(shared_attrs, attributes_id)
+
+        if stats is not None:
+            self.last_commit_stats = stats
+            _LOGGER.debug(
+                "Wrote %d events, %d states and %d state attributes in %fs",
+                *stats,
+            )
+
+    def _write_pending_events(self):
+        """Write the pending events and states with core level inserts.
+
+        The events are written with a single multi-row insert and their
+        ids, which the states reference, are looked up afterwards. The
+        states are written in waves holding at most one state per
+        entity, each wave with a single multi-row insert. The ids of a
+        wave are looked up by event_id to link the next state of each
+        entity to it.
+
+        The links to the previous states and the new attributes_ids
+        are returned to only be remembered once the commit succeeds.
+        """
+        old_states = {}
+        new_attributes_ids = {}
+        if not self._pending_events:
+            return old_states, new_attributes_ids, None
+
+        timer_start = time.perf_counter()
+        connection = self.event_session.connection()
+        states_insert = insert(States.__table__)
+        event_ids = _insert_events(
+            connection, [event_params for event_params, _, _ in self._pending_events]
+        )
+        waves = []
+        entity_waves = {}
+        num_events = len(event_ids)
+        num_states = 0
+
+        for event_id, (_, state_params, shared_attrs) in zip(
+            event_ids, self._pending_events
+        ):
+            if state_params is None:
+                continue
+            state_params["event_id"] = event_id
+            state_params["attributes_id"] = self._state_attributes_id(
+                connection, shared_attrs, new_attributes_ids
+            )
+            entity_id = state_params["entity_id"]
+            wave = entity_waves.get(entity_id, 0)
+            entity_waves[entity_id] = wave + 1
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(state_params)
+
+        for wave in waves:
+            for state_params in wave:
+                entity_id = state_params["entity_id"]
+                if entity_id in old_states:
+                    state_params["old_state_id"] = old_states[entity_id]
+                else:
+                    state_params["old_state_id"] = self._old_states.get(entity_id)
+
+            if len(wave) == 1:
+                state_ids = {
+                    wave[0]["event_id"]: connection.execute(
+                        states_insert, wave[0]
+                    ).inserted_primary_key[0]
+                }
+            else:
+                connection.execute(states_insert, wave)
+                state_ids = _state_ids_by_event_id(
+                    connection, [state_params["event_id"] for state_params in wave]
+                )
+            num_states += len(wave)
+
+            for state_params in wave:
+                # A removed entity has no state to link the next one to
+                old_states[state_params["entity_id"]] = (
+                    None
+                    if state_params["state"] is None
+                    else state_ids[state_params["event_id"]]
+                )
+
+        return (
+            old_states,
+            new_attributes_ids,
+            CommitStats(
+                num_events,
+                num_states,
+                len(new_attributes_ids),
+                time.perf_counter() - timer_start,
+            ),
+        )
 
     @callback
     def event_listener(self, event):
-        """Listen for new events and put them in the process queue."""
+        """Listen for new events and put them in the process queue.
+
+        When the backlog grows too large, because the database can not
+        keep up, events are dropped according to the overload policy.
+        """
+        if event.event_type == EVENT_TIME_CHANGED:
+            # Time changes are queued by the timer listener
+            return
+        backlog = self.backlog
+        if backlog >= self._drop_backlog(event.event_type):
+            self.dropped_events += 1
+            if not self._overloaded:
+                self._overloaded = True
+                _LOGGER.warning(
+                    "The recorder backlog reached %s events, "
+                    "events are dropped until the database catches up",
+                    backlog,
+                )
+            return
+        if self._overloaded and backlog < self.max_backlog // 2:
+            self._overloaded = False
+            _LOGGER.info("The recorder backlog is back to %s events", backlog)
         self.queue.put(event)
 
+    @callback
+    def _async_time_changed(self, now):
+        """Queue a time change, the recorder commits on time changes.
+
+        Time changes are never dropped.
+        """
+        self.queue.put(Event(EVENT_TIME_CHANGED, {ATTR_NOW: now}, time_fired=now))
+
+    def _drop_backlog(self, event_type):
+        """Return the backlog from which an event type is dropped."""
+        if (
+            self.overload_policy == OVERLOAD_POLICY_DROP_LOW_PRIORITY
+            and event_type != EVENT_STATE_CHANGED
+        ):
+            # Low priority events make room for state changes
+            return self.max_backlog // 2
+        return self.max_backlog
+
+    @property
+    def backlog(self):
+        """Return the number of queued events and tasks."""
+        return self.queue.qsize()
+
+    @property
+    def backlog_age(self):
+        """Return how many seconds ago the event being written was fired."""
+        if self._processing_time_fired is None or not self.queue.qsize():
+            return 0
+        return (dt_util.utcnow() - self._processing_time_fired).total_seconds()
+
     def block_till_done(self):
         """Block till all events processed.
 
@@ -571,6 +876,11 @@ class Recorder(threading.Thread):
                 old_isolation = dbapi_connection.isolation_level
                 dbapi_connection.isolation_level = None
                 cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA auto_vacuum")
+                if cursor.fetchone()[0] != SQLITE_AUTO_VACUUM_INCREMENTAL:
+                    # Applies to new databases right away, existing
+                    # databases are converted by the next full VACUUM
+                    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
                 cursor.execute("PRAGMA journal_mode=WAL")
                 cursor.close()
                 dbapi_connection.isolation_level = old_isolation
@@ -648,3 +958,57 @@ class Recorder(threading.Thread):
             self.event_session.close()
 
         self.run_info = None
+
+
+def _row_params(dbobj):
+    """Return the column values of a database object to insert it."""
+    return {
+        column.key: getattr(dbobj, column.key)
+        for column in dbobj.__table__.columns
+        if not column.primary_key
+    }
+
+
+def _insert_events(connection, events):
+    """Insert events and return their event_ids in the order of events.
+
+    The recorder is the only writer of the events table, so the ids of
+    the rows of one insert ascend in the order of the rows.
+    """
+    events_insert = insert(Events.__table__)
+    if connection.dialect.name == "postgresql":
+        event_ids = []
+        for idx in range(0, len(events), MAX_ROWS_PER_INSERT):
+            query = events_insert.values(events[idx : idx + MAX_ROWS_PER_INSERT])
+            # The order of the returned rows is not guaranteed
+            event_ids.extend(
+                sorted(
+                    row.event_id
+                    for row in connection.execute(query.returning(Events.event_id))
+                )
+            )
+        return event_ids
+
+    last_event_id = connection.execute(select([func.max(Events.event_id)])).scalar()
+    connection.execute(events_insert, events)
+    query = select([Events.event_id]).order_by(Events.event_id)
+    if last_event_id is not None:
+        query = query.where(Events.event_id > last_event_id)
+    event_ids = [row.event_id for row in connection.execute(query)]
+    if len(event_ids) != len(events):
+        raise RuntimeError(
+            f"Inserted {len(events)} events but found {len(event_ids)} new ones"
+        )
+    return event_ids
+
+
+def _state_ids_by_event_id(connection, event_ids):
+    """Return the state_ids of the states of events."""
+    state_ids = {}
+    for idx in range(0, len(event_ids), SQLITE_MAX_BIND_VARS):
+        query = select([States.state_id, States.event_id]).where(
+            States.event_id.in_(event_ids[idx : idx + SQLITE_MAX_BIND_VARS])
+        )
+        for row in connection.execute(query):
+            state_ids[row.event_id] = row.state_id
+    return state_ids
@@ -2,6 +2,15 @@
 
 DATA_INSTANCE = "recorder_instance"
 SQLITE_URL_PREFIX = "sqlite://"
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+# The lowest limit of bound parameters of a query of all sqlite versions
+SQLITE_MAX_BIND_VARS = 999
+# Rows of a multi-row insert, keeping its bound parameters well below
+# the limit of PostgreSQL
+MAX_ROWS_PER_INSERT = 1000
 DOMAIN = "recorder"
 
 CONF_DB_INTEGRITY_CHECK = "db_integrity_check"
+
+OVERLOAD_POLICY_DROP_LOW_PRIORITY = "drop_low_priority"
+OVERLOAD_POLICY_DROP_ALL = "drop_all"
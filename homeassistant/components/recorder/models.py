@@ -1,11 +1,14 @@
 """Models for SQLAlchemy."""
 import json
 import logging
+import zlib
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
+    Float,
     ForeignKey,
     Index,
     Integer,
@@ -13,7 +16,7 @@ from sqlalchemy import (
     Text,
     distinct,
 )
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.declarative import declarative_base, declared_attr
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.session import Session
 
@@ -25,7 +28,7 @@ import homeassistant.util.dt as dt_util
 # pylint: disable=invalid-name
 Base = declarative_base()
 
-SCHEMA_VERSION = 11
+SCHEMA_VERSION = 14
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,10 +36,25 @@ DB_TIMEZONE = "+00:00"
 
 TABLE_EVENTS = "events"
 TABLE_STATES = "states"
+TABLE_STATE_ATTRIBUTES = "state_attributes"
 TABLE_RECORDER_RUNS = "recorder_runs"
 TABLE_SCHEMA_CHANGES = "schema_changes"
+TABLE_STATISTICS = "statistics"
+TABLE_STATISTICS_SHORT_TERM = "statistics_short_term"
+TABLE_STATISTICS_RUNS = "statistics_runs"
 
-ALL_TABLES = [TABLE_STATES, TABLE_EVENTS, TABLE_RECORDER_RUNS, TABLE_SCHEMA_CHANGES]
+ALL_TABLES = [
+    TABLE_STATES,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_EVENTS,
+    TABLE_RECORDER_RUNS,
+    TABLE_SCHEMA_CHANGES,
+    TABLE_STATISTICS,
+    TABLE_STATISTICS_SHORT_TERM,
+    TABLE_STATISTICS_RUNS,
+]
+
+EMPTY_JSON_OBJECT = "{}"
 
 
 class Events(Base):  # type: ignore
@@ -109,7 +127,12 @@ class States(Base):  # type: ignore
     domain = Column(String(64))
     entity_id = Column(String(255))
     state = Column(String(255))
+    # Only set on rows written before schema version 12, newer rows
+    # reference a deduplicated row in the state_attributes table
     attributes = Column(Text)
+    attributes_id = Column(
+        Integer, ForeignKey("state_attributes.attributes_id"), index=True
+    )
     event_id = Column(
         Integer, ForeignKey("events.event_id", ondelete="CASCADE"), index=True
     )
@@ -121,6 +144,7 @@ class States(Base):  # type: ignore
     )
     event = relationship("Events", uselist=False)
     old_state = relationship("States", remote_side=[state_id])
+    state_attributes = relationship("StateAttributes", uselist=False)
 
     __table_args__ = (
         # Used for fetching the state of entities at a specific time
@@ -130,7 +154,11 @@ class States(Base):  # type: ignore
 
     @staticmethod
     def from_event(event):
-        """Create object from a state_changed event."""
+        """Create object from a state_changed event.
+
+        The attributes are not set, they are stored separately
+        in the state_attributes table, see StateAttributes.
+        """
         entity_id = event.data["entity_id"]
         state = event.data.get("new_state")
 
@@ -140,13 +168,11 @@ class States(Base):  # type: ignore
         if state is None:
             dbstate.state = ""
             dbstate.domain = split_entity_id(entity_id)[0]
-            dbstate.attributes = "{}"
             dbstate.last_changed = event.time_fired
             dbstate.last_updated = event.time_fired
         else:
             dbstate.domain = state.domain
             dbstate.state = state.state
-            dbstate.attributes = json.dumps(dict(state.attributes), cls=JSONEncoder)
             dbstate.last_changed = state.last_changed
             dbstate.last_updated = state.last_updated
 
@@ -154,11 +180,15 @@ class States(Base):  # type: ignore
 
     def to_native(self, validate_entity_id=True):
         """Convert to an HA state object."""
+        if self.attributes_id is not None and self.state_attributes is not None:
+            shared_attrs = self.state_attributes.shared_attrs
+        else:
+            shared_attrs = self.attributes or EMPTY_JSON_OBJECT
         try:
             return State(
                 self.entity_id,
                 self.state,
-                json.loads(self.attributes),
+                json.loads(shared_attrs),
                 process_timestamp(self.last_changed),
                 process_timestamp(self.last_updated),
                 # Join the events table on event_id to get the context instead
@@ -172,6 +202,109 @@ class States(Base):  # type: ignore
             return None
 
 
+class StateAttributes(Base):  # type: ignore
+    """State attribute change history.
+
+    Identical attributes are only stored once and shared
+    between all the states that have them.
+    """
+
+    __table_args__ = {
+        "mysql_default_charset": "utf8mb4",
+        "mysql_collate": "utf8mb4_unicode_ci",
+    }
+    __tablename__ = TABLE_STATE_ATTRIBUTES
+    attributes_id = Column(Integer, primary_key=True)
+    hash = Column(BigInteger, index=True)
+    shared_attrs = Column(Text)
+
+    @staticmethod
+    def shared_attrs_from_event(event):
+        """Create the shared attributes json from a state_changed event."""
+        state = event.data.get("new_state")
+        # State got deleted
+        if state is None:
+            return EMPTY_JSON_OBJECT
+        return json.dumps(dict(state.attributes), cls=JSONEncoder)
+
+    @staticmethod
+    def hash_shared_attrs(shared_attrs):
+        """Return the hash of the shared attributes json."""
+        return zlib.crc32(shared_attrs.encode("utf-8"))
+
+    def to_native(self, validate_entity_id=True):
+        """Convert to a dict of state attributes."""
+        try:
+            return json.loads(self.shared_attrs)
+        except ValueError:
+            # When json.loads fails
+            _LOGGER.exception("Error converting row to state attributes: %s", self)
+            return {}
+
+
+class StatisticsBase:
+    """Statistics of a numeric sensor over a period of time."""
+
+    id = Column(Integer, primary_key=True)
+    created = Column(DateTime(timezone=True), default=dt_util.utcnow)
+    statistic_id = Column(String(255))
+    start = Column(DateTime(timezone=True))
+    mean = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
+    last = Column(Float)
+    sum = Column(Float)
+
+    @declared_attr
+    def __table_args__(cls):  # pylint: disable=no-self-argument
+        """Index the statistics by statistic_id and start of the period."""
+        return (
+            # Used for fetching the statistics of a period
+            Index(
+                f"ix_{cls.__tablename__}_statistic_id_start", "statistic_id", "start"
+            ),
+            # Used for purging and fetching the statistics of all entities
+            Index(f"ix_{cls.__tablename__}_start", "start"),
+        )
+
+    @classmethod
+    def from_stats(cls, statistic_id, start, stats):
+        """Create a statistics database object from compiled statistics."""
+        return cls(statistic_id=statistic_id, start=start, **stats)
+
+    def to_native(self, validate_entity_id=True):
+        """Convert to a dict of statistics."""
+        return {
+            "statistic_id": self.statistic_id,
+            "start": process_timestamp(self.start),
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+            "sum": self.sum,
+        }
+
+
+class Statistics(StatisticsBase, Base):  # type: ignore
+    """Hourly statistics."""
+
+    __tablename__ = TABLE_STATISTICS
+
+
+class StatisticsShortTerm(StatisticsBase, Base):  # type: ignore
+    """Five minute statistics."""
+
+    __tablename__ = TABLE_STATISTICS_SHORT_TERM
+
+
+class StatisticsRuns(Base):  # type: ignore
+    """Representation of a compiled short term statistics period."""
+
+    __tablename__ = TABLE_STATISTICS_RUNS
+    run_id = Column(Integer, primary_key=True)
+    start = Column(DateTime(timezone=True), index=True)
+
+
 class RecorderRuns(Base):  # type: ignore
     """Representation of recorder run."""
 
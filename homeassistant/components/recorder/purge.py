@@ -3,67 +3,69 @@ from datetime import timedelta
 import logging
 import time
 
+from sqlalchemy import exists
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
 import homeassistant.util.dt as dt_util
 
-from .models import Events, RecorderRuns, States
-from .util import execute, session_scope
+from .const import SQLITE_AUTO_VACUUM_INCREMENTAL
+from .models import (
+    TABLE_EVENTS,
+    TABLE_RECORDER_RUNS,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_STATES,
+    TABLE_STATISTICS_SHORT_TERM,
+    Events,
+    RecorderRuns,
+    StateAttributes,
+    States,
+)
+from .statistics import purge_short_term_statistics
+from .util import session_scope
 
 _LOGGER = logging.getLogger(__name__)
 
+# Stay below the maximum number of variables in an sqlite query
+MAX_ROWS_TO_PURGE = 998
+
+# The number of free pages an sqlite database releases per purge,
+# 4096 bytes each with the default page size
+SQLITE_INCREMENTAL_VACUUM_PAGES = 25000
+
+PURGED_TABLES = (
+    TABLE_STATES,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_EVENTS,
+    TABLE_RECORDER_RUNS,
+    TABLE_STATISTICS_SHORT_TERM,
+)
+
 
 def purge_old_data(instance, purge_days: int, repack: bool) -> bool:
     """Purge events and states older than purge_days ago.
 
-    Cleans up an timeframe of an hour, based on the oldest record.
+    States and events are selected by primary key in batches of
+    purge_batch_size rows, every batch is deleted in its own transaction.
+    Once purge_time_budget is used up False is returned, the purge task
+    is queued again behind the events that were recorded meanwhile.
     """
     purge_before = dt_util.utcnow() - timedelta(days=purge_days)
     _LOGGER.debug("Purging states and events before target %s", purge_before)
+    deadline = time.monotonic() + instance.purge_time_budget
 
     try:
-        with session_scope(session=instance.get_session()) as session:
-            # Purge a max of 1 hour, based on the oldest states or events record
-            batch_purge_before = purge_before
-
-            query = session.query(States).order_by(States.last_updated.asc()).limit(1)
-            states = execute(query, to_native=True, validate_entity_ids=False)
-            if states:
-                batch_purge_before = min(
-                    batch_purge_before,
-                    states[0].last_updated + timedelta(hours=1),
-                )
-
-            query = session.query(Events).order_by(Events.time_fired.asc()).limit(1)
-            events = execute(query, to_native=True)
-            if events:
-                batch_purge_before = min(
-                    batch_purge_before,
-                    events[0].time_fired + timedelta(hours=1),
-                )
-
-            _LOGGER.debug("Purging states and events before %s", batch_purge_before)
-
-            deleted_rows = (
-                session.query(States)
-                .filter(States.last_updated < batch_purge_before)
-                .delete(synchronize_session=False)
-            )
-            _LOGGER.debug("Deleted %s states", deleted_rows)
-
-            deleted_rows = (
-                session.query(Events)
-                .filter(Events.time_fired < batch_purge_before)
-                .delete(synchronize_session=False)
-            )
-            _LOGGER.debug("Deleted %s events", deleted_rows)
-
-            # If states or events purging isn't processing the purge_before yet,
-            # return false, as we are not done yet.
-            if batch_purge_before != purge_before:
+        while True:
+            with session_scope(session=instance.get_session()) as session:
+                # States are purged first as they reference their events
+                if not _purge_states_batch(instance, session, purge_before):
+                    if not _purge_events_batch(instance, session, purge_before):
+                        break
+
+            if time.monotonic() >= deadline:
                 _LOGGER.debug("Purging hasn't fully completed yet")
                 return False
 
+        with session_scope(session=instance.get_session()) as session:
             # Recorder runs is small, no need to batch run it
             deleted_rows = (
                 session.query(RecorderRuns)
@@ -73,6 +75,13 @@ def purge_old_data(instance, purge_days: int, repack: bool) -> bool:
             )
             _LOGGER.debug("Deleted %s recorder_runs", deleted_rows)
 
+            _purge_unused_state_attributes(instance, session)
+
+            # Only the short term statistics follow the states, the
+            # hourly statistics are kept for the long term history
+            deleted_rows = purge_short_term_statistics(session, purge_before)
+            _LOGGER.debug("Deleted %s short term statistics", deleted_rows)
+
         if repack:
             # Execute sqlite or postgresql vacuum command to free up space on disk
             if instance.engine.driver in ("pysqlite", "postgresql"):
@@ -81,7 +90,9 @@ def purge_old_data(instance, purge_days: int, repack: bool) -> bool:
             # Optimize mysql / mariadb tables to free up space on disk
             elif instance.engine.driver in ("mysqldb", "pymysql"):
                 _LOGGER.debug("Optimizing SQL DB to free space")
-                instance.engine.execute("OPTIMIZE TABLE states, events, recorder_runs")
+                instance.engine.execute(f"OPTIMIZE TABLE {', '.join(PURGED_TABLES)}")
+        else:
+            _repack_incremental(instance)
 
     except OperationalError as err:
         # Retry when one of the following MySQL errors occurred:
@@ -101,3 +112,111 @@ def purge_old_data(instance, purge_days: int, repack: bool) -> bool:
     except SQLAlchemyError as err:
         _LOGGER.warning("Error purging history: %s", err)
     return True
+
+
+def _repack_incremental(instance) -> None:
+    """Reclaim a bounded amount of disk space without rewriting the database.
+
+    SQLite databases in incremental auto_vacuum mode release a limited
+    number of free pages. PostgreSQL reclaims the space with autovacuum,
+    MySQL / MariaDB tables are only rebuilt by an explicit repack as
+    both would block the recorder for minutes on large tables.
+    """
+    if instance.engine.dialect.name != "sqlite":
+        return
+
+    auto_vacuum = instance.engine.execute("PRAGMA auto_vacuum").scalar()
+    if auto_vacuum != SQLITE_AUTO_VACUUM_INCREMENTAL:
+        return
+    _LOGGER.debug("Incrementally vacuuming SQL DB to free space")
+    connection = instance.engine.raw_connection()
+    try:
+        # The pragma frees one page per step, executescript
+        # steps through the whole statement
+        connection.executescript(
+            f"PRAGMA incremental_vacuum({SQLITE_INCREMENTAL_VACUUM_PAGES})"
+        )
+    finally:
+        connection.close()
+
+
+def _purge_states_batch(instance, session, purge_before) -> bool:
+    """Delete a batch of states older than purge_before.
+
+    Returns False when there were no states left to purge.
+    """
+    state_ids = [
+        row.state_id
+        for row in session.query(States.state_id)
+        .filter(States.last_updated < purge_before)
+        .limit(instance.purge_batch_size)
+    ]
+    if not state_ids:
+        return False
+
+    for ids in _chunked(state_ids):
+        # Newer states can not reference the purged states
+        session.query(States).filter(States.old_state_id.in_(ids)).update(
+            {States.old_state_id: None}, synchronize_session=False
+        )
+    deleted_rows = 0
+    for ids in _chunked(state_ids):
+        deleted_rows += (
+            session.query(States)
+            .filter(States.state_id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+    _LOGGER.debug("Deleted %s states", deleted_rows)
+
+    instance.evict_purged_states(state_ids)
+    return True
+
+
+def _purge_events_batch(instance, session, purge_before) -> bool:
+    """Delete a batch of events older than purge_before.
+
+    Returns False when there were no events left to purge.
+    """
+    event_ids = [
+        row.event_id
+        for row in session.query(Events.event_id)
+        .filter(Events.time_fired < purge_before)
+        .limit(instance.purge_batch_size)
+    ]
+    if not event_ids:
+        return False
+
+    deleted_rows = 0
+    for ids in _chunked(event_ids):
+        deleted_rows += (
+            session.query(Events)
+            .filter(Events.event_id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+    _LOGGER.debug("Deleted %s events", deleted_rows)
+    return True
+
+
+def _chunked(ids):
+    """Split ids in chunks that fit in a single query."""
+    for idx in range(0, len(ids), MAX_ROWS_TO_PURGE):
+        yield ids[idx : idx + MAX_ROWS_TO_PURGE]
+
+
+def _purge_unused_state_attributes(instance, session):
+    """Remove state attributes that are no longer referenced by any state."""
+    attributes_ids = [
+        row.attributes_id
+        for row in session.query(StateAttributes.attributes_id).filter(
+            ~exists().where(States.attributes_id == StateAttributes.attributes_id)
+        )
+    ]
+    for ids in _chunked(attributes_ids):
+        deleted_rows = (
+            session.query(StateAttributes)
+            .filter(StateAttributes.attributes_id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+        _LOGGER.debug("Deleted %s state attributes", deleted_rows)
+
+    instance.evict_purged_state_attributes(attributes_ids)
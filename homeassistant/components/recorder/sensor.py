@@ -0,0 +1,68 @@
+"""Sensors reporting the state of the recorder queue."""
+from homeassistant.helpers.entity import Entity
+
+from .const import DATA_INSTANCE
+
+# mypy: allow-untyped-calls, allow-untyped-defs, no-check-untyped-defs
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the recorder queue sensors."""
+    instance = hass.data[DATA_INSTANCE]
+
+    async_add_entities(
+        [
+            RecorderQueueSensor(
+                instance, "Recorder backlog", "backlog", "events", "mdi:tray-full"
+            ),
+            RecorderQueueSensor(
+                instance, "Recorder backlog age", "backlog_age", "s", "mdi:timer-sand"
+            ),
+            RecorderQueueSensor(
+                instance,
+                "Recorder dropped events",
+                "dropped_events",
+                "events",
+                "mdi:delete-alert",
+            ),
+        ],
+        True,
+    )
+
+
+class RecorderQueueSensor(Entity):
+    """Sensor polling an attribute of the recorder queue."""
+
+    def __init__(self, instance, name, attribute, unit, icon):
+        """Initialize the sensor."""
+        self._instance = instance
+        self._name = name
+        self._attribute = attribute
+        self._unit = unit
+        self._icon = icon
+        self._state = None
+
+    @property
+    def name(self):
+        """Return name of entity."""
+        return self._name
+
+    @property
+    def state(self):
+        """Return the state of the recorder queue."""
+        return self._state
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return self._unit
+
+    @property
+    def icon(self):
+        """Return the icon to use in the frontend."""
+        return self._icon
+
+    async def async_update(self):
+        """Read the attribute from the recorder."""
+        value = getattr(self._instance, self._attribute)
+        self._state = round(value, 1) if isinstance(value, float) else value
@@ -0,0 +1,304 @@
+"""Statistics helper."""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from homeassistant.const import ATTR_DEVICE_CLASS, DEVICE_CLASS_ENERGY
+from homeassistant.core import HomeAssistant
+
+from .models import (
+    States,
+    Statistics,
+    StatisticsRuns,
+    StatisticsShortTerm,
+    process_timestamp,
+)
+from .util import execute, session_scope
+
+_LOGGER = logging.getLogger(__name__)
+
+PERIOD_5MINUTE = "5minute"
+PERIOD_HOUR = "hour"
+
+SHORT_TERM_PERIOD = timedelta(minutes=5)
+LONG_TERM_PERIOD = timedelta(hours=1)
+
+STATISTICS_TABLES = {PERIOD_5MINUTE: StatisticsShortTerm, PERIOD_HOUR: Statistics}
+
+STATISTICS_DOMAINS = ("sensor",)
+
+# Periods caught up at once before the recorder writes queued events again
+MAX_MISSING_PERIODS_PER_RUN = 12
+
+# Sensors with these device classes are counters, the sum
+# of their increases over the period is compiled as well
+COUNTER_DEVICE_CLASSES = (DEVICE_CLASS_ENERGY,)
+
+
+def short_term_period_start(utc_now: datetime) -> datetime:
+    """Return the start of the last completed short term period."""
+    start = utc_now.replace(
+        minute=utc_now.minute - utc_now.minute % 5, second=0, microsecond=0
+    )
+    return start - SHORT_TERM_PERIOD
+
+
+def compile_missing_statistics(instance, utc_now: datetime) -> bool:
+    """Compile the statistics of the periods since the last compiled one.
+
+    Periods missed while Home Assistant was stopped or the recorder was
+    behind are caught up, as far back as states are kept. At most
+    MAX_MISSING_PERIODS_PER_RUN periods are compiled per call, returns
+    False when periods are left to compile.
+    """
+    last_period = short_term_period_start(utc_now)
+    try:
+        with session_scope(session=instance.get_session()) as session:
+            last_run = session.query(func.max(StatisticsRuns.start)).scalar()
+    except SQLAlchemyError as err:
+        _LOGGER.warning("Error finding the last compiled statistics: %s", err)
+        return True
+
+    if last_run is None:
+        start = last_period
+    else:
+        oldest_period = short_term_period_start(
+            utc_now - timedelta(days=instance.keep_days)
+        )
+        start = max(process_timestamp(last_run) + SHORT_TERM_PERIOD, oldest_period)
+
+    for _ in range(MAX_MISSING_PERIODS_PER_RUN):
+        if start > last_period:
+            return True
+        if not compile_statistics(instance, start):
+            # Retry from this period on the next run
+            return True
+        start += SHORT_TERM_PERIOD
+    return start > last_period
+
+
+def compile_statistics(instance, start: datetime) -> bool:
+    """Compile the statistics of the short term period starting at start.
+
+    Once the last short term period of an hour has been compiled,
+    the hourly statistics are compiled from the short term statistics.
+    Returns False when the statistics could not be compiled.
+    """
+    end = start + SHORT_TERM_PERIOD
+    _LOGGER.debug("Compiling statistics for %s-%s", start, end)
+
+    try:
+        with session_scope(session=instance.get_session()) as session:
+            if not _period_compiled(session, StatisticsShortTerm, start):
+                _compile_short_term_statistics(instance.hass, session, start, end)
+
+            if end.minute == 0:
+                hour_start = end - LONG_TERM_PERIOD
+                if not _period_compiled(session, Statistics, hour_start):
+                    _compile_hourly_statistics(session, hour_start, end)
+
+            session.add(StatisticsRuns(start=start))
+    except SQLAlchemyError as err:
+        _LOGGER.warning("Error compiling statistics: %s", err)
+        return False
+    return True
+
+
+def _period_compiled(session, table, start: datetime) -> bool:
+    """Return if the statistics of a period have already been compiled."""
+    return session.query(table.id).filter(table.start == start).first() is not None
+
+
+def _compile_short_term_statistics(
+    hass: HomeAssistant, session, start: datetime, end: datetime
+) -> None:
+    """Compile five minute statistics from the recorded states."""
+    changes, previous = _period_changes(session, start, end)
+
+    for entity_id in set(changes) | set(previous):
+        state = hass.states.get(entity_id)
+        if state is None and entity_id not in changes:
+            # Removed entities are no longer carried over
+            continue
+        is_counter = (
+            state is not None
+            and state.attributes.get(ATTR_DEVICE_CLASS) in COUNTER_DEVICE_CLASSES
+        )
+        stats = _time_weighted_statistics(
+            start, end, previous.get(entity_id), changes.get(entity_id, []), is_counter
+        )
+        if stats is not None:
+            session.add(StatisticsShortTerm.from_stats(entity_id, start, stats))
+
+
+def _period_changes(
+    session, start: datetime, end: datetime
+) -> Tuple[
+    Dict[str, List[Tuple[datetime, Optional[float]]]], Dict[str, Optional[float]]
+]:
+    """Return the state changes of a period and the values at its start."""
+    query = (
+        session.query(States.entity_id, States.state, States.last_updated)
+        .filter(States.domain.in_(STATISTICS_DOMAINS))
+        .filter((States.last_updated >= start) & (States.last_updated < end))
+        .order_by(States.entity_id, States.last_updated)
+    )
+    changes = {
+        entity_id: [
+            (process_timestamp(row.last_updated), _float_or_none(row.state))
+            for row in rows
+        ]
+        for entity_id, rows in groupby(execute(query), lambda row: row.entity_id)
+    }
+
+    # The last value of the previous period is the value at the start
+    # of this period, so there is no need to look up older states
+    query = session.query(StatisticsShortTerm.statistic_id, StatisticsShortTerm.last)
+    query = query.filter(StatisticsShortTerm.start == start - SHORT_TERM_PERIOD)
+    previous = {row.statistic_id: row.last for row in execute(query)}
+    return changes, previous
+
+
+def _compile_hourly_statistics(session, start: datetime, end: datetime) -> None:
+    """Compile hourly statistics from the five minute statistics.
+
+    The mean is weighted by the time each value was held over the hour,
+    averaging the five minute means would give periods where the state
+    was only partly numeric the same weight as the others.
+    """
+    changes, previous = _period_changes(session, start, end)
+    query = (
+        session.query(StatisticsShortTerm)
+        .filter(
+            (StatisticsShortTerm.start >= start) & (StatisticsShortTerm.start < end)
+        )
+        .order_by(StatisticsShortTerm.statistic_id, StatisticsShortTerm.start)
+    )
+    for statistic_id, group in groupby(
+        execute(query, to_native=True), lambda stats: stats["statistic_id"]
+    ):
+        rows = list(group)
+        sums = [row["sum"] for row in rows if row["sum"] is not None]
+        hourly = _time_weighted_statistics(
+            start,
+            end,
+            previous.get(statistic_id),
+            changes.get(statistic_id, []),
+            False,
+        )
+        if hourly is not None:
+            mean = hourly["mean"]
+        else:
+            # The states are gone, fall back to the five minute means
+            mean = sum(row["mean"] for row in rows) / len(rows)
+        stats = {
+            "mean": mean,
+            "min": min(row["min"] for row in rows),
+            "max": max(row["max"] for row in rows),
+            "last": rows[-1]["last"],
+            "sum": sum(sums) if sums else None,
+        }
+        session.add(Statistics.from_stats(statistic_id, start, stats))
+
+
+def _float_or_none(state: str) -> Optional[float]:
+    """Convert a state to a float or None when it is not numeric."""
+    try:
+        return float(state)
+    except (TypeError, ValueError):
+        return None
+
+
+def _time_weighted_statistics(
+    start: datetime,
+    end: datetime,
+    initial: Optional[float],
+    changes: Iterable[Tuple[datetime, Optional[float]]],
+    is_counter: bool,
+) -> Optional[Dict[str, Optional[float]]]:
+    """Compile the statistics of a period from its state changes.
+
+    The mean is weighted by the time each value was held. Periods
+    where the state was not numeric are left out.
+    """
+    duration = 0.0
+    weighted_total = 0.0
+    increase = 0.0
+    minimum = maximum = last = initial
+    prev_time, prev_value = start, initial
+
+    for time, value in changes:
+        if prev_value is not None:
+            held = (time - prev_time).total_seconds()
+            duration += held
+            weighted_total += prev_value * held
+        if value is not None:
+            if last is not None:
+                # A counter that decreased has been reset
+                increase += value - last if value >= last else value
+            minimum = value if minimum is None else min(minimum, value)
+            maximum = value if maximum is None else max(maximum, value)
+            last = value
+        prev_time, prev_value = time, value
+
+    if prev_value is not None:
+        held = (end - prev_time).total_seconds()
+        duration += held
+        weighted_total += prev_value * held
+
+    if last is None:
+        return None
+
+    return {
+        "mean": weighted_total / duration if duration else last,
+        "min": minimum,
+        "max": maximum,
+        "last": last,
+        "sum": increase if is_counter else None,
+    }
+
+
+def statistics_during_period(
+    hass: HomeAssistant,
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    statistic_ids: Optional[List[str]] = None,
+    period: str = PERIOD_HOUR,
+) -> Dict[str, List[dict]]:
+    """Return the compiled statistics during UTC period start_time - end_time."""
+    table = STATISTICS_TABLES[period]
+    result: Dict[str, List[dict]] = defaultdict(list)
+    if statistic_ids is not None:
+        for statistic_id in statistic_ids:
+            result[statistic_id] = []
+
+    with session_scope(hass=hass) as session:
+        query = session.query(table).filter(table.start >= start_time)
+        if end_time is not None:
+            query = query.filter(table.start < end_time)
+        if statistic_ids is not None:
+            query = query.filter(table.statistic_id.in_(statistic_ids))
+        query = query.order_by(table.statistic_id, table.start)
+
+        for stats in execute(query, to_native=True):
+            result[stats["statistic_id"]].append(stats)
+
+    # Filter out the empty lists if some statistics had 0 results.
+    return {key: val for key, val in result.items() if val}
+
+
+def purge_short_term_statistics(session, purge_before: datetime) -> int:
+    """Purge the short term statistics, the hourly statistics are kept."""
+    session.query(StatisticsRuns).filter(StatisticsRuns.start < purge_before).delete(
+        synchronize_session=False
+    )
+    return (
+        session.query(StatisticsShortTerm)
+        .filter(StatisticsShortTerm.start < purge_before)
+        .delete(synchronize_session=False)
+    )
@@ -0,0 +1,35 @@
+"""The Recorder websocket API."""
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_INSTANCE
+
+
+@callback
+def async_setup(hass: HomeAssistant) -> None:
+    """Set up the recorder websocket API."""
+    websocket_api.async_register_command(hass, ws_info)
+
+
+@websocket_api.websocket_command({vol.Required("type"): "recorder/info"})
+@callback
+def ws_info(hass, connection, msg):
+    """Return the status of the recorder queue."""
+    instance = hass.data[DATA_INSTANCE]
+    last_commit_stats = instance.last_commit_stats
+
+    connection.send_result(
+        msg["id"],
+        {
+            "backlog": instance.backlog,
+            "backlog_age": instance.backlog_age,
+            "max_backlog": instance.max_backlog,
+            "overload_policy": instance.overload_policy,
+            "dropped_events": instance.dropped_events,
+            "last_commit": last_commit_stats._asdict()
+            if last_commit_stats is not None
+            else None,
+        },
+    )
@@ -4,6 +4,7 @@ from typing import Optional, Union, cast
 import voluptuous as vol
 
 from homeassistant.core import HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
 from homeassistant.loader import bind_hass
 
 from . import commands, connection, const, decorators, http, messages  # noqa
@@ -38,6 +39,24 @@ DOMAIN = const.DOMAIN
 
 DEPENDENCIES = ("http",)
 
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(
+                    const.CONF_COMPRESSION_LEVEL,
+                    default=const.DEFAULT_COMPRESSION_LEVEL,
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=9)),
+                vol.Optional(
+                    const.CONF_COMPRESSION_MIN_SIZE,
+                    default=const.DEFAULT_COMPRESSION_MIN_SIZE,
+                ): cv.positive_int,
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
 
 @bind_hass
 @callback
@@ -63,6 +82,14 @@ def async_register_command(
 
 async def async_setup(hass, config):
     """Initialize the websocket API."""
-    hass.http.register_view(http.WebsocketAPIView)
+    conf = config.get(DOMAIN, {})
+    hass.http.register_view(
+        http.WebsocketAPIView(
+            conf.get(const.CONF_COMPRESSION_LEVEL, const.DEFAULT_COMPRESSION_LEVEL),
+            conf.get(
+                const.CONF_COMPRESSION_MIN_SIZE, const.DEFAULT_COMPRESSION_MIN_SIZE
+            ),
+        )
+    )
     commands.async_register_commands(hass, async_register_command)
     return True
@@ -21,13 +21,17 @@ AUTH_MESSAGE_SCHEMA = vol.Schema(
         vol.Required("type"): TYPE_AUTH,
         vol.Exclusive("api_password", "auth"): str,
         vol.Exclusive("access_token", "auth"): str,
+        vol.Optional("coalesce_messages", default=False): bool,
     }
 )
 
 
-def auth_ok_message():
+def auth_ok_message(coalesce_messages=False):
     """Return an auth_ok message."""
-    return {"type": TYPE_AUTH_OK, "ha_version": __version__}
+    message = {"type": TYPE_AUTH_OK, "ha_version": __version__}
+    if coalesce_messages:
+        message["coalesce_messages"] = True
+    return message
 
 
 def auth_required_message():
@@ -70,19 +74,26 @@ class AuthPhase:
                 msg["access_token"]
             )
             if refresh_token is not None:
-                return await self._async_finish_auth(refresh_token.user, refresh_token)
+                return await self._async_finish_auth(
+                    refresh_token.user, refresh_token, msg["coalesce_messages"]
+                )
 
         self._send_message(auth_invalid_message("Invalid access token or password"))
         await process_wrong_login(self._request)
         raise Disconnect
 
     async def _async_finish_auth(
-        self, user: User, refresh_token: RefreshToken
+        self, user: User, refresh_token: RefreshToken, coalesce_messages: bool
     ) -> ActiveConnection:
         """Create an active connection."""
         self._logger.debug("Auth OK")
         await process_success_login(self._request)
-        self._send_message(auth_ok_message())
+        self._send_message(auth_ok_message(coalesce_messages))
         return ActiveConnection(
-            self._logger, self._hass, self._send_message, user, refresh_token
+            self._logger,
+            self._hass,
+            self._send_message,
+            user,
+            refresh_token,
+            coalesce_messages=coalesce_messages,
         )
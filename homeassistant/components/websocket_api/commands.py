@@ -14,9 +14,13 @@ from homeassistant.exceptions import (
     Unauthorized,
 )
 from homeassistant.helpers import config_validation as cv, entity
-from homeassistant.helpers.event import TrackTemplate, async_track_template_result
+from homeassistant.helpers.event import (
+    TrackTemplate,
+    async_track_state_change_event,
+    async_track_template_result,
+)
 from homeassistant.helpers.service import async_get_all_descriptions
-from homeassistant.helpers.template import Template
+from homeassistant.helpers.template import Template, async_cache_info
 from homeassistant.loader import IntegrationNotFound, async_get_integration
 
 from . import const, decorators, messages
@@ -31,10 +35,12 @@ def async_register_commands(hass, async_reg):
     async_reg(hass, handle_unsubscribe_events)
     async_reg(hass, handle_call_service)
     async_reg(hass, handle_get_states)
+    async_reg(hass, handle_subscribe_entities)
     async_reg(hass, handle_get_services)
     async_reg(hass, handle_get_config)
     async_reg(hass, handle_ping)
     async_reg(hass, handle_render_template)
+    async_reg(hass, handle_template_cache_info)
     async_reg(hass, handle_manifest_list)
     async_reg(hass, handle_manifest_get)
     async_reg(hass, handle_entity_source)
@@ -182,7 +188,157 @@ def handle_get_states(hass, connection, msg):
             if entity_perm(state.entity_id, "read")
         ]
 
-    connection.send_message(messages.result_message(msg["id"], states))
+    try:
+        states_json = _states_json(hass).async_get(states)
+    except (ValueError, TypeError):
+        # Let the message serialization report the bad data
+        connection.send_message(messages.result_message(msg["id"], states))
+        return
+
+    connection.send_message(messages.result_message_json(msg["id"], states_json))
+
+
+class _StatesJSON:
+    """Keep the JSON of each state so get_states does not serialize it again.
+
+    A fragment belongs to the state object it was created from, states
+    are replaced when they change. The fragments of changed and removed
+    entities are dropped on state_changed.
+    """
+
+    def __init__(self, hass):
+        """Initialize the fragments."""
+        self._fragments = {}
+        hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
+
+    @callback
+    def _async_state_changed(self, event):
+        """Drop the fragment of a changed entity."""
+        self._fragments.pop(event.data["entity_id"], None)
+
+    @callback
+    def async_get(self, states):
+        """Return the JSON array of states."""
+        fragments = self._fragments
+        parts = []
+        for state in states:
+            fragment = fragments.get(state.entity_id)
+            if fragment is None or fragment[0] is not state:
+                fragment = fragments[state.entity_id] = (
+                    state,
+                    const.JSON_DUMP(state),
+                )
+            parts.append(fragment[1])
+        return f"[{', '.join(parts)}]"
+
+
+@callback
+def _states_json(hass):
+    """Return the state JSON fragments of hass."""
+    states_json = hass.data.get(const.DATA_STATES_JSON)
+    if states_json is None:
+        states_json = hass.data[const.DATA_STATES_JSON] = _StatesJSON(hass)
+    return states_json
+
+
+@callback
+@decorators.websocket_command(
+    {
+        vol.Required("type"): "subscribe_entities",
+        vol.Optional("entity_ids"): cv.entity_ids,
+    }
+)
+def handle_subscribe_entities(hass, connection, msg):
+    """Handle subscribe entities command.
+
+    Sends the compressed states of the entities once, then only what
+    changed. The changes of one iteration of the event loop are sent
+    together in one message.
+    """
+    entity_ids = msg.get("entity_ids")
+    entity_perm = connection.user.permissions.check_entity
+    access_all = connection.user.permissions.access_all_entities("read")
+    # The first old state and the last new state of each changed entity
+    pending = {}
+    flush_handle = None
+
+    @callback
+    def forward_entity_changes(event):
+        """Collect the state changes of the current loop iteration."""
+        nonlocal flush_handle
+        entity_id = event.data["entity_id"]
+        if not access_all and not entity_perm(entity_id, POLICY_READ):
+            return
+
+        changes = pending.get(entity_id)
+        if changes is None:
+            pending[entity_id] = (event.data["old_state"], event.data["new_state"])
+        else:
+            pending[entity_id] = (changes[0], event.data["new_state"])
+
+        if flush_handle is None:
+            flush_handle = hass.loop.call_soon(flush_entity_changes)
+
+    @callback
+    def flush_entity_changes():
+        """Send the changes of the entities in one message."""
+        nonlocal flush_handle
+        flush_handle = None
+        added = {}
+        changed = {}
+        removed = []
+        for entity_id, (old_state, new_state) in pending.items():
+            if new_state is None:
+                if old_state is not None:
+                    removed.append(entity_id)
+            elif old_state is None:
+                added[entity_id] = messages.compressed_state_dict(new_state)
+            else:
+                diff = messages.compressed_state_diff(old_state, new_state)
+                if diff is not None:
+                    changed[entity_id] = diff
+        pending.clear()
+
+        entity_event = {}
+        if added:
+            entity_event[messages.ENTITY_EVENT_ADD] = added
+        if changed:
+            entity_event[messages.ENTITY_EVENT_CHANGE] = changed
+        if removed:
+            entity_event[messages.ENTITY_EVENT_REMOVE] = removed
+        if entity_event:
+            connection.send_message(messages.event_message(msg["id"], entity_event))
+
+    if entity_ids is None:
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, forward_entity_changes)
+        states = hass.states.async_all()
+    else:
+        unsub = async_track_state_change_event(hass, entity_ids, forward_entity_changes)
+        states = [
+            state for state in map(hass.states.get, entity_ids) if state is not None
+        ]
+
+    @callback
+    def unsubscribe():
+        """Stop forwarding the changes."""
+        unsub()
+        if flush_handle is not None:
+            flush_handle.cancel()
+
+    connection.subscriptions[msg["id"]] = unsubscribe
+    connection.send_result(msg["id"])
+    connection.send_message(
+        messages.event_message(
+            msg["id"],
+            {
+                messages.ENTITY_EVENT_ADD: {
+                    state.entity_id: messages.compressed_state_dict(state)
+                    for state in states
+                    if access_all or entity_perm(state.entity_id, POLICY_READ)
+                }
+            },
+        )
+    )
 
 
 @decorators.websocket_command({vol.Required("type"): "get_services"})
@@ -346,6 +502,14 @@ def handle_entity_source(hass, connection, msg):
     connection.send_result(msg["id"], sources)
 
 
+@callback
+@decorators.websocket_command({vol.Required("type"): "template/cache_info"})
+@decorators.require_admin
+def handle_template_cache_info(hass, connection, msg):
+    """Handle template cache info command."""
+    connection.send_result(msg["id"], async_cache_info(hass))
+
+
 @callback
 @decorators.websocket_command(
     {
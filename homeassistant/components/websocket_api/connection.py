@@ -15,7 +15,9 @@ from . import const, messages
 class ActiveConnection:
     """Handle an active websocket client connection."""
 
-    def __init__(self, logger, hass, send_message, user, refresh_token):
+    def __init__(
+        self, logger, hass, send_message, user, refresh_token, coalesce_messages=False
+    ):
         """Initialize an active connection."""
         self.logger = logger
         self.hass = hass
@@ -26,6 +28,8 @@ class ActiveConnection:
         else:
             self.refresh_token_id = None
 
+        # The client accepts multiple messages in a single JSON array frame
+        self.coalesce_messages = coalesce_messages
         self.subscriptions: Dict[Hashable, Callable[[], Any]] = {}
         self.last_id = 0
 
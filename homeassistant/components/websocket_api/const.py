@@ -1,12 +1,10 @@
 """Websocket constants."""
 import asyncio
 from concurrent import futures
-from functools import partial
-import json
 from typing import TYPE_CHECKING, Callable
 
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.json import JSONEncoder
+from homeassistant.helpers.json import json_dumps
 
 if TYPE_CHECKING:
     from .connection import ActiveConnection  # noqa
@@ -19,6 +17,18 @@ URL = "/api/websocket"
 PENDING_MSG_PEAK = 512
 PENDING_MSG_PEAK_TIME = 5
 MAX_PENDING_MSG = 2048
+# Backlog no client is allowed beyond, however fast it receives
+MAX_PENDING_MSG_LIMIT = 16384
+CONF_COMPRESSION_LEVEL = "compression_level"
+CONF_COMPRESSION_MIN_SIZE = "compression_min_size"
+DEFAULT_COMPRESSION_LEVEL = 1
+# Smaller messages do not shrink enough to be worth the CPU time
+DEFAULT_COMPRESSION_MIN_SIZE = 128
+
+# Weight of the latest write when tracking how fast a client receives
+WRITE_RATE_SMOOTHING = 0.2
+# Seconds a backlog is drained before its rate is taken into account
+WRITE_RATE_INTERVAL = 1
 
 ERR_ID_REUSE = "id_reuse"
 ERR_INVALID_FORMAT = "invalid_format"
@@ -44,5 +54,10 @@ SIGNAL_WEBSOCKET_DISCONNECTED = "websocket_disconnected"
 
 # Data used to store the current connection list
 DATA_CONNECTIONS = f"{DOMAIN}.connections"
+# Data used to store the bytes sent before and after compression
+DATA_BYTES_UNCOMPRESSED = f"{DOMAIN}.bytes_uncompressed"
+DATA_BYTES_COMPRESSED = f"{DOMAIN}.bytes_compressed"
+# Data used to store the JSON of the states for get_states
+DATA_STATES_JSON = f"{DOMAIN}.states_json"
 
-JSON_DUMP = partial(json.dumps, cls=JSONEncoder, allow_nan=False)
+JSON_DUMP = json_dumps
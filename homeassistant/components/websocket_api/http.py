@@ -1,10 +1,15 @@
 """View to accept incoming websocket connection."""
 import asyncio
+from collections import deque
 from contextlib import suppress
 import logging
-from typing import Optional
+import struct
+import time
+from typing import Deque, Optional
+import zlib
 
-from aiohttp import WSMsgType, web
+from aiohttp import WSMsgType, __version__ as aiohttp_version, web
+from aiohttp.http_websocket import WebSocketWriter
 import async_timeout
 
 from homeassistant.components.http import HomeAssistantView
@@ -15,13 +20,20 @@ from homeassistant.helpers.event import async_call_later
 from .auth import AuthPhase, auth_required_message
 from .const import (
     CANCELLATION_ERRORS,
+    DATA_BYTES_COMPRESSED,
+    DATA_BYTES_UNCOMPRESSED,
     DATA_CONNECTIONS,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_COMPRESSION_MIN_SIZE,
     MAX_PENDING_MSG,
+    MAX_PENDING_MSG_LIMIT,
     PENDING_MSG_PEAK,
     PENDING_MSG_PEAK_TIME,
     SIGNAL_WEBSOCKET_CONNECTED,
     SIGNAL_WEBSOCKET_DISCONNECTED,
     URL,
+    WRITE_RATE_INTERVAL,
+    WRITE_RATE_SMOOTHING,
 )
 from .error import Disconnect
 from .messages import message_to_json
@@ -29,6 +41,10 @@ from .messages import message_to_json
 # mypy: allow-untyped-calls, allow-untyped-defs, no-check-untyped-defs
 _WS_LOGGER = logging.getLogger(f"{__name__}.connection")
 
+# The deflate writer replaces internals of the aiohttp 3.7 websocket writer
+DEFLATE_WRITER_SUPPORTED = aiohttp_version.split(".")[:2] == ["3", "7"]
+_DEFLATE_TRAILING = b"\x00\x00\xff\xff"
+
 
 class WebsocketAPIView(HomeAssistantView):
     """View to serve a websockets endpoint."""
@@ -37,9 +53,130 @@ class WebsocketAPIView(HomeAssistantView):
     url = URL
     requires_auth = False
 
+    def __init__(
+        self,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+        compression_min_size=DEFAULT_COMPRESSION_MIN_SIZE,
+    ):
+        """Initialize the websocket view."""
+        self.compression_level = compression_level
+        self.compression_min_size = compression_min_size
+
     async def get(self, request: web.Request) -> web.WebSocketResponse:
         """Handle an incoming websocket connection."""
-        return await WebSocketHandler(request.app["hass"], request).async_handle()
+        return await WebSocketHandler(
+            request.app["hass"],
+            request,
+            self.compression_level,
+            self.compression_min_size,
+        ).async_handle()
+
+
+class DeflateWebSocketWriter(WebSocketWriter):
+    """Write frames compressed with the configured level and minimum size.
+
+    The compressor context is shared by all frames of the connection so
+    repeated entity ids and attribute keys compress well. Frames below
+    the minimum size are sent uncompressed, which permessage-deflate
+    allows per frame.
+
+    aiohttp can neither set the compression level nor skip compressing
+    single frames, so data frames are framed here. This relies on the
+    internals of aiohttp 3.7, see DEFLATE_WRITER_SUPPORTED.
+    """
+
+    def __init__(
+        self,
+        hass,
+        protocol,
+        transport,
+        *,
+        compression_level,
+        compression_min_size,
+        **kwargs,
+    ):
+        """Initialize the writer."""
+        super().__init__(protocol, transport, **kwargs)
+        self._hass = hass
+        self._compression_min_size = compression_min_size
+        if self.compress:
+            self._compressobj = zlib.compressobj(
+                level=compression_level, wbits=-self.compress
+            )
+
+    async def _send_frame(self, message, opcode, compress=None):
+        """Send a frame and count its payload before and after compression."""
+        if opcode >= WSMsgType.CLOSE or not self.compress or self.use_mask:
+            await super()._send_frame(message, opcode, compress)
+            if opcode < WSMsgType.CLOSE:
+                self._async_count_bytes(len(message), len(message))
+            return
+
+        payload = message
+        rsv = 0
+        if len(message) >= self._compression_min_size:
+            payload = self._compressobj.compress(message) + self._compressobj.flush(
+                zlib.Z_FULL_FLUSH if self.notakeover else zlib.Z_SYNC_FLUSH
+            )
+            if payload.endswith(_DEFLATE_TRAILING):
+                payload = payload[:-4]
+            rsv = 0x40
+
+        await self._send_data_frame(payload, opcode, rsv)
+        self._async_count_bytes(len(message), len(payload))
+
+    async def _send_data_frame(self, payload, opcode, rsv):
+        """Write an unmasked data frame like the aiohttp writer does."""
+        if self._closing:
+            raise ConnectionResetError("Cannot write to closing transport")
+
+        length = len(payload)
+        first = 0x80 | rsv | opcode
+        if length < 126:
+            header = struct.pack("!BB", first, length)
+        elif length < (1 << 16):
+            header = struct.pack("!BBH", first, 126, length)
+        else:
+            header = struct.pack("!BBQ", first, 127, length)
+        self._write(header + payload)
+
+        self._output_size += len(header) + length
+        if self._output_size > self._limit:
+            self._output_size = 0
+            await self.protocol._drain_helper()  # pylint: disable=protected-access
+
+    @callback
+    def _async_count_bytes(self, uncompressed, compressed):
+        """Count the payload bytes of a data frame."""
+        data = self._hass.data
+        data[DATA_BYTES_UNCOMPRESSED] = (
+            data.get(DATA_BYTES_UNCOMPRESSED, 0) + uncompressed
+        )
+        data[DATA_BYTES_COMPRESSED] = data.get(DATA_BYTES_COMPRESSED, 0) + compressed
+
+
+class DeflateWebSocketResponse(web.WebSocketResponse):
+    """Websocket response using the deflate websocket writer."""
+
+    def __init__(self, hass, compression_level, compression_min_size, **kwargs):
+        """Initialize the response."""
+        super().__init__(compress=compression_level > 0, **kwargs)
+        self._hass = hass
+        self._compression_level = compression_level
+        self._compression_min_size = compression_min_size
+
+    def _pre_start(self, request):
+        """Replace the writer once the compression is negotiated."""
+        protocol, writer = super()._pre_start(request)
+        return protocol, DeflateWebSocketWriter(
+            self._hass,
+            writer.protocol,
+            writer.transport,
+            compress=writer.compress,
+            notakeover=writer.notakeover,
+            compression_level=self._compression_level,
+            compression_min_size=self._compression_min_size,
+        )
 
 
 class WebSocketAdapter(logging.LoggerAdapter):
@@ -53,37 +190,145 @@ class WebSocketAdapter(logging.LoggerAdapter):
 class WebSocketHandler:
     """Handle an active websocket client connection."""
 
-    def __init__(self, hass, request):
+    def __init__(
+        self,
+        hass,
+        request,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+        compression_min_size=DEFAULT_COMPRESSION_MIN_SIZE,
+    ):
         """Initialize an active connection."""
         self.hass = hass
         self.request = request
+        self._compression_level = compression_level
+        self._compression_min_size = compression_min_size
         self.wsock: Optional[web.WebSocketResponse] = None
-        self._to_write: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_MSG)
+        self._to_write: asyncio.Queue = asyncio.Queue()
         self._handle_task = None
         self._writer_task = None
         self._logger = WebSocketAdapter(_WS_LOGGER, {"connid": id(self)})
         self._peak_checker_unsub = None
+        # Set while the client keeps up, incoming commands wait for it
+        self._write_ready = asyncio.Event()
+        self._write_ready.set()
+        # Commands received while the client catches up
+        self._deferred: Deque = deque()
+        self._receive_task: Optional[asyncio.Task] = None
+        # Messages per second the client has been able to receive
+        self._write_rate = 0.0
+        # Start of the current backlog and the messages written since
+        self._backlog_start: Optional[float] = None
+        self._backlog_written = 0
+        self._coalesce_messages = False
 
     async def _writer(self):
         """Write outgoing messages."""
+        to_write = self._to_write
         # Exceptions if Socket disconnected or cancelled by connection handler
         with suppress(RuntimeError, ConnectionResetError, *CANCELLATION_ERRORS):
             while not self.wsock.closed:
-                message = await self._to_write.get()
+                message = await to_write.get()
                 if message is None:
                     break
 
-                self._logger.debug("Sending %s", message)
+                messages = [message]
+                closing = False
+                if self._coalesce_messages:
+                    while not to_write.empty():
+                        message = to_write.get_nowait()
+                        if message is None:
+                            closing = True
+                            break
+                        messages.append(message)
+
+                self._logger.debug("Sending %s", messages)
+
+                messages = [
+                    message if isinstance(message, str) else message_to_json(message)
+                    for message in messages
+                ]
+                if len(messages) == 1:
+                    await self.wsock.send_str(messages[0])
+                else:
+                    await self.wsock.send_str(f"[{','.join(messages)}]")
 
-                if not isinstance(message, str):
-                    message = message_to_json(message)
+                self._async_track_backlog(len(messages))
+                if (
+                    not self._write_ready.is_set()
+                    and to_write.qsize() <= self._write_peak() // 2
+                ):
+                    self._write_ready.set()
 
-                await self.wsock.send_str(message)
+                if closing:
+                    break
 
         # Clean up the peaker checker when we shut down the writer
         if self._peak_checker_unsub:
             self._peak_checker_unsub()
             self._peak_checker_unsub = None
+        self._write_ready.set()
+
+    @callback
+    def _async_track_backlog(self, count):
+        """Track how fast the backlog drains.
+
+        Sending a message only buffers it in the transport, the writer
+        waits for the transport once that buffer is full. The rate is
+        therefore measured over the wall time a backlog persists rather
+        than around single sends.
+        """
+        now = time.monotonic()
+        if self._to_write.empty():
+            self._backlog_start = None
+            return
+
+        if self._backlog_start is None:
+            self._backlog_start = now
+            self._backlog_written = 0
+            return
+
+        self._backlog_written += count
+        elapsed = now - self._backlog_start
+        if elapsed < WRITE_RATE_INTERVAL:
+            return
+
+        self._async_update_write_rate(self._backlog_written, elapsed)
+        self._backlog_start = now
+        self._backlog_written = 0
+
+    @callback
+    def _async_update_write_rate(self, count, elapsed):
+        """Track how fast the client receives messages."""
+        if elapsed <= 0:
+            return
+        rate = count / elapsed
+        if self._write_rate:
+            rate = (
+                WRITE_RATE_SMOOTHING * rate
+                + (1 - WRITE_RATE_SMOOTHING) * self._write_rate
+            )
+        self._write_rate = rate
+
+    @callback
+    def _max_pending(self):
+        """Return the backlog allowed before a client is disconnected.
+
+        Clients that are known to receive messages quickly are allowed
+        the backlog they can catch up on within the peak time, up to a
+        hard limit.
+        """
+        return min(
+            MAX_PENDING_MSG_LIMIT,
+            max(MAX_PENDING_MSG, int(self._write_rate * PENDING_MSG_PEAK_TIME)),
+        )
+
+    @callback
+    def _write_peak(self):
+        """Return the backlog a client has to drain below within the peak time.
+
+        It is scaled with the backlog the client is allowed.
+        """
+        return PENDING_MSG_PEAK * self._max_pending() // MAX_PENDING_MSG
 
     @callback
     def _send_message(self, message):
@@ -93,21 +338,26 @@ class WebSocketHandler:
 
         Async friendly.
         """
-        try:
-            self._to_write.put_nowait(message)
-        except asyncio.QueueFull:
+        to_write = self._to_write
+        if to_write.qsize() >= self._max_pending():
             self._logger.error(
-                "Client exceeded max pending messages [2]: %s", MAX_PENDING_MSG
+                "Client exceeded max pending messages [2]: %s", self._max_pending()
             )
 
             self._cancel()
+            return
+
+        to_write.put_nowait(message)
 
-        if self._to_write.qsize() < PENDING_MSG_PEAK:
+        if to_write.qsize() < self._write_peak():
             if self._peak_checker_unsub:
                 self._peak_checker_unsub()
                 self._peak_checker_unsub = None
             return
 
+        # Stop handling commands of the client until it caught up
+        self._write_ready.clear()
+
         if self._peak_checker_unsub is None:
             self._peak_checker_unsub = async_call_later(
                 self.hass, PENDING_MSG_PEAK_TIME, self._check_write_peak
@@ -118,16 +368,56 @@ class WebSocketHandler:
         """Check that we are no longer above the write peak."""
         self._peak_checker_unsub = None
 
-        if self._to_write.qsize() < PENDING_MSG_PEAK:
+        write_peak = self._write_peak()
+        if self._to_write.qsize() < write_peak:
             return
 
         self._logger.error(
             "Client unable to keep up with pending messages. Stayed over %s for %s seconds",
-            PENDING_MSG_PEAK,
+            write_peak,
             PENDING_MSG_PEAK_TIME,
         )
         self._cancel()
 
+    async def _async_receive(self):
+        """Return the next message to handle.
+
+        The socket keeps being read while the client catches up on its
+        pending messages, so pings are answered and a close is handled.
+        Commands received meanwhile are returned once it caught up.
+        """
+        while not self._write_ready.is_set():
+            if self._receive_task is None:
+                self._receive_task = asyncio.create_task(self.wsock.receive())
+            ready_task = asyncio.create_task(self._write_ready.wait())
+            try:
+                await asyncio.wait(
+                    (self._receive_task, ready_task),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                ready_task.cancel()
+            if not self._receive_task.done():
+                break
+            msg = self._receive_task.result()
+            self._receive_task = None
+            if msg.type != WSMsgType.TEXT:
+                return msg
+            if len(self._deferred) >= PENDING_MSG_PEAK:
+                self._logger.error(
+                    "Client sent more than %s messages while catching up",
+                    PENDING_MSG_PEAK,
+                )
+                self._cancel()
+            self._deferred.append(msg)
+
+        if self._deferred:
+            return self._deferred.popleft()
+        if self._receive_task is not None:
+            receive_task, self._receive_task = self._receive_task, None
+            return await receive_task
+        return await self.wsock.receive()
+
     @callback
     def _cancel(self):
         """Cancel the connection."""
@@ -137,7 +427,17 @@ class WebSocketHandler:
     async def async_handle(self) -> web.WebSocketResponse:
         """Handle a websocket response."""
         request = self.request
-        wsock = self.wsock = web.WebSocketResponse(heartbeat=55)
+        if DEFLATE_WRITER_SUPPORTED:
+            wsock = self.wsock = DeflateWebSocketResponse(
+                self.hass,
+                self._compression_level,
+                self._compression_min_size,
+                heartbeat=55,
+            )
+        else:
+            wsock = self.wsock = web.WebSocketResponse(
+                heartbeat=55, compress=self._compression_level > 0
+            )
         await wsock.prepare(request)
         self._logger.debug("Connected from %s", request.remote)
         self._handle_task = asyncio.current_task()
@@ -185,6 +485,7 @@ class WebSocketHandler:
 
             self._logger.debug("Received %s", msg_data)
             connection = await auth.async_handle(msg_data)
+            self._coalesce_messages = connection.coalesce_messages
             self.hass.data[DATA_CONNECTIONS] = (
                 self.hass.data.get(DATA_CONNECTIONS, 0) + 1
             )
@@ -194,7 +495,7 @@ class WebSocketHandler:
 
             # Command phase
             while not wsock.closed:
-                msg = await wsock.receive()
+                msg = await self._async_receive()
 
                 if msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSING):
                     break
@@ -232,10 +533,11 @@ class WebSocketHandler:
                 # Make sure all error messages are written before closing
                 await self._writer_task
                 await wsock.close()
-            except asyncio.QueueFull:  # can be raised by put_nowait
-                self._writer_task.cancel()
-
             finally:
+                # Closing the websocket ends a pending receive
+                if self._receive_task is not None:
+                    self._receive_task.cancel()
+
                 if disconnect_warn is None:
                     self._logger.debug("Disconnected")
                 else:
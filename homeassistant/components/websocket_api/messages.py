@@ -2,11 +2,11 @@
 
 from functools import lru_cache
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import voluptuous as vol
 
-from homeassistant.core import Event
+from homeassistant.core import Context, Event, State
 from homeassistant.helpers import config_validation as cv
 from homeassistant.util.json import (
     find_paths_unserializable_data,
@@ -31,12 +31,31 @@ BASE_COMMAND_MESSAGE_SCHEMA = vol.Schema({vol.Required("id"): cv.positive_int})
 IDEN_TEMPLATE = "__IDEN__"
 IDEN_JSON_TEMPLATE = '"__IDEN__"'
 
+# Keys of the compressed states of the subscribe_entities command
+COMPRESSED_STATE_STATE = "s"
+COMPRESSED_STATE_ATTRIBUTES = "a"
+COMPRESSED_STATE_CONTEXT = "c"
+COMPRESSED_STATE_LAST_CHANGED = "lc"
+COMPRESSED_STATE_LAST_UPDATED = "lu"
+
+ENTITY_EVENT_ADD = "a"
+ENTITY_EVENT_REMOVE = "r"
+ENTITY_EVENT_CHANGE = "c"
+
 
 def result_message(iden: int, result: Any = None) -> Dict:
     """Return a success result message."""
     return {"id": iden, "type": const.TYPE_RESULT, "success": True, "result": result}
 
 
+def result_message_json(iden: int, result_json: str) -> str:
+    """Return a success result message with an already serialized result."""
+    return (
+        f'{{"id": {iden}, "type": "{const.TYPE_RESULT}", "success": true, '
+        f'"result": {result_json}}}'
+    )
+
+
 def error_message(iden: int, code: str, message: str) -> Dict:
     """Return an error result message."""
     return {
@@ -74,6 +93,68 @@ def _cached_event_message(event: Event) -> str:
     return message_to_json(event_message(IDEN_TEMPLATE, event))
 
 
+def compressed_state_dict(state: State) -> Dict:
+    """Return the compressed form of a state.
+
+    The last updated time is left out when it is the last changed time.
+    """
+    compressed = {
+        COMPRESSED_STATE_STATE: state.state,
+        COMPRESSED_STATE_ATTRIBUTES: dict(state.attributes),
+        COMPRESSED_STATE_CONTEXT: _compressed_context(state.context),
+        COMPRESSED_STATE_LAST_CHANGED: state.last_changed.timestamp(),
+    }
+    if state.last_changed != state.last_updated:
+        compressed[COMPRESSED_STATE_LAST_UPDATED] = state.last_updated.timestamp()
+    return compressed
+
+
+def compressed_state_diff(old_state: State, new_state: State) -> Optional[Dict]:
+    """Return the fields that changed between two states of an entity.
+
+    Added and changed fields are under "+" and the keys of removed
+    attributes under "-". Returns None when nothing changed.
+    """
+    additions: Dict[str, Any] = {}
+    if old_state.state != new_state.state:
+        additions[COMPRESSED_STATE_STATE] = new_state.state
+    if old_state.last_changed != new_state.last_changed:
+        additions[COMPRESSED_STATE_LAST_CHANGED] = new_state.last_changed.timestamp()
+    elif old_state.last_updated != new_state.last_updated:
+        additions[COMPRESSED_STATE_LAST_UPDATED] = new_state.last_updated.timestamp()
+    if old_state.context is not new_state.context:
+        additions[COMPRESSED_STATE_CONTEXT] = _compressed_context(new_state.context)
+
+    diff: Dict[str, Any] = {}
+    old_attributes = old_state.attributes
+    new_attributes = new_state.attributes
+    # Unchanged attributes are often the same mapping, see StateMachine.async_set
+    if old_attributes is not new_attributes:
+        changed_attributes = {
+            key: value
+            for key, value in new_attributes.items()
+            if key not in old_attributes or old_attributes[key] != value
+        }
+        if changed_attributes:
+            additions[COMPRESSED_STATE_ATTRIBUTES] = changed_attributes
+        removed_attributes = [
+            key for key in old_attributes if key not in new_attributes
+        ]
+        if removed_attributes:
+            diff["-"] = {COMPRESSED_STATE_ATTRIBUTES: removed_attributes}
+
+    if additions:
+        diff["+"] = additions
+    return diff or None
+
+
+def _compressed_context(context: Context) -> Any:
+    """Return the id of a context, or the whole context when it has more."""
+    if context.parent_id is None and context.user_id is None:
+        return context.id
+    return context.as_dict()
+
+
 def message_to_json(message: Any) -> str:
     """Serialize a websocket message to json."""
     try:
@@ -1,9 +1,12 @@
 """Entity to track connections to websocket API."""
 
+from homeassistant.const import DATA_BYTES
 from homeassistant.core import callback
 from homeassistant.helpers.entity import Entity
 
 from .const import (
+    DATA_BYTES_COMPRESSED,
+    DATA_BYTES_UNCOMPRESSED,
     DATA_CONNECTIONS,
     SIGNAL_WEBSOCKET_CONNECTED,
     SIGNAL_WEBSOCKET_DISCONNECTED,
@@ -16,7 +19,13 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
     """Set up the API streams platform."""
     entity = APICount()
 
-    async_add_entities([entity])
+    async_add_entities(
+        [
+            entity,
+            APIBytes("Sent bytes uncompressed", DATA_BYTES_UNCOMPRESSED),
+            APIBytes("Sent bytes compressed", DATA_BYTES_COMPRESSED),
+        ]
+    )
 
 
 class APICount(Entity):
@@ -58,3 +67,30 @@ class APICount(Entity):
     def _update_count(self):
         self.count = self.hass.data.get(DATA_CONNECTIONS, 0)
         self.async_write_ha_state()
+
+
+class APIBytes(Entity):
+    """Entity to represent the bytes sent to websocket clients.
+
+    The counters change with every message, so they are polled.
+    """
+
+    def __init__(self, name, data_key):
+        """Initialize the byte counter."""
+        self._name = name
+        self._data_key = data_key
+
+    @property
+    def name(self):
+        """Return name of entity."""
+        return self._name
+
+    @property
+    def state(self):
+        """Return the bytes sent."""
+        return self.hass.data.get(self._data_key, 0)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return DATA_BYTES
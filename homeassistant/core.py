@@ -29,6 +29,7 @@ from typing import (
     Mapping,
     Optional,
     Set,
+    Tuple,
     TypeVar,
     Union,
     cast,
@@ -221,6 +222,7 @@ class HomeAssistant:
         self._pending_tasks: list = []
         self._track_task = True
         self.bus = EventBus(self)
+        self.timer = Timer(self)
         self.services = ServiceRegistry(self)
         self.states = StateMachine(self.bus, self.loop)
         self.config = Config(self)
@@ -651,6 +653,12 @@ class EventBus:
     def __init__(self, hass: HomeAssistant) -> None:
         """Initialize a new event bus."""
         self._listeners: Dict[str, List[HassJob]] = {}
+        # The listeners of each fired event type, including the MATCH_ALL
+        # listeners, split in callbacks and other jobs. Rebuilt after
+        # listeners are added or removed.
+        self._dispatch: Dict[
+            str, Tuple[Tuple[Callable[[Event], None], ...], Tuple[HassJob, ...]]
+        ] = {}
         self._hass = hass
 
     @callback
@@ -691,6 +699,29 @@ class EventBus:
 
         This method must be run in the event loop.
         """
+        dispatch = self._dispatch.get(event_type)
+        if dispatch is None:
+            dispatch = self._async_build_dispatch(event_type)
+        callbacks, jobs = dispatch
+
+        event = Event(event_type, event_data, origin, time_fired, context)
+
+        if event_type != EVENT_TIME_CHANGED:
+            _LOGGER.debug("Bus:Handling %s", event)
+
+        if len(callbacks) == 1:
+            self._hass.loop.call_soon(callbacks[0], event)
+        elif callbacks:
+            self._hass.loop.call_soon(self._async_run_callbacks, callbacks, event)
+
+        for job in jobs:
+            self._hass.async_add_hass_job(job, event)
+
+    @callback
+    def _async_build_dispatch(
+        self, event_type: str
+    ) -> Tuple[Tuple[Callable[[Event], None], ...], Tuple[HassJob, ...]]:
+        """Build the listeners to call when an event_type is fired."""
         listeners = self._listeners.get(event_type, [])
 
         # EVENT_HOMEASSISTANT_CLOSE should go only to his listeners
@@ -698,16 +729,35 @@ class EventBus:
         if match_all_listeners is not None and event_type != EVENT_HOMEASSISTANT_CLOSE:
             listeners = match_all_listeners + listeners
 
-        event = Event(event_type, event_data, origin, time_fired, context)
-
-        if event_type != EVENT_TIME_CHANGED:
-            _LOGGER.debug("Bus:Handling %s", event)
+        dispatch = self._dispatch[event_type] = (
+            tuple(
+                job.target for job in listeners if job.job_type == HassJobType.Callback
+            ),
+            tuple(job for job in listeners if job.job_type != HassJobType.Callback),
+        )
+        return dispatch
 
-        if not listeners:
-            return
+    @callback
+    def _async_run_callbacks(
+        self, callbacks: Tuple[Callable[[Event], None], ...], event: Event
+    ) -> None:
+        """Run the callback listeners of an event in a single loop iteration."""
+        for target in callbacks:
+            try:
+                target(event)
+            except Exception as exc:  # pylint: disable=broad-except
+                # Log it like the loop would for a callback of its own
+                self._hass.loop.call_exception_handler(
+                    {"message": f"Exception in callback {target}", "exception": exc}
+                )
 
-        for job in listeners:
-            self._hass.async_add_hass_job(job, event)
+    @callback
+    def _async_invalidate_dispatch(self, event_type: str) -> None:
+        """Rebuild the dispatch of event_type when it is fired next."""
+        if event_type == MATCH_ALL:
+            self._dispatch.clear()
+        else:
+            self._dispatch.pop(event_type, None)
 
     def listen(self, event_type: str, listener: Callable) -> CALLBACK_TYPE:
         """Listen for all events or events of a specific type.
@@ -739,6 +789,9 @@ class EventBus:
     @callback
     def _async_listen_job(self, event_type: str, hassjob: HassJob) -> CALLBACK_TYPE:
         self._listeners.setdefault(event_type, []).append(hassjob)
+        self._async_invalidate_dispatch(event_type)
+        if event_type == EVENT_TIME_CHANGED:
+            self._hass.timer.async_resume()
 
         def remove_listener() -> None:
             """Remove the listener."""
@@ -805,6 +858,7 @@ class EventBus:
         """
         try:
             self._listeners[event_type].remove(hassjob)
+            self._async_invalidate_dispatch(event_type)
 
             # delete event_type list if empty
             if not self._listeners[event_type]:
@@ -815,6 +869,125 @@ class EventBus:
             _LOGGER.exception("Unable to remove unknown job listener %s", hassjob)
 
 
+class Timer:
+    """Call the listeners of the timer tick once a second.
+
+    All listeners are called in a single loop callback. EVENT_TIME_CHANGED
+    is only fired when the event bus has listeners for that event type,
+    and the tick is suspended while nothing listens at all.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the timer."""
+        self._hass = hass
+        self._listeners: Tuple[Callable[[datetime.datetime], None], ...] = ()
+        self._context = Context()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._running = False
+
+    @property
+    def _has_listeners(self) -> bool:
+        """Return if anything listens to the tick."""
+        # pylint: disable=protected-access
+        return bool(self._listeners) or EVENT_TIME_CHANGED in self._hass.bus._listeners
+
+    @callback
+    def async_listen(
+        self, listener: Callable[[datetime.datetime], None]
+    ) -> CALLBACK_TYPE:
+        """Call a callback with the current time every second.
+
+        The listener must be a callback, it runs inside the tick.
+
+        This method must be run in the event loop.
+        """
+        self._listeners += (listener,)
+        self.async_resume()
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the listener."""
+            listeners = list(self._listeners)
+            try:
+                listeners.remove(listener)
+            except ValueError:
+                _LOGGER.exception(
+                    "Unable to remove unknown timer listener %s", listener
+                )
+                return
+            self._listeners = tuple(listeners)
+
+        return remove_listener
+
+    @callback
+    def async_start(self) -> None:
+        """Start ticking, as long as anything listens."""
+        self._running = True
+        self.async_resume()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop ticking."""
+        self._running = False
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    @callback
+    def async_resume(self) -> None:
+        """Schedule the next tick when the timer was suspended."""
+        if self._running and self._handle is None and self._has_listeners:
+            self._async_schedule_tick(dt_util.utcnow())
+
+    @callback
+    def async_call_listeners(self, now: datetime.datetime) -> None:
+        """Call the listeners of the tick with now."""
+        for listener in self._listeners:
+            try:
+                listener(now)
+            except Exception as exc:  # pylint: disable=broad-except
+                # Log it like the loop would for a callback of its own
+                self._hass.loop.call_exception_handler(
+                    {"message": f"Exception in callback {listener}", "exception": exc}
+                )
+
+    @callback
+    def _async_schedule_tick(self, now: datetime.datetime) -> None:
+        """Schedule a tick when the next second rolls around."""
+        slp_seconds = 1 - (now.microsecond / 10 ** 6)
+        target = monotonic() + slp_seconds
+        self._handle = self._hass.loop.call_later(slp_seconds, self._async_tick, target)
+
+    @callback
+    def _async_tick(self, target: float) -> None:
+        """Call the listeners and schedule the next tick."""
+        self._handle = None
+        now = dt_util.utcnow()
+
+        self.async_call_listeners(now)
+        # pylint: disable=protected-access
+        if EVENT_TIME_CHANGED in self._hass.bus._listeners:
+            self._hass.bus.async_fire(
+                EVENT_TIME_CHANGED,
+                {ATTR_NOW: now},
+                time_fired=now,
+                context=self._context,
+            )
+
+        # If we are more than a second late, a tick was missed
+        late = monotonic() - target
+        if late > 1:
+            self._hass.bus.async_fire(
+                EVENT_TIMER_OUT_OF_SYNC,
+                {ATTR_SECONDS: late},
+                time_fired=now,
+                context=self._context,
+            )
+
+        if self._running and self._has_listeners:
+            self._async_schedule_tick(now)
+
+
 class State:
     """Object to represent a state within the state machine.
 
@@ -874,6 +1047,39 @@ class State:
         self.domain, self.object_id = split_entity_id(self.entity_id)
         self._as_dict: Optional[Dict[str, Collection[Any]]] = None
 
+    @classmethod
+    def _async_next(
+        cls,
+        old_state: "State",
+        state: str,
+        attributes: Mapping,
+        last_changed: Optional[datetime.datetime],
+        last_updated: datetime.datetime,
+        context: Context,
+    ) -> "State":
+        """Create the next state of the entity of old_state.
+
+        The entity id, domain and object id of old_state are reused, they
+        have been validated already. The attributes are used as is.
+        """
+        if not valid_state(state):
+            raise InvalidStateError(
+                f"Invalid state encountered for entity ID: {old_state.entity_id}. "
+                "State max length is 255 characters."
+            )
+
+        new_state = cls.__new__(cls)
+        new_state.entity_id = old_state.entity_id
+        new_state.domain = old_state.domain
+        new_state.object_id = old_state.object_id
+        new_state.state = state
+        new_state.attributes = attributes
+        new_state.last_updated = last_updated
+        new_state.last_changed = last_changed or last_updated
+        new_state.context = context
+        new_state._as_dict = None  # pylint: disable=protected-access
+        return new_state
+
     @property
     def name(self) -> str:
         """Name of this state."""
@@ -965,6 +1171,8 @@ class StateMachine:
     def __init__(self, bus: EventBus, loop: asyncio.events.AbstractEventLoop) -> None:
         """Initialize state machine."""
         self._states: Dict[str, State] = {}
+        # The states of each domain, kept in sync with _states
+        self._domain_index: Dict[str, Dict[str, State]] = {}
         self._reservations: Set[str] = set()
         self._bus = bus
         self._loop = loop
@@ -988,12 +1196,12 @@ class StateMachine:
             return list(self._states)
 
         if isinstance(domain_filter, str):
-            domain_filter = (domain_filter.lower(),)
+            return list(self._domain_index.get(domain_filter.lower(), ()))
 
         return [
-            state.entity_id
-            for state in self._states.values()
-            if state.domain in domain_filter
+            entity_id
+            for domain in dict.fromkeys(domain_filter)
+            for entity_id in self._domain_index.get(domain, ())
         ]
 
     @callback
@@ -1008,10 +1216,11 @@ class StateMachine:
             return len(self._states)
 
         if isinstance(domain_filter, str):
-            domain_filter = (domain_filter.lower(),)
+            return len(self._domain_index.get(domain_filter.lower(), ()))
 
-        return len(
-            [None for state in self._states.values() if state.domain in domain_filter]
+        return sum(
+            len(self._domain_index.get(domain, ()))
+            for domain in dict.fromkeys(domain_filter)
         )
 
     def all(self, domain_filter: Optional[Union[str, Iterable]] = None) -> List[State]:
@@ -1032,10 +1241,13 @@ class StateMachine:
             return list(self._states.values())
 
         if isinstance(domain_filter, str):
-            domain_filter = (domain_filter.lower(),)
+            domain_states = self._domain_index.get(domain_filter.lower())
+            return [] if domain_states is None else list(domain_states.values())
 
         return [
-            state for state in self._states.values() if state.domain in domain_filter
+            state
+            for domain in dict.fromkeys(domain_filter)
+            for state in self._domain_index.get(domain, {}).values()
         ]
 
     def get(self, entity_id: str) -> Optional[State]:
@@ -1079,6 +1291,11 @@ class StateMachine:
         if old_state is None:
             return False
 
+        domain_states = self._domain_index[old_state.domain]
+        del domain_states[entity_id]
+        if not domain_states:
+            del self._domain_index[old_state.domain]
+
         self._bus.async_fire(
             EVENT_STATE_CHANGED,
             {"entity_id": entity_id, "old_state": old_state, "new_state": None},
@@ -1163,7 +1380,7 @@ class StateMachine:
             last_changed = None
         else:
             same_state = old_state.state == new_state and not force_update
-            same_attr = old_state.attributes == MappingProxyType(attributes)
+            same_attr = old_state.attributes == attributes
             last_changed = old_state.last_changed if same_state else None
 
         if same_state and same_attr:
@@ -1174,16 +1391,21 @@ class StateMachine:
 
         now = dt_util.utcnow()
 
-        state = State(
-            entity_id,
-            new_state,
-            attributes,
-            last_changed,
-            now,
-            context,
-            old_state is None,
-        )
+        if old_state is None:
+            state = State(
+                entity_id, new_state, attributes, last_changed, now, context, True
+            )
+        else:
+            state = State._async_next(  # pylint: disable=protected-access
+                old_state,
+                new_state,
+                old_state.attributes if same_attr else MappingProxyType(attributes),
+                last_changed,
+                now,
+                context,
+            )
         self._states[entity_id] = state
+        self._domain_index.setdefault(state.domain, {})[entity_id] = state
         self._bus.async_fire(
             EVENT_STATE_CHANGED,
             {"entity_id": entity_id, "old_state": old_state, "new_state": state},
@@ -1737,46 +1959,14 @@ class Config:
 
 
 def _async_create_timer(hass: HomeAssistant) -> None:
-    """Create a timer that will start on HOMEASSISTANT_START."""
-    handle = None
-    timer_context = Context()
-
-    def schedule_tick(now: datetime.datetime) -> None:
-        """Schedule a timer tick when the next second rolls around."""
-        nonlocal handle
-
-        slp_seconds = 1 - (now.microsecond / 10 ** 6)
-        target = monotonic() + slp_seconds
-        handle = hass.loop.call_later(slp_seconds, fire_time_event, target)
-
-    @callback
-    def fire_time_event(target: float) -> None:
-        """Fire next time event."""
-        now = dt_util.utcnow()
-
-        hass.bus.async_fire(
-            EVENT_TIME_CHANGED, {ATTR_NOW: now}, time_fired=now, context=timer_context
-        )
-
-        # If we are more than a second late, a tick was missed
-        late = monotonic() - target
-        if late > 1:
-            hass.bus.async_fire(
-                EVENT_TIMER_OUT_OF_SYNC,
-                {ATTR_SECONDS: late},
-                time_fired=now,
-                context=timer_context,
-            )
-
-        schedule_tick(now)
+    """Start the timer, it is stopped on HOMEASSISTANT_STOP."""
 
     @callback
     def stop_timer(_: Event) -> None:
         """Stop the timer."""
-        if handle is not None:
-            handle.cancel()
+        hass.timer.async_stop()
 
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stop_timer)
 
     _LOGGER.info("Timer:starting")
-    schedule_tick(dt_util.utcnow())
+    hass.timer.async_start()
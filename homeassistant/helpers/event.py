@@ -4,6 +4,7 @@ import copy
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import functools as ft
+import heapq
 import logging
 import time
 from typing import (
@@ -23,10 +24,8 @@ import attr
 
 from homeassistant.const import (
     ATTR_ENTITY_ID,
-    ATTR_NOW,
     EVENT_CORE_CONFIG_UPDATE,
     EVENT_STATE_CHANGED,
-    EVENT_TIME_CHANGED,
     MATCH_ALL,
     SUN_EVENT_SUNRISE,
     SUN_EVENT_SUNSET,
@@ -35,6 +34,7 @@ from homeassistant.core import (
     CALLBACK_TYPE,
     Event,
     HassJob,
+    HassJobType,
     HomeAssistant,
     State,
     callback,
@@ -62,6 +62,14 @@ TRACK_STATE_REMOVED_DOMAIN_LISTENER = "track_state_removed_domain_listener"
 TRACK_ENTITY_REGISTRY_UPDATED_CALLBACKS = "track_entity_registry_updated_callbacks"
 TRACK_ENTITY_REGISTRY_UPDATED_LISTENER = "track_entity_registry_updated_listener"
 
+TEMPLATE_RENDER_SCHEDULER = "template_render_scheduler"
+
+# The time templates may be rendered in a single iteration of the
+# event loop before the remaining ones are left to the next one
+TEMPLATE_RENDER_TIME_BUDGET = 0.05
+
+TIMER_WHEEL = "timer_wheel"
+
 _ALL_LISTENER = "all"
 _DOMAINS_LISTENER = "domains"
 _ENTITIES_LISTENER = "entities"
@@ -235,6 +243,10 @@ def async_track_state_change_event(
     for each one, we keep a dict of entity ids that
     care about the state change events so we can
     do a fast dict lookup to route events.
+
+    The jobs of an entity are kept in a tuple that is replaced
+    when a listener is added or removed, so dispatching an event
+    does not have to copy it. Callbacks are called right away.
     """
     entity_ids = _async_string_to_lower_list(entity_ids)
     if not entity_ids:
@@ -248,13 +260,17 @@ def async_track_state_change_event(
         def _async_state_change_dispatcher(event: Event) -> None:
             """Dispatch state changes by entity_id."""
             entity_id = event.data.get("entity_id")
+            jobs = entity_callbacks.get(entity_id)
 
-            if entity_id not in entity_callbacks:
+            if jobs is None:
                 return
 
-            for job in entity_callbacks[entity_id][:]:
+            for job in jobs:
                 try:
-                    hass.async_run_hass_job(job, event)
+                    if job.job_type == HassJobType.Callback:
+                        job.target(event)
+                    else:
+                        hass.async_add_hass_job(job, event)
                 except Exception:  # pylint: disable=broad-except
                     _LOGGER.exception(
                         "Error while processing state changed for %s", entity_id
@@ -265,9 +281,7 @@ def async_track_state_change_event(
         )
 
     job = HassJob(action)
-
-    for entity_id in entity_ids:
-        entity_callbacks.setdefault(entity_id, []).append(job)
+    _async_add_indexed_listener(entity_callbacks, entity_ids, job)
 
     @callback
     def remove_listener() -> None:
@@ -283,11 +297,39 @@ def async_track_state_change_event(
     return remove_listener
 
 
+@callback
+@bind_hass
+def async_state_change_fan_out(hass: HomeAssistant) -> Dict[str, int]:
+    """Return the number of state change listeners per entity id.
+
+    The entities with the most listeners come first.
+    """
+    entity_callbacks = hass.data.get(TRACK_STATE_CHANGE_CALLBACKS, {})
+    return dict(
+        sorted(
+            ((entity_id, len(jobs)) for entity_id, jobs in entity_callbacks.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+    )
+
+
 @callback
 def _remove_empty_listener() -> None:
     """Remove a listener that does nothing."""
 
 
+@callback
+def _async_add_indexed_listener(
+    callbacks: Dict[str, Tuple[HassJob, ...]],
+    storage_keys: Iterable[str],
+    job: HassJob,
+) -> None:
+    """Add a listener, the tuple of jobs is replaced instead of changed."""
+    for storage_key in storage_keys:
+        callbacks[storage_key] = callbacks.get(storage_key, ()) + (job,)
+
+
 @callback
 def _async_remove_indexed_listeners(
     hass: HomeAssistant,
@@ -301,9 +343,12 @@ def _async_remove_indexed_listeners(
     callbacks = hass.data[data_key]
 
     for storage_key in storage_keys:
-        callbacks[storage_key].remove(job)
-        if len(callbacks[storage_key]) == 0:
+        jobs = callbacks[storage_key]
+        index = jobs.index(job)
+        if len(jobs) == 1:
             del callbacks[storage_key]
+        else:
+            callbacks[storage_key] = jobs[:index] + jobs[index + 1 :]
 
     if not callbacks:
         hass.data[listener_key]()
@@ -336,7 +381,7 @@ def async_track_entity_registry_updated_event(
             if entity_id not in entity_callbacks:
                 return
 
-            for job in entity_callbacks[entity_id][:]:
+            for job in entity_callbacks[entity_id]:
                 try:
                     hass.async_run_hass_job(job, event)
                 except Exception:  # pylint: disable=broad-except
@@ -350,9 +395,7 @@ def async_track_entity_registry_updated_event(
         )
 
     job = HassJob(action)
-
-    for entity_id in entity_ids:
-        entity_callbacks.setdefault(entity_id, []).append(job)
+    _async_add_indexed_listener(entity_callbacks, entity_ids, job)
 
     @callback
     def remove_listener() -> None:
@@ -370,14 +413,14 @@ def async_track_entity_registry_updated_event(
 
 @callback
 def _async_dispatch_domain_event(
-    hass: HomeAssistant, event: Event, callbacks: Dict[str, List]
+    hass: HomeAssistant, event: Event, callbacks: Dict[str, Tuple[HassJob, ...]]
 ) -> None:
     domain = split_entity_id(event.data["entity_id"])[0]
 
     if domain not in callbacks and MATCH_ALL not in callbacks:
         return
 
-    listeners = callbacks.get(domain, []) + callbacks.get(MATCH_ALL, [])
+    listeners = callbacks.get(domain, ()) + callbacks.get(MATCH_ALL, ())
 
     for job in listeners:
         try:
@@ -416,9 +459,7 @@ def async_track_state_added_domain(
         )
 
     job = HassJob(action)
-
-    for domain in domains:
-        domain_callbacks.setdefault(domain, []).append(job)
+    _async_add_indexed_listener(domain_callbacks, domains, job)
 
     @callback
     def remove_listener() -> None:
@@ -462,9 +503,7 @@ def async_track_state_removed_domain(
         )
 
     job = HassJob(action)
-
-    for domain in domains:
-        domain_callbacks.setdefault(domain, []).append(job)
+    _async_add_indexed_listener(domain_callbacks, domains, job)
 
     @callback
     def remove_listener() -> None:
@@ -751,6 +790,9 @@ class _TrackTemplateResultInfo:
 
         self._rate_limit = KeyedRateLimit(hass)
         self._info: Dict[Template, RenderInfo] = {}
+        # The render info of the templates that only reference literal
+        # entity ids, it covers every branch and does not need a render
+        self._static_info: Dict[Template, RenderInfo] = {}
         self._track_state_changes: Optional[_TrackStateChangeFiltered] = None
         self._time_listeners: Dict[Template, Callable] = {}
 
@@ -759,6 +801,15 @@ class _TrackTemplateResultInfo:
         for track_template_ in self._track_templates:
             template = track_template_.template
             variables = track_template_.variables
+
+            static_info = template.async_static_render_info()
+            if static_info is not None:
+                self._static_info[template] = static_info
+                if not raise_on_template_error:
+                    # The template is rendered on the first refresh
+                    self._info[template] = static_info
+                    continue
+
             self._info[template] = info = template.async_render_to_info(variables)
 
             if info.exception:
@@ -771,7 +822,9 @@ class _TrackTemplateResultInfo:
                 )
 
         self._track_state_changes = async_track_state_change_filtered(
-            self.hass, _render_infos_to_track_states(self._info.values()), self._refresh
+            self.hass,
+            _render_infos_to_track_states(self._info.values()),
+            self._schedule_refresh,
         )
         self._update_time_listeners()
         _LOGGER.debug(
@@ -827,12 +880,26 @@ class _TrackTemplateResultInfo:
         self._rate_limit.async_remove()
         for template in list(self._time_listeners):
             self._time_listeners.pop(template)()
+        _template_render_scheduler(self.hass).async_cancel(self)
 
     @callback
     def async_refresh(self) -> None:
         """Force recalculate the template."""
         self._refresh(None)
 
+    @callback
+    def _schedule_refresh(self, event: Event) -> None:
+        """Schedule the templates a state change affects to be rendered."""
+        track_templates = [
+            track_template_
+            for track_template_ in self._track_templates
+            if _event_triggers_rerender(event, self._info[track_template_.template])
+        ]
+        if track_templates:
+            _template_render_scheduler(self.hass).async_schedule(
+                self, track_templates, event
+            )
+
     def _render_template_if_ready(
         self,
         track_template_: TrackTemplate,
@@ -877,9 +944,9 @@ class _TrackTemplateResultInfo:
             )
 
         self._rate_limit.async_triggered(template, now)
-        self._info[template] = info = template.async_render_to_info(
-            track_template_.variables
-        )
+        info = template.async_render_to_info(track_template_.variables)
+        # Keep listening for every entity the template references
+        self._info[template] = self._static_info.get(template, info)
 
         try:
             result: Union[str, TemplateError] = info.result()
@@ -916,12 +983,38 @@ class _TrackTemplateResultInfo:
         replayed is True if the event is being replayed because the
         rate limit was hit.
         """
+        self._async_refresh_templates(
+            [
+                (track_template_, event)
+                for track_template_ in track_templates or self._track_templates
+            ],
+            event,
+            replayed,
+        )
+
+    @callback
+    def _async_refresh_templates(
+        self,
+        pending: Iterable[Tuple[TrackTemplate, Optional[Event]]],
+        event: Optional[Event],
+        replayed: Optional[bool] = False,
+    ) -> None:
+        """Refresh each template for the event that caused it to be considered.
+
+        The action is called once with the updates, for the last event.
+        """
         updates = []
         info_changed = False
-        now = event.time_fired if not replayed and event else dt_util.utcnow()
 
-        for track_template_ in track_templates or self._track_templates:
-            update = self._render_template_if_ready(track_template_, now, event)
+        for track_template_, template_event in pending:
+            now = (
+                template_event.time_fired
+                if not replayed and template_event
+                else dt_util.utcnow()
+            )
+            update = self._render_template_if_ready(
+                track_template_, now, template_event
+            )
             if not update:
                 continue
 
@@ -960,6 +1053,109 @@ class _TrackTemplateResultInfo:
         self.hass.async_run_hass_job(self._job, event, updates)
 
 
+class _TemplateRenderScheduler:
+    """Render the templates that state changes affect in batches.
+
+    Trackers mark their affected templates as state changes come in.
+    They are rendered in the next iteration of the event loop, each
+    template once for its last state change. When rendering takes
+    longer than the time budget, the remaining trackers are left to
+    the following iteration so the loop is not stalled.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self.time_budget = TEMPLATE_RENDER_TIME_BUDGET
+        self._pending: Dict[
+            _TrackTemplateResultInfo, Dict[int, Tuple[TrackTemplate, Event]]
+        ] = {}
+        self._last_event: Dict[_TrackTemplateResultInfo, Event] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @callback
+    def async_schedule(
+        self,
+        tracker: _TrackTemplateResultInfo,
+        track_templates: Iterable[TrackTemplate],
+        event: Event,
+    ) -> None:
+        """Render the templates of a tracker in the next loop iteration."""
+        pending = self._pending.setdefault(tracker, {})
+        infos = tracker._info  # pylint: disable=protected-access
+        for track_template_ in track_templates:
+            queued = pending.get(id(track_template_))
+            # A state change of an entity the template references is not
+            # rate limited, a later one of another entity must not make
+            # the render wait for the rate limit
+            if (
+                queued is not None
+                and queued[1].data.get(ATTR_ENTITY_ID)
+                in infos[track_template_.template].entities
+            ):
+                continue
+            pending[id(track_template_)] = (track_template_, event)
+        self._last_event[tracker] = event
+
+        if self._task is None:
+            self._task = self.hass.async_create_task(self._async_render())
+
+    @callback
+    def async_cancel(self, tracker: _TrackTemplateResultInfo) -> None:
+        """Drop the templates of a tracker that were not rendered yet."""
+        self._pending.pop(tracker, None)
+        self._last_event.pop(tracker, None)
+
+    async def _async_render(self) -> None:
+        """Render the pending templates within the time budget."""
+        try:
+            while self._pending:
+                deadline = time.monotonic() + self.time_budget
+                while True:
+                    tracker = next(iter(self._pending))
+                    pending = self._pending.pop(tracker)
+                    event = self._last_event.pop(tracker)
+                    try:
+                        # pylint: disable=protected-access
+                        tracker._async_refresh_templates(pending.values(), event)
+                    except Exception:  # pylint: disable=broad-except
+                        _LOGGER.exception(
+                            "Error while rendering templates %s",
+                            tracker._track_templates,  # pylint: disable=protected-access
+                        )
+                    if not self._pending or time.monotonic() >= deadline:
+                        break
+
+                if self._pending:
+                    # Let the event loop run before rendering the rest
+                    await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            # Home Assistant is shutting down, drop what is left
+            self._pending.clear()
+            self._last_event.clear()
+            raise
+        finally:
+            self._task = None
+
+
+@callback
+def _template_render_scheduler(hass: HomeAssistant) -> _TemplateRenderScheduler:
+    """Return the template render scheduler of hass."""
+    scheduler = hass.data.get(TEMPLATE_RENDER_SCHEDULER)
+    if scheduler is None:
+        scheduler = hass.data[TEMPLATE_RENDER_SCHEDULER] = _TemplateRenderScheduler(
+            hass
+        )
+    return scheduler
+
+
+@callback
+@bind_hass
+def async_set_template_render_time_budget(hass: HomeAssistant, budget: float) -> None:
+    """Set the time in seconds templates may render in one loop iteration."""
+    _template_render_scheduler(hass).time_budget = budget
+
+
 TrackTemplateResultListener = Callable[
     [
         Event,
@@ -1117,6 +1313,167 @@ def async_track_point_in_time(
 track_point_in_time = threaded_listener_factory(async_track_point_in_time)
 
 
+class _TimerWheel:
+    """Share one event loop timer between all points in time of hass.
+
+    The points in time are kept in buckets per second of their UTC
+    timestamp. Only the earliest point has a timer in the event loop,
+    so adding a later point or cancelling one does not touch the heap
+    of the event loop. A bucket is looked at once the timer reaches it.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the timer wheel."""
+        self.hass = hass
+        self._buckets: Dict[int, Dict[_TimerWheelEntry, None]] = {}
+        self._bucket_keys: List[int] = []
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._handle_timestamp = 0.0
+        self._firing = False
+        self.pending = 0
+
+    @callback
+    def async_schedule(
+        self, timestamp: float, action: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Call action once the UTC timestamp has been reached."""
+        entry = _TimerWheelEntry(timestamp, action)
+        key = int(timestamp)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = {}
+            heapq.heappush(self._bucket_keys, key)
+        bucket[entry] = None
+        self.pending += 1
+
+        if not self._firing and (
+            self._handle is None or timestamp < self._handle_timestamp
+        ):
+            self._async_schedule_handle(timestamp)
+
+        @callback
+        def cancel() -> None:
+            """Remove the point in time, the event loop timer is left as is."""
+            entry.action = None
+            bucket = self._buckets.get(key)
+            if bucket is not None and entry in bucket:
+                # Empty buckets are kept until they are reached, so
+                # the key of every bucket is pushed on the heap once
+                del bucket[entry]
+                self.pending -= 1
+
+        return cancel
+
+    @callback
+    def async_next_fire(self) -> Optional[float]:
+        """Return the UTC timestamp of the earliest pending point in time."""
+        keys = self._bucket_keys
+        while keys and not self._buckets[keys[0]]:
+            del self._buckets[heapq.heappop(keys)]
+        if not keys:
+            return None
+        return min(entry.timestamp for entry in self._buckets[keys[0]])
+
+    @callback
+    def _async_schedule_handle(
+        self, timestamp: float, now: Optional[float] = None
+    ) -> None:
+        """Set the event loop timer to fire at the UTC timestamp."""
+        if self._handle is not None:
+            self._handle.cancel()
+        if now is None:
+            now = time.time()
+        self._handle_timestamp = timestamp
+        self._handle = self.hass.loop.call_later(timestamp - now, self._async_fire)
+
+    @callback
+    def _async_fire(self) -> None:
+        """Call the actions of the points in time that have been reached."""
+        self._handle = None
+        # The points in time the actions add are looked at afterwards
+        self._firing = True
+        now = time_tracker_utcnow().timestamp()
+        due: List[_TimerWheelEntry] = []
+        keys = self._bucket_keys
+
+        while keys and keys[0] <= now:
+            bucket = self._buckets[keys[0]]
+            reached = [entry for entry in bucket if entry.timestamp <= now]
+            if len(reached) < len(bucket):
+                for entry in reached:
+                    del bucket[entry]
+                due.extend(reached)
+                break
+            due.extend(bucket)
+            del self._buckets[heapq.heappop(keys)]
+
+        self.pending -= len(due)
+        due.sort(key=lambda entry: entry.timestamp)
+        for entry in due:
+            action = entry.action
+            if action is None:
+                # Cancelled by one of the actions before it
+                continue
+            try:
+                action()
+            except Exception as exc:  # pylint: disable=broad-except
+                # Log it like the loop would for a timer of its own
+                self.hass.loop.call_exception_handler(
+                    {"message": f"Exception in callback {action}", "exception": exc}
+                )
+
+        self._firing = False
+        next_fire = self.async_next_fire()
+        if next_fire is None:
+            return
+        # Depending on the available clock support (including timer hardware
+        # and the OS kernel) it can happen that we fire a little bit too early
+        # as measured by utcnow(). That is bad when callbacks have assumptions
+        # about the current time. Thus, we rearm the timer for the remaining
+        # time.
+        if now < self._handle_timestamp:
+            _LOGGER.debug(
+                "Called %f seconds too early, rearming", self._handle_timestamp - now
+            )
+            self._async_schedule_handle(next_fire, now)
+        else:
+            self._async_schedule_handle(next_fire)
+
+
+class _TimerWheelEntry:
+    """A point in time of the timer wheel."""
+
+    __slots__ = ["timestamp", "action"]
+
+    def __init__(self, timestamp: float, action: Callable[[], None]) -> None:
+        """Initialize the point in time."""
+        self.timestamp = timestamp
+        self.action: Optional[Callable[[], None]] = action
+
+
+@callback
+def _timer_wheel(hass: HomeAssistant) -> _TimerWheel:
+    """Return the timer wheel of hass."""
+    wheel = hass.data.get(TIMER_WHEEL)
+    if wheel is None:
+        wheel = hass.data[TIMER_WHEEL] = _TimerWheel(hass)
+    return wheel
+
+
+@callback
+@bind_hass
+def async_timer_wheel_info(hass: HomeAssistant) -> Dict[str, Any]:
+    """Return the number of pending points in time and the next fire time."""
+    wheel = _timer_wheel(hass)
+    next_fire = wheel.async_next_fire()
+    return {
+        "pending": wheel.pending,
+        "next_fire": None
+        if next_fire is None
+        else dt_util.utc_from_timestamp(next_fire),
+    }
+
+
 @callback
 @bind_hass
 def async_track_point_in_utc_time(
@@ -1132,39 +1489,12 @@ def async_track_point_in_utc_time(
     # having to figure out how to call the action every time its called.
     job = action if isinstance(action, HassJob) else HassJob(action)
 
-    cancel_callback: Optional[asyncio.TimerHandle] = None
-
     @callback
     def run_action() -> None:
         """Call the action."""
-        nonlocal cancel_callback
-
-        now = time_tracker_utcnow()
-
-        # Depending on the available clock support (including timer hardware
-        # and the OS kernel) it can happen that we fire a little bit too early
-        # as measured by utcnow(). That is bad when callbacks have assumptions
-        # about the current time. Thus, we rearm the timer for the remaining
-        # time.
-        delta = (utc_point_in_time - now).total_seconds()
-        if delta > 0:
-            _LOGGER.debug("Called %f seconds too early, rearming", delta)
-
-            cancel_callback = hass.loop.call_later(delta, run_action)
-            return
-
         hass.async_run_hass_job(job, utc_point_in_time)
 
-    delta = utc_point_in_time.timestamp() - time.time()
-    cancel_callback = hass.loop.call_later(delta, run_action)
-
-    @callback
-    def unsub_point_in_time_listener() -> None:
-        """Cancel the call_later."""
-        assert cancel_callback is not None
-        cancel_callback.cancel()
-
-    return unsub_point_in_time_listener
+    return _timer_wheel(hass).async_schedule(utc_point_in_time.timestamp(), run_action)
 
 
 track_point_in_utc_time = threaded_listener_factory(async_track_point_in_utc_time)
@@ -1334,11 +1664,11 @@ def async_track_utc_time_change(
     if all(val is None for val in (hour, minute, second)):
 
         @callback
-        def time_change_listener(event: Event) -> None:
-            """Fire every time event that comes in."""
-            hass.async_run_hass_job(job, event.data[ATTR_NOW])
+        def time_change_listener(now: datetime) -> None:
+            """Fire every tick of the timer."""
+            hass.async_run_hass_job(job, now)
 
-        return hass.bus.async_listen(EVENT_TIME_CHANGED, time_change_listener)
+        return hass.timer.async_listen(time_change_listener)
 
     matching_seconds = dt_util.parse_time_expression(second, 0, 59)
     matching_minutes = dt_util.parse_time_expression(minute, 0, 59)
@@ -1,7 +1,28 @@
 """Helpers to help with encoding Home Assistant objects in JSON."""
 from datetime import datetime
 import json
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Callable, Optional
+
+from homeassistant.core import Event, State
+
+
+def json_encoder_default(obj: Any) -> Any:
+    """Convert Home Assistant objects.
+
+    Raises TypeError for objects that can not be converted.
+    """
+    if isinstance(obj, (State, Event)):
+        return obj.as_dict()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    if hasattr(obj, "as_dict"):
+        return obj.as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 class JSONEncoder(json.JSONEncoder):
@@ -12,11 +33,64 @@ class JSONEncoder(json.JSONEncoder):
 
         Hand other objects to the original method.
         """
-        if isinstance(o, datetime):
-            return o.isoformat()
-        if isinstance(o, set):
-            return list(o)
-        if hasattr(o, "as_dict"):
-            return o.as_dict()
-
-        return json.JSONEncoder.default(self, o)
+        try:
+            return json_encoder_default(o)
+        except TypeError:
+            return json.JSONEncoder.default(self, o)
+
+
+# A single encoder calling the default function directly avoids
+# creating an encoder per message and the bound method lookup
+_ENCODE = json.JSONEncoder(default=json_encoder_default, allow_nan=False).encode
+
+
+def _orjson_encoder() -> Optional[Callable[[Any], bytes]]:
+    """Return an orjson based encoder if orjson is installed."""
+    try:
+        import orjson  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    # Datetimes are passed to the default function to keep the
+    # isoformat output of the standard library encoder
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def encode(data: Any) -> bytes:
+        """Serialize data to JSON bytes with orjson."""
+        return orjson.dumps(  # type: ignore
+            data, option=option, default=json_encoder_default
+        )
+
+    return encode
+
+
+# Faster encoder used when available. It must raise TypeError for data
+# it can not serialize, json_bytes falls back to the standard library
+# encoder then.
+_FAST_ENCODE = _orjson_encoder()
+
+
+def json_bytes(data: Any) -> bytes:
+    """Serialize data to JSON bytes.
+
+    Raises TypeError for objects that can not be converted and
+    ValueError for NaN and infinite floats.
+    """
+    if _FAST_ENCODE is not None:
+        try:
+            encoded = _FAST_ENCODE(data)
+        except TypeError:
+            pass
+        else:
+            # orjson writes NaN and infinite floats as null, leave it to
+            # the standard library encoder to tell them from None
+            if b"null" not in encoded:
+                return encoded
+    return _ENCODE(data).encode("utf-8")
+
+
+def json_dumps(data: Any) -> str:
+    """Serialize data to a JSON string."""
+    if _FAST_ENCODE is None:
+        return _ENCODE(data)
+    return json_bytes(data).decode("utf-8")
@@ -2,6 +2,7 @@
 from ast import literal_eval
 import asyncio
 import base64
+from collections import OrderedDict
 import collections.abc
 from datetime import datetime, timedelta
 from functools import partial, wraps
@@ -11,17 +12,28 @@ import math
 from operator import attrgetter
 import random
 import re
-from typing import Any, Dict, Generator, Iterable, Optional, Type, Union
+import threading
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Generator,
+    Iterable,
+    Optional,
+    Set,
+    Type,
+    Union,
+)
 from urllib.parse import urlencode as urllib_urlencode
-import weakref
 
 import jinja2
-from jinja2 import contextfilter, contextfunction
+from jinja2 import contextfilter, contextfunction, nodes
 from jinja2.sandbox import ImmutableSandboxedEnvironment
 from jinja2.utils import Namespace  # type: ignore
 import voluptuous as vol
 
 from homeassistant.const import (
+    ATTR_DEVICE_CLASS,
     ATTR_ENTITY_ID,
     ATTR_LATITUDE,
     ATTR_LONGITUDE,
@@ -47,6 +59,7 @@ DATE_STR_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 _RENDER_INFO = "template.render_info"
 _ENVIRONMENT = "template.environment"
+_AREA_ENTITY_IDS = "template.area_entity_ids"
 
 _RE_JINJA_DELIMITERS = re.compile(r"\{%|\{\{|\{#")
 # Match "simple" ints and floats. -1.0, 1, +5, 5.0
@@ -70,6 +83,31 @@ _COLLECTABLE_STATE_ATTRIBUTES = {
 ALL_STATES_RATE_LIMIT = timedelta(minutes=1)
 DOMAIN_STATES_RATE_LIMIT = timedelta(seconds=1)
 
+# The number of compiled templates kept, the least recently used
+# ones are compiled again when they are needed after that
+COMPILED_TEMPLATE_CACHE_SIZE = 2048
+
+# Globals taking the entity id as first argument
+_ENTITY_ID_FUNCTIONS = {"states", "is_state", "is_state_attr", "state_attr"}
+# Globals and filters that access states or time in other ways
+_RENDER_INFO_GLOBALS = _ENTITY_ID_FUNCTIONS | {
+    "aggregate",
+    "closest",
+    "distance",
+    "expand",
+    "now",
+    "utcnow",
+}
+_RENDER_INFO_FILTERS = {"aggregate", "closest", "expand"}
+
+_AGGREGATE_FUNCTIONS = {
+    "sum": sum,
+    "min": min,
+    "max": max,
+    "mean": lambda values: sum(values) / len(values),
+    "count": len,
+}
+
 
 @bind_hass
 def attach(hass: HomeAssistantType, obj: Any) -> None:
@@ -85,6 +123,16 @@ def attach(hass: HomeAssistantType, obj: Any) -> None:
         obj.hass = hass
 
 
+@callback
+@bind_hass
+def async_cache_info(hass: HomeAssistantType) -> Dict[str, int]:
+    """Return the statistics of the compiled template cache of hass.
+
+    The cache is shared by all templates and kept across reloads.
+    """
+    return _template_environment(hass).cache_info()
+
+
 def render_complex(value: Any, variables: TemplateVarsType = None) -> Any:
     """Recursive template creator helper function."""
     if isinstance(value, list):
@@ -296,10 +344,7 @@ class Template:
     def _env(self):
         if self.hass is None:
             return _NO_HASS_ENV
-        ret = self.hass.data.get(_ENVIRONMENT)
-        if ret is None:
-            ret = self.hass.data[_ENVIRONMENT] = TemplateEnvironment(self.hass)
-        return ret
+        return _template_environment(self.hass)
 
     def ensure_valid(self):
         """Return if template is valid."""
@@ -442,6 +487,31 @@ class Template:
 
         return False
 
+    @callback
+    def async_static_render_info(self) -> Optional[RenderInfo]:
+        """Collect the entity filter without rendering the template.
+
+        Returns None when the template accesses states in another way
+        than by literal entity ids, it has to be rendered then.
+        """
+        assert self.hass
+        if self.is_static:
+            return None
+
+        try:
+            self.ensure_valid()
+        except TemplateError:
+            return None
+
+        entities = self._env.entity_references(self.template)
+        if entities is None:
+            return None
+
+        render_info = RenderInfo(self)
+        render_info.entities = set(entities)
+        render_info._freeze()  # pylint: disable=protected-access
+        return render_info
+
     @callback
     def async_render_to_info(
         self, variables: TemplateVarsType = None, **kwargs: Any
@@ -910,6 +980,163 @@ def closest(hass, *args):
     return loc_helper.closest(latitude, longitude, states)
 
 
+def aggregate(
+    hass: HomeAssistantType,
+    function: str,
+    domain: Optional[str] = None,
+    device_class: Optional[str] = None,
+    area: Optional[str] = None,
+    attribute: Optional[str] = None,
+) -> Any:
+    """Aggregate the numeric states of the entities of a domain.
+
+    aggregate('sum', 'sensor', device_class='power')
+    aggregate('max', 'climate', attribute='current_temperature')
+    aggregate('count', 'light', area='kitchen')
+
+    The states are read in one pass, without wrapping them for the template.
+    """
+    render_info = hass.data.get(_RENDER_INFO)
+    if render_info is not None:
+        if domain is None:
+            render_info.all_states = True
+        else:
+            render_info.domains.add(domain)
+
+    return _aggregate_states(
+        hass, hass.states.async_all(domain), function, device_class, area, attribute
+    )
+
+
+def aggregate_filter(
+    hass: HomeAssistantType,
+    entities: Any,
+    function: str,
+    device_class: Optional[str] = None,
+    area: Optional[str] = None,
+    attribute: Optional[str] = None,
+) -> Any:
+    """Aggregate the numeric states of states.domain, states or entities.
+
+    states.sensor | aggregate('sum', device_class='power')
+    expand('group.heaters') | aggregate('mean', attribute='temperature')
+    """
+    if isinstance(entities, DomainStates):
+        # pylint: disable=protected-access
+        return aggregate(
+            hass, function, entities._domain, device_class, area, attribute
+        )
+    if isinstance(entities, AllStates):
+        return aggregate(hass, function, None, device_class, area, attribute)
+
+    if isinstance(entities, (str, State)):
+        entities = [entities]
+    states = []
+    for entity in entities:
+        if isinstance(entity, str):
+            _collect_state(hass, entity)
+            entity = hass.states.get(entity)
+            if entity is None:
+                continue
+        elif isinstance(entity, State):
+            _collect_state(hass, entity.entity_id)
+        else:
+            continue
+        states.append(entity)
+
+    return _aggregate_states(hass, states, function, device_class, area, attribute)
+
+
+def _aggregate_states(
+    hass: HomeAssistantType,
+    states: Iterable[State],
+    function: str,
+    device_class: Optional[str],
+    area: Optional[str],
+    attribute: Optional[str],
+) -> Any:
+    """Aggregate the numeric values of the matching states."""
+    if function not in _AGGREGATE_FUNCTIONS:
+        raise ValueError(f"Unknown aggregate function: {function}")
+
+    area_entity_ids = None if area is None else _area_entity_ids(hass, area)
+    count = 0
+    values = []
+
+    for state in states:
+        if area_entity_ids is not None and state.entity_id not in area_entity_ids:
+            continue
+        if (
+            device_class is not None
+            and state.attributes.get(ATTR_DEVICE_CLASS) != device_class
+        ):
+            continue
+        if function == "count":
+            count += 1
+            continue
+
+        value = state.state if attribute is None else state.attributes.get(attribute)
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            continue
+
+    if function == "count":
+        return count
+    if not values:
+        return None
+    return _AGGREGATE_FUNCTIONS[function](values)
+
+
+def _area_entity_ids(hass: HomeAssistantType, area_id: str) -> Set[str]:
+    """Return the entity ids in an area, directly or through their device.
+
+    They are cached until the entity or device registry is updated.
+    """
+    # pylint: disable=import-outside-toplevel
+    from homeassistant.helpers import device_registry, entity_registry
+
+    entity_reg = hass.data.get(entity_registry.DATA_REGISTRY)
+    device_reg = hass.data.get(device_registry.DATA_REGISTRY)
+    if not isinstance(entity_reg, entity_registry.EntityRegistry):
+        return set()
+
+    cache = hass.data.get(_AREA_ENTITY_IDS)
+    if cache is None:
+        cache = hass.data[_AREA_ENTITY_IDS] = {}
+
+        @callback
+        def _async_clear_cache(event):
+            """Clear the cache when an area assignment may have changed."""
+            cache.clear()
+
+        hass.bus.async_listen(
+            entity_registry.EVENT_ENTITY_REGISTRY_UPDATED, _async_clear_cache
+        )
+        hass.bus.async_listen(
+            device_registry.EVENT_DEVICE_REGISTRY_UPDATED, _async_clear_cache
+        )
+
+    entity_ids = cache.get(area_id)
+    if entity_ids is not None:
+        return entity_ids
+
+    area_device_ids = set()
+    if isinstance(device_reg, device_registry.DeviceRegistry):
+        area_device_ids = {
+            device.id
+            for device in device_registry.async_entries_for_area(device_reg, area_id)
+        }
+
+    entity_ids = cache[area_id] = {
+        entry.entity_id
+        for entry in entity_reg.entities.values()
+        if entry.area_id == area_id
+        or (entry.area_id is None and entry.device_id in area_device_ids)
+    }
+    return entity_ids
+
+
 def closest_filter(hass, *args):
     """Call closest as a filter. Need to reorder arguments."""
     new_args = list(args[1:])
@@ -1284,6 +1511,14 @@ def relative_time(value):
     return dt_util.get_age(value)
 
 
+def _template_environment(hass: HomeAssistantType) -> "TemplateEnvironment":
+    """Return the template environment of hass."""
+    ret = hass.data.get(_ENVIRONMENT)
+    if ret is None:
+        ret = hass.data[_ENVIRONMENT] = TemplateEnvironment(hass)
+    return ret
+
+
 def urlencode(value):
     """Urlencode dictionary and return as UTF-8 string."""
     return urllib_urlencode(value).encode("utf-8")
@@ -1296,7 +1531,11 @@ class TemplateEnvironment(ImmutableSandboxedEnvironment):
         """Initialise template environment."""
         super().__init__()
         self.hass = hass
-        self.template_cache = weakref.WeakValueDictionary()
+        self.template_cache: OrderedDict = OrderedDict()
+        # Templates are compiled in the event loop and in executor threads
+        self._template_cache_lock = threading.Lock()
+        self.template_cache_hits = 0
+        self.template_cache_misses = 0
         self.filters["round"] = forgiving_round
         self.filters["multiply"] = multiply
         self.filters["log"] = logarithm
@@ -1364,6 +1603,8 @@ class TemplateEnvironment(ImmutableSandboxedEnvironment):
 
             return contextfunction(wrapper)
 
+        self.globals["aggregate"] = hassfunction(aggregate)
+        self.filters["aggregate"] = contextfilter(hassfunction(aggregate_filter))
         self.globals["expand"] = hassfunction(expand)
         self.filters["expand"] = contextfilter(self.globals["expand"])
         self.globals["closest"] = hassfunction(closest)
@@ -1403,12 +1644,109 @@ class TemplateEnvironment(ImmutableSandboxedEnvironment):
             # any instance of this.
             return super().compile(source, name, filename, raw, defer_init)
 
+        with self._template_cache_lock:
+            cached = self.template_cache.get(source)
+            if cached is not None:
+                self.template_cache_hits += 1
+                self.template_cache.move_to_end(source)
+                return cached[0]
+            self.template_cache_misses += 1
+
+        # Compile without holding the lock, a template compiled by two
+        # threads at once is only cached once
+        parsed = self.parse(source)
+        cached = (super().compile(parsed), _static_entity_references(parsed))
+        with self._template_cache_lock:
+            self.template_cache[source] = cached
+            if len(self.template_cache) > COMPILED_TEMPLATE_CACHE_SIZE:
+                self.template_cache.popitem(last=False)
+
+        return cached[0]
+
+    def entity_references(self, source: str) -> Optional[FrozenSet[str]]:
+        """Return the entity ids a compiled template references.
+
+        Returns None when they can only be found by rendering it.
+        """
         cached = self.template_cache.get(source)
+        return None if cached is None else cached[1]
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return the statistics of the compiled template cache."""
+        return {
+            "hits": self.template_cache_hits,
+            "misses": self.template_cache_misses,
+            "size": len(self.template_cache),
+            "max_size": COMPILED_TEMPLATE_CACHE_SIZE,
+        }
+
+
+def _static_entity_references(template: nodes.Template) -> Optional[FrozenSet[str]]:
+    """Find the literal entity ids in the syntax tree of a template.
+
+    Returns None when the template accesses states in other ways.
+    """
+    entities: Set[str] = set()
+    if _collect_entity_references(template, entities):
+        return frozenset(entities)
+    return None
+
+
+def _literal_key(node: nodes.Node) -> Optional[str]:
+    """Return the attribute or the literal item a node gets."""
+    if isinstance(node, nodes.Getattr):
+        return node.attr  # type: ignore
+    if isinstance(node, nodes.Getitem) and isinstance(node.arg, nodes.Const):
+        key = node.arg.value
+        return key if isinstance(key, str) else None
+    return None
+
 
-        if cached is None:
-            cached = self.template_cache[source] = super().compile(source)
+def _collect_entity_references(node: nodes.Node, entities: Set[str]) -> bool:
+    """Add the literal entity ids below node, return False on other state access."""
+    if (
+        isinstance(node, nodes.Call)
+        and isinstance(node.node, nodes.Name)
+        and node.node.name in _ENTITY_ID_FUNCTIONS
+    ):
+        # states('light.kitchen'), is_state('light.kitchen', 'on'), ...
+        if not (
+            node.args
+            and isinstance(node.args[0], nodes.Const)
+            and isinstance(node.args[0].value, str)
+            and node.dyn_args is None
+            and node.dyn_kwargs is None
+        ):
+            return False
+        entities.add(node.args[0].value)
+        return all(
+            _collect_entity_references(child, entities)
+            for child in (*node.args[1:], *node.kwargs)
+        )
 
-        return cached
+    if (
+        isinstance(node, (nodes.Getattr, nodes.Getitem))
+        and isinstance(node.node, (nodes.Getattr, nodes.Getitem))
+        and isinstance(node.node.node, nodes.Name)
+        and node.node.node.name == "states"
+    ):
+        # states.light.kitchen or states['light']['kitchen']
+        domain = _literal_key(node.node)
+        object_id = _literal_key(node)
+        if domain is None or object_id is None:
+            return False
+        entities.add(f"{domain}.{object_id}")
+        return True
+
+    if isinstance(node, nodes.Name) and node.name in _RENDER_INFO_GLOBALS:
+        return False
+
+    if isinstance(node, nodes.Filter) and node.name in _RENDER_INFO_FILTERS:
+        return False
+
+    return all(
+        _collect_entity_references(child, entities) for child in node.iter_child_nodes()
+    )
 
 
 _NO_HASS_ENV = TemplateEnvironment(None)
@@ -7,11 +7,18 @@ from datetime import datetime
 import json
 import logging
 from timeit import default_timer as timer
+import tracemalloc
 from typing import Callable, Dict, TypeVar
 
 from homeassistant import core
 from homeassistant.components.websocket_api.const import JSON_DUMP
-from homeassistant.const import ATTR_NOW, EVENT_STATE_CHANGED, EVENT_TIME_CHANGED
+from homeassistant.const import (
+    ATTR_NOW,
+    EVENT_STATE_CHANGED,
+    EVENT_TIME_CHANGED,
+    MATCH_ALL,
+)
+from homeassistant.helpers import template
 from homeassistant.helpers.entityfilter import convert_include_exclude_filter
 from homeassistant.helpers.json import JSONEncoder
 from homeassistant.util import dt as dt_util
@@ -85,6 +92,76 @@ async def fire_events(hass):
     return timer() - start
 
 
+@benchmark
+async def fire_events_many_listeners(hass):
+    """Fire a hundred thousand events to ten listeners and two MATCH_ALL listeners."""
+    count = 0
+    event_name = "benchmark_event"
+    events_to_fire = 10 ** 5
+    expected = events_to_fire * 12
+    event = asyncio.Event()
+
+    @core.callback
+    def listener(_):
+        """Handle event."""
+        nonlocal count
+        count += 1
+
+        if count == expected:
+            event.set()
+
+    for _ in range(10):
+        hass.bus.async_listen(event_name, listener)
+    for _ in range(2):
+        hass.bus.async_listen(MATCH_ALL, listener)
+
+    start = timer()
+
+    for _ in range(events_to_fire):
+        hass.bus.async_fire(event_name)
+
+    await event.wait()
+
+    return timer() - start
+
+
+@benchmark
+async def fire_events_many_event_types(hass):
+    """Fire a million events of a hundred types while listeners come and go."""
+    count = 0
+    event_names = [f"benchmark_event_{idx}" for idx in range(100)]
+    events_to_fire = 10 ** 6
+    event = asyncio.Event()
+
+    @core.callback
+    def listener(_):
+        """Handle event."""
+        nonlocal count
+        count += 1
+
+        if count == events_to_fire:
+            event.set()
+
+    @core.callback
+    def unused_listener(_):
+        """Handle event that is removed right away."""
+
+    for event_name in event_names:
+        hass.bus.async_listen(event_name, listener)
+
+    start = timer()
+
+    for idx in range(events_to_fire):
+        event_name = event_names[idx % 100]
+        if idx % 1000 == 0:
+            hass.bus.async_listen(event_name, unused_listener)()
+        hass.bus.async_fire(event_name)
+
+    await event.wait()
+
+    return timer() - start
+
+
 @benchmark
 async def time_changed_helper(hass):
     """Run a million events through time changed helper."""
@@ -185,6 +262,85 @@ async def state_changed_event_helper(hass):
     return timer() - start
 
 
+@benchmark
+async def state_changed_event_fan_out(hass):
+    """Run 5000 events of 3 entities through 2000 listeners of each."""
+    count = 0
+    entity_ids = [f"sensor.energy_{idx}" for idx in range(3)]
+    event = asyncio.Event()
+
+    @core.callback
+    def listener(*args):
+        """Handle event."""
+        nonlocal count
+        count += 1
+
+        if count == 5000 * 2000:
+            event.set()
+
+    for _ in range(2000):
+        hass.helpers.event.async_track_state_change_event(entity_ids, listener)
+
+    for idx in range(5000):
+        entity_id = entity_ids[idx % 3]
+        hass.bus.async_fire(
+            EVENT_STATE_CHANGED,
+            {
+                "entity_id": entity_id,
+                "old_state": core.State(entity_id, "off"),
+                "new_state": core.State(entity_id, "on"),
+            },
+        )
+
+    start = timer()
+
+    await event.wait()
+
+    return timer() - start
+
+
+@benchmark
+async def state_machine_set_memory(hass):
+    """Write 100 states for each of 5000 entities and trace the allocations."""
+    entity_ids = [f"sensor.benchmark_{idx}" for idx in range(5000)]
+    attributes = {"unit_of_measurement": "W", "friendly_name": "Benchmark"}
+    for entity_id in entity_ids:
+        hass.states.async_set(entity_id, "0", attributes)
+    await hass.async_block_till_done()
+
+    tracemalloc.start()
+    start = timer()
+    for value in range(1, 101):
+        for entity_id in entity_ids:
+            hass.states.async_set(entity_id, str(value), attributes)
+        await hass.async_block_till_done()
+    runtime = timer() - start
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    print(f"Peak memory {peak / 1024 ** 2:.1f} MiB, {blocks} blocks retained")
+    return runtime
+
+
+@benchmark
+async def template_domain_states(hass):
+    """Render a template filtering the lights among 10000 entities a 1000 times."""
+    for idx in range(10 ** 4):
+        domain = "light" if idx % 20 == 0 else "sensor"
+        hass.states.async_set(f"{domain}.benchmark_{idx}", "on" if idx % 40 else "off")
+
+    tpl = template.Template(
+        "{{ states.light | selectattr('state', 'eq', 'on') | list | count }}", hass
+    )
+
+    start = timer()
+    for _ in range(1000):
+        tpl.async_render()
+    return timer() - start
+
+
 @benchmark
 async def logbook_filtering_state(hass):
     """Filter state changes."""
@@ -323,6 +479,19 @@ async def json_serialize_states(hass):
     return timer() - start
 
 
+@benchmark
+async def json_serialize_states_stdlib(hass):
+    """Serialize million states with a standard library encoder class."""
+    states = [
+        core.State("light.kitchen", "on", {"friendly_name": "Kitchen Lights"})
+        for _ in range(10 ** 6)
+    ]
+
+    start = timer()
+    json.dumps(states, cls=JSONEncoder, allow_nan=False)
+    return timer() - start
+
+
 def _create_state_changed_event_from_old_new(
     entity_id, event_time_fired, old_state, new_state
 ):
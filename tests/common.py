@@ -286,6 +286,8 @@ fire_mqtt_message = threadsafe_callback_factory(async_fire_mqtt_message)
 def async_fire_time_changed(hass, datetime_, fire_all=False):
     """Fire a time changes event."""
     hass.bus.async_fire(EVENT_TIME_CHANGED, {"now": date_util.as_utc(datetime_)})
+    # Like the bus, call the timer listeners in the next loop iteration
+    hass.loop.call_soon(hass.timer.async_call_listeners, date_util.as_utc(datetime_))
 
     for task in list(hass.loop._scheduled):
         if not isinstance(task, asyncio.TimerHandle):
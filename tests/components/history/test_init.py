@@ -769,6 +769,182 @@ async def test_fetch_period_api(hass, hass_client):
     assert response.status == 200
 
 
+async def test_fetch_period_api_with_stream(hass, hass_client):
+    """Test the fetch period view streaming the history sorted by entity_id."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    instance = hass.data[recorder.DATA_INSTANCE]
+    await hass.async_add_executor_job(instance.block_till_done)
+    hass.states.async_set("light.b", "on")
+    hass.states.async_set("light.a", "on")
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+
+    start = dt_util.utcnow()
+    hass.states.async_set("light.c", "on")
+    hass.states.async_set("light.b", "off")
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+
+    client = await hass_client()
+    response = await client.get(f"/api/history/period/{start.isoformat()}")
+    assert response.status == 200
+    expected = sorted(await response.json(), key=lambda states: states[0]["entity_id"])
+
+    with patch("homeassistant.components.history.STREAM_CHUNK_SIZE", 1):
+        response = await client.get(f"/api/history/period/{start.isoformat()}?stream")
+    assert response.status == 200
+    response_json = await response.json()
+    # Entities without changes follow the ones with changes
+    assert [states[0]["entity_id"] for states in response_json] == [
+        "light.b",
+        "light.c",
+        "light.a",
+    ]
+    response_json.sort(key=lambda states: states[0]["entity_id"])
+    assert response_json == expected
+    assert [[state["state"] for state in states] for states in response_json] == [
+        ["on"],
+        ["on", "off"],
+        ["on"],
+    ]
+
+
+async def test_iter_sorted_states_json_database_order(hass):
+    """Test each entity is returned once when the database sorts differently."""
+    start = dt_util.utcnow()
+    start_states = [
+        ha.State(entity_id, "start", last_changed=start, last_updated=start)
+        for entity_id in ("light.a_z", "light.ab", "light.b")
+    ]
+    # Collations ignoring punctuation sort light.ab before light.a_z
+    changes = [
+        ha.State(entity_id, "changed", last_changed=start + timedelta(seconds=1))
+        for entity_id in ("light.ab", "light.a_z", "light.a_z")
+    ]
+
+    with patch(
+        "homeassistant.components.history._get_start_time_states",
+        return_value=start_states,
+    ):
+        results = list(
+            history._iter_sorted_states_json(
+                hass, None, changes, start, None, columnar=True
+            )
+        )
+
+    assert [(result["entity_id"], result["state"]) for result in results] == [
+        ("light.ab", ["start", "changed"]),
+        ("light.a_z", ["start", "changed"]),
+        ("light.b", ["start"]),
+    ]
+
+
+async def test_fetch_period_api_with_columnar(hass, hass_client):
+    """Test the fetch period view returning the history as parallel lists."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    instance = hass.data[recorder.DATA_INSTANCE]
+    await hass.async_add_executor_job(instance.block_till_done)
+    hass.states.async_set("sensor.b", "1", {"unit_of_measurement": "W"})
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+
+    start = dt_util.utcnow()
+    hass.states.async_set("sensor.a", "5")
+    hass.states.async_set("sensor.b", "2", {"unit_of_measurement": "W"})
+    hass.states.async_set("sensor.b", "2", {"unit_of_measurement": "kW"})
+    hass.states.async_set("sensor.b", "3", {"unit_of_measurement": "kW"})
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+    state_b = hass.states.get("sensor.b")
+
+    client = await hass_client()
+    for query in ("columnar", "columnar&stream"):
+        response = await client.get(
+            f"/api/history/period/{start.isoformat()}?{query}&significant_changes_only=0"
+        )
+        assert response.status == 200
+        response_json = await response.json()
+        assert len(response_json) == 2
+        result = {
+            ent_results["entity_id"]: ent_results for ent_results in response_json
+        }
+        assert result["sensor.a"] == {
+            "entity_id": "sensor.a",
+            "attributes": {},
+            "state": ["5"],
+            "last_changed": [hass.states.get("sensor.a").last_changed.timestamp()],
+        }
+        assert result["sensor.b"]["attributes"] == {"unit_of_measurement": "kW"}
+        assert result["sensor.b"]["state"] == ["1", "2", "3"]
+        assert result["sensor.b"]["last_changed"][0] == start.timestamp()
+        assert result["sensor.b"]["last_changed"][2] == state_b.last_changed.timestamp()
+
+
+async def test_fetch_period_api_from_recent_states(hass, hass_client):
+    """Test the fetch period view answers recent periods from memory."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    instance = hass.data[recorder.DATA_INSTANCE]
+    await hass.async_add_executor_job(instance.block_till_done)
+    before_cache = dt_util.utcnow()
+    hass.states.async_set("light.kitchen", "on", {"brightness": 10})
+    hass.states.async_set("sensor.power", "1", {"unit_of_measurement": "W"})
+    await hass.async_block_till_done()
+
+    start = dt_util.utcnow()
+    hass.states.async_set("light.kitchen", "on", {"brightness": 20})
+    hass.states.async_set("light.kitchen", "off")
+    hass.states.async_set("sensor.power", "2", {"unit_of_measurement": "W"})
+    hass.states.async_remove("sensor.power")
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+
+    client = await hass_client()
+    for query in ("", "&minimal_response", "&significant_changes_only=0"):
+        url = (
+            f"/api/history/period/{start.isoformat()}"
+            f"?filter_entity_id=sensor.power,light.kitchen{query}"
+        )
+        recent_states = hass.data.pop(history.DATA_RECENT_STATES)
+        response = await client.get(url)
+        hass.data[history.DATA_RECENT_STATES] = recent_states
+        assert response.status == 200
+        expected = await response.json()
+        assert len(expected) == 2
+
+        with patch(
+            "homeassistant.components.history._get_significant_states",
+            side_effect=history._get_significant_states,
+        ) as get_significant_states:
+            cached_response = await client.get(url)
+        assert cached_response.status == 200
+        assert await cached_response.json() == expected
+        assert not get_significant_states.called
+
+    with patch(
+        "homeassistant.components.history._get_significant_states",
+        side_effect=history._get_significant_states,
+    ) as get_significant_states:
+        response = await client.get(
+            f"/api/history/period/{before_cache.isoformat()}"
+            "?filter_entity_id=light.kitchen"
+        )
+    assert response.status == 200
+    assert get_significant_states.called
+
+
 async def test_fetch_period_api_with_use_include_order(hass, hass_client):
     """Test the fetch period view for history with include order."""
     await hass.async_add_executor_job(init_recorder_component, hass)
@@ -1008,3 +1184,60 @@ async def test_entity_ids_limit_via_api_with_skip_initial_state(hass, hass_clien
     assert len(response_json) == 2
     assert response_json[0][0]["entity_id"] == "light.kitchen"
     assert response_json[1][0]["entity_id"] == "light.cow"
+
+
+async def test_statistics_during_period(hass, hass_ws_client):
+    """Test statistics_during_period."""
+    now = dt_util.utcnow()
+    start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    instance = hass.data[recorder.DATA_INSTANCE]
+    await hass.async_add_executor_job(instance.block_till_done)
+
+    with patch("homeassistant.core.dt_util.utcnow", return_value=start):
+        hass.states.async_set("sensor.test", "10")
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+    await hass.async_add_executor_job(
+        recorder.statistics.compile_statistics, instance, start
+    )
+
+    client = await hass_ws_client()
+    await client.send_json(
+        {
+            "id": 1,
+            "type": "history/statistics_during_period",
+            "start_time": start.isoformat(),
+            "statistic_ids": ["sensor.test"],
+            "period": "5minute",
+        }
+    )
+    response = await client.receive_json()
+    assert response["success"]
+    assert response["result"] == {
+        "sensor.test": [
+            {
+                "statistic_id": "sensor.test",
+                "start": start.isoformat(),
+                "mean": 10.0,
+                "min": 10.0,
+                "max": 10.0,
+                "last": 10.0,
+                "sum": None,
+            }
+        ]
+    }
+
+    await client.send_json(
+        {
+            "id": 2,
+            "type": "history/statistics_during_period",
+            "start_time": "invalid",
+        }
+    )
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "invalid_start_time"
@@ -10,7 +10,8 @@ from homeassistant.components.homeassistant.triggers import (
     numeric_state as numeric_state_trigger,
 )
 from homeassistant.const import ATTR_ENTITY_ID, ENTITY_MATCH_ALL, SERVICE_TURN_OFF
-from homeassistant.core import Context
+from homeassistant.core import Context, callback
+from homeassistant.helpers.event import async_state_change_fan_out
 from homeassistant.setup import async_setup_component
 import homeassistant.util.dt as dt_util
 
@@ -1391,3 +1392,116 @@ async def test_attribute_if_not_fires_on_entities_change_with_for_after_stop(
     async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=10))
     await hass.async_block_till_done()
     assert len(calls) == 1
+
+
+async def test_triggers_share_threshold_index(hass, calls):
+    """Test triggers on the same entity share one listener and fire on crossing."""
+    hass.states.async_set("test.entity", 15)
+    thresholds = [
+        {"below": 10},
+        {"below": 20},
+        {"above": 12},
+        {"above": 5, "below": 12},
+        {"above": 30},
+    ]
+
+    assert await async_setup_component(
+        hass,
+        automation.DOMAIN,
+        {
+            automation.DOMAIN: [
+                {
+                    "trigger": {
+                        "platform": "numeric_state",
+                        "entity_id": "test.entity",
+                        **threshold,
+                    },
+                    "action": {
+                        "service": "test.automation",
+                        "data": {"trigger": index},
+                    },
+                }
+                for index, threshold in enumerate(thresholds)
+            ]
+        },
+    )
+    await hass.async_block_till_done()
+    assert async_state_change_fan_out(hass) == {"test.entity": 1}
+
+    # The first state change fires every matching trigger
+    hass.states.async_set("test.entity", 16)
+    await hass.async_block_till_done()
+    assert [call.data["trigger"] for call in calls] == [1, 2]
+
+    # Still below 20 and above 12
+    hass.states.async_set("test.entity", 14)
+    await hass.async_block_till_done()
+    assert len(calls) == 2
+
+    # Crosses 12 and 10
+    hass.states.async_set("test.entity", 8)
+    await hass.async_block_till_done()
+    assert [call.data["trigger"] for call in calls[2:]] == [0, 3]
+
+    # Not a number, every trigger stops matching
+    hass.states.async_set("test.entity", "unavailable")
+    await hass.async_block_till_done()
+    hass.states.async_set("test.entity", 40)
+    await hass.async_block_till_done()
+    assert [call.data["trigger"] for call in calls[4:]] == [2, 4]
+
+
+async def test_threshold_index_removes_listener(hass):
+    """Test the shared listener is removed with the last trigger."""
+    runs = []
+
+    @callback
+    def action(variables, context=None):
+        runs.append(variables)
+
+    config = numeric_state_trigger.TRIGGER_SCHEMA(
+        {"platform": "numeric_state", "entity_id": "test.entity", "above": 10}
+    )
+    remove_first = await numeric_state_trigger.async_attach_trigger(
+        hass, config, action, {"name": "first"}
+    )
+    remove_second = await numeric_state_trigger.async_attach_trigger(
+        hass, config, action, {"name": "second"}
+    )
+    assert async_state_change_fan_out(hass) == {"test.entity": 1}
+
+    remove_first()
+    hass.states.async_set("test.entity", 11)
+    await hass.async_block_till_done()
+    assert len(runs) == 1
+
+    remove_second()
+    assert async_state_change_fan_out(hass) == {}
+
+
+async def test_threshold_index_action_raises(hass, caplog):
+    """Test a raising trigger does not keep the others from firing."""
+    runs = []
+
+    @callback
+    def raising_action(variables, context=None):
+        raise ValueError("boom")
+
+    @callback
+    def action(variables, context=None):
+        runs.append(variables)
+
+    config = numeric_state_trigger.TRIGGER_SCHEMA(
+        {"platform": "numeric_state", "entity_id": "test.entity", "above": 10}
+    )
+    await numeric_state_trigger.async_attach_trigger(
+        hass, config, raising_action, {"name": "first"}
+    )
+    await numeric_state_trigger.async_attach_trigger(
+        hass, config, action, {"name": "second"}
+    )
+
+    hass.states.async_set("test.entity", 11)
+    await hass.async_block_till_done()
+    assert len(runs) == 1
+    assert "Error while processing numeric state change" in caplog.text
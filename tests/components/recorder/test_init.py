@@ -1,7 +1,7 @@
 """The tests for the Recorder component."""
 # pylint: disable=protected-access
 from datetime import datetime, timedelta
-from unittest.mock import patch
+from unittest.mock import MagicMock, PropertyMock, patch
 
 from sqlalchemy.exc import OperationalError
 
@@ -9,21 +9,40 @@ from homeassistant.components.recorder import (
     CONFIG_SCHEMA,
     DOMAIN,
     Recorder,
+    _insert_events,
     run_information,
     run_information_from_instance,
     run_information_with_session,
 )
-from homeassistant.components.recorder.const import DATA_INSTANCE
-from homeassistant.components.recorder.models import Events, RecorderRuns, States
+from homeassistant.components.recorder.const import (
+    DATA_INSTANCE,
+    OVERLOAD_POLICY_DROP_ALL,
+)
+from homeassistant.components.recorder.models import (
+    Events,
+    RecorderRuns,
+    StateAttributes,
+    States,
+)
 from homeassistant.components.recorder.util import session_scope
-from homeassistant.const import MATCH_ALL, STATE_LOCKED, STATE_UNLOCKED
+from homeassistant.const import (
+    EVENT_STATE_CHANGED,
+    MATCH_ALL,
+    STATE_LOCKED,
+    STATE_UNLOCKED,
+)
 from homeassistant.core import Context, callback
+from homeassistant.helpers.entity_component import async_update_entity
 from homeassistant.setup import async_setup_component
 from homeassistant.util import dt as dt_util
 
-from .common import wait_recording_done
+from .common import trigger_db_commit, wait_recording_done
 
-from tests.common import fire_time_changed, get_test_home_assistant
+from tests.common import (
+    fire_time_changed,
+    get_test_home_assistant,
+    init_recorder_component,
+)
 
 
 def test_saving_state(hass, hass_recorder):
@@ -47,6 +66,126 @@ def test_saving_state(hass, hass_recorder):
     assert state == _state_empty_context(hass, entity_id)
 
 
+def test_saving_state_deduplicates_attributes(hass, hass_recorder):
+    """Test identical attributes are only stored once."""
+    hass = hass_recorder()
+
+    attributes = {"test_attr": 5, "test_attr_10": "nice"}
+    hass.states.set("test.recorder", "on", attributes)
+    hass.states.set("test.other", "on", attributes)
+    wait_recording_done(hass)
+    hass.states.set("test.recorder", "off", attributes)
+    hass.states.set("test.other", "off", {"test_attr": 6})
+    wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        db_states = list(session.query(States))
+        assert len(db_states) == 4
+        assert all(db_state.attributes is None for db_state in db_states)
+        assert len({db_state.attributes_id for db_state in db_states}) == 2
+
+        db_state_attributes = list(session.query(StateAttributes))
+        assert len(db_state_attributes) == 2
+        assert [attrs.to_native() for attrs in db_state_attributes] == [
+            attributes,
+            {"test_attr": 6},
+        ]
+        states = [db_state.to_native() for db_state in db_states]
+
+    assert states[2] == _state_empty_context(hass, "test.recorder")
+    assert states[3] == _state_empty_context(hass, "test.other")
+
+
+def test_saving_states_links_old_states(hass, hass_recorder):
+    """Test states written in one commit are linked to their old state."""
+    hass = hass_recorder()
+
+    hass.states.set("test.recorder", "on")
+    wait_recording_done(hass)
+    hass.states.set("test.recorder", "off")
+    hass.states.set("test.recorder", "on")
+    hass.bus.fire("test_event")
+    hass.states.remove("test.recorder")
+    hass.states.set("test.recorder", "off")
+    wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        db_states = list(session.query(States).order_by(States.state_id))
+        assert [db_state.state for db_state in db_states] == [
+            "on",
+            "off",
+            "on",
+            None,
+            "off",
+        ]
+        assert [db_state.old_state_id for db_state in db_states] == [
+            None,
+            db_states[0].state_id,
+            db_states[1].state_id,
+            db_states[2].state_id,
+            None,
+        ]
+        assert all(db_state.event_id for db_state in db_states)
+        assert session.query(Events).filter_by(event_type="test_event").count() == 1
+
+    stats = hass.data[DATA_INSTANCE].last_commit_stats
+    assert stats.states == 4
+    assert stats.events >= 5
+    assert stats.state_attributes == 0
+    assert stats.flush_time > 0
+
+
+def test_saving_states_in_waves(hass, hass_recorder):
+    """Test states of several entities written in one commit are linked."""
+    hass = hass_recorder()
+
+    contexts = {value: Context() for value in ("1", "2", "a", "x", "3", "b")}
+    hass.states.set("test.one", "1", context=contexts["1"])
+    wait_recording_done(hass)
+    hass.states.set("test.one", "2", context=contexts["2"])
+    hass.bus.fire("test_event")
+    hass.states.set("test.two", "a", context=contexts["a"])
+    hass.states.set("test.three", "x", context=contexts["x"])
+    hass.bus.fire("test_event")
+    hass.states.set("test.one", "3", context=contexts["3"])
+    hass.states.set("test.two", "b", context=contexts["b"])
+    wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        db_states = {db_state.state: db_state for db_state in session.query(States)}
+        assert len(db_states) == 6
+        # Each state is linked to the event of its state change
+        for value, db_state in db_states.items():
+            db_event = session.query(Events).get(db_state.event_id)
+            assert db_event.event_type == EVENT_STATE_CHANGED
+            assert db_event.context_id == contexts[value].id
+        assert db_states["2"].old_state_id == db_states["1"].state_id
+        assert db_states["3"].old_state_id == db_states["2"].state_id
+        assert db_states["a"].old_state_id is None
+        assert db_states["b"].old_state_id == db_states["a"].state_id
+        assert db_states["x"].old_state_id is None
+        assert all(db_state.event_id for db_state in db_states.values())
+
+    stats = hass.data[DATA_INSTANCE].last_commit_stats
+    assert stats.events == 7
+    assert stats.states == 5
+
+
+def test_insert_events_returning():
+    """Test the event_ids are returned by the inserts on PostgreSQL."""
+    connection = MagicMock()
+    connection.dialect.name = "postgresql"
+    connection.execute.side_effect = [
+        [MagicMock(event_id=event_id) for event_id in (12, 11)],
+        [MagicMock(event_id=13)],
+    ]
+    events = [{"event_type": "test_event"}] * 3
+
+    with patch("homeassistant.components.recorder.MAX_ROWS_PER_INSERT", 2):
+        assert _insert_events(connection, events) == [11, 12, 13]
+    assert connection.execute.call_count == 2
+
+
 def test_saving_state_with_exception(hass, hass_recorder, caplog):
     """Test saving and restoring a state."""
     hass = hass_recorder()
@@ -55,17 +194,18 @@ def test_saving_state_with_exception(hass, hass_recorder, caplog):
     state = "restoring_from_db"
     attributes = {"test_attr": 5, "test_attr_10": "nice"}
 
-    def _throw_if_state_in_session(*args, **kwargs):
-        for obj in hass.data[DATA_INSTANCE].event_session:
-            if isinstance(obj, States):
+    def _throw_if_state_pending(*args, **kwargs):
+        for _, state_params, _ in hass.data[DATA_INSTANCE]._pending_events:
+            if state_params is not None:
                 raise OperationalError(
                     "insert the state", "fake params", "forced to fail"
                 )
+        return {}, {}, None
 
     with patch("time.sleep"), patch.object(
-        hass.data[DATA_INSTANCE].event_session,
-        "flush",
-        side_effect=_throw_if_state_in_session,
+        hass.data[DATA_INSTANCE],
+        "_write_pending_events",
+        side_effect=_throw_if_state_pending,
     ):
         hass.states.set(entity_id, "fail", attributes)
         wait_recording_done(hass)
@@ -332,6 +472,95 @@ def test_recorder_setup_failure():
     hass.stop()
 
 
+def test_overload_drops_low_priority_events_first(hass, hass_recorder, caplog):
+    """Test other events are dropped before state changes when overloaded."""
+    hass = hass_recorder({"max_backlog": 10})
+    instance = hass.data[DATA_INSTANCE]
+
+    with patch.object(Recorder, "backlog", new_callable=PropertyMock) as backlog:
+        backlog.return_value = 5
+        hass.bus.fire("test_event")
+        hass.states.set("test.recorder", "on")
+        hass.block_till_done()
+        assert instance.dropped_events >= 1
+        assert "events are dropped until the database catches up" in caplog.text
+
+        dropped_events = instance.dropped_events
+        backlog.return_value = 10
+        hass.states.set("test.recorder", "off")
+        fire_time_changed(hass, dt_util.utcnow())
+        hass.block_till_done()
+        assert instance.dropped_events > dropped_events
+
+    wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        assert [state.state for state in session.query(States)] == ["on"]
+        assert session.query(Events).filter_by(event_type="test_event").count() == 0
+
+
+def test_overload_drop_all(hass, hass_recorder):
+    """Test all events are dropped at the max backlog with the drop_all policy."""
+    hass = hass_recorder({"max_backlog": 10, "overload_policy": "drop_all"})
+    instance = hass.data[DATA_INSTANCE]
+    assert instance.overload_policy == OVERLOAD_POLICY_DROP_ALL
+
+    with patch.object(Recorder, "backlog", new_callable=PropertyMock) as backlog:
+        backlog.return_value = 9
+        hass.bus.fire("test_event")
+        hass.block_till_done()
+        assert instance.dropped_events == 0
+
+        backlog.return_value = 10
+        hass.bus.fire("test_event")
+        hass.states.set("test.recorder", "on")
+        hass.block_till_done()
+        assert instance.dropped_events == 2
+
+
+async def test_recorder_info(hass, hass_ws_client):
+    """Test the recorder/info websocket command."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    instance = hass.data[DATA_INSTANCE]
+    hass.states.async_set("test.recorder", "on")
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(instance.block_till_done)
+
+    client = await hass_ws_client()
+    await client.send_json({"id": 1, "type": "recorder/info"})
+    response = await client.receive_json()
+    assert response["success"]
+    assert response["result"] == {
+        "backlog": 0,
+        "backlog_age": 0,
+        "max_backlog": 40000,
+        "overload_policy": "drop_low_priority",
+        "dropped_events": 0,
+        "last_commit": instance.last_commit_stats._asdict(),
+    }
+
+
+async def test_recorder_queue_sensors(hass):
+    """Test the sensors reporting the recorder queue."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    hass.data[DATA_INSTANCE].dropped_events = 3
+    assert await async_setup_component(
+        hass, "sensor", {"sensor": {"platform": "recorder"}}
+    )
+    await hass.async_block_till_done()
+    # Events queued while the recorder caught up on statistics are gone now
+    await hass.async_add_executor_job(hass.data[DATA_INSTANCE].block_till_done)
+    await async_update_entity(hass, "sensor.recorder_backlog")
+    await async_update_entity(hass, "sensor.recorder_backlog_age")
+
+    assert hass.states.get("sensor.recorder_backlog").state == "0"
+    # The state of the backlog sensor itself may be queued
+    assert float(hass.states.get("sensor.recorder_backlog_age").state) < 1
+    assert hass.states.get("sensor.recorder_dropped_events").state == "3"
+
+
 async def test_defaults_set(hass):
     """Test the config defaults are set."""
     recorder_config = None
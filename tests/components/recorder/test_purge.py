@@ -1,12 +1,23 @@
 """Test data purging."""
 from datetime import datetime, timedelta
 import json
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from homeassistant.components import recorder
-from homeassistant.components.recorder.const import DATA_INSTANCE
-from homeassistant.components.recorder.models import Events, RecorderRuns, States
-from homeassistant.components.recorder.purge import purge_old_data
+from homeassistant.components.recorder.const import (
+    DATA_INSTANCE,
+    SQLITE_AUTO_VACUUM_INCREMENTAL,
+)
+from homeassistant.components.recorder.models import (
+    Events,
+    RecorderRuns,
+    StateAttributes,
+    States,
+)
+from homeassistant.components.recorder.purge import (
+    _repack_incremental,
+    purge_old_data,
+)
 from homeassistant.components.recorder.util import session_scope
 from homeassistant.util import dt as dt_util
 
@@ -25,18 +36,58 @@ def test_purge_old_states(hass, hass_recorder):
 
         # run purge_old_data()
         finished = purge_old_data(hass.data[DATA_INSTANCE], 4, repack=False)
+        assert finished
+        assert states.count() == 2
+
+
+def test_purge_old_states_in_batches(hass, hass_recorder):
+    """Test old states are purged in batches within the time budget."""
+    hass = hass_recorder({"purge_batch_size": 3, "purge_time_budget": 0})
+    _add_test_states(hass)
+    instance = hass.data[DATA_INSTANCE]
+
+    with session_scope(hass=hass) as session:
+        states = session.query(States)
+        purged_state_id = states.order_by(States.state_id).first().state_id
+        instance._old_states["test.recorder2"] = purged_state_id
+        last_state = states.order_by(States.state_id.desc()).first()
+        last_state.old_state_id = purged_state_id
+        session.commit()
+
+        finished = purge_old_data(instance, 4, repack=False)
         assert not finished
-        assert states.count() == 4
+        assert states.count() == 3
+        assert "test.recorder2" not in instance._old_states
+        assert states.filter(States.old_state_id.isnot(None)).count() == 0
 
-        finished = purge_old_data(hass.data[DATA_INSTANCE], 4, repack=False)
+        finished = purge_old_data(instance, 4, repack=False)
         assert not finished
         assert states.count() == 2
 
-        finished = purge_old_data(hass.data[DATA_INSTANCE], 4, repack=False)
+        finished = purge_old_data(instance, 4, repack=False)
         assert finished
         assert states.count() == 2
 
 
+def test_purge_unused_state_attributes(hass, hass_recorder):
+    """Test deleting state attributes once no state references them."""
+    hass = hass_recorder()
+    _add_test_states_with_shared_attributes(hass)
+    instance = hass.data[DATA_INSTANCE]
+
+    with session_scope(hass=hass) as session:
+        state_attributes = session.query(StateAttributes)
+        assert state_attributes.count() == 2
+        attributes_id = session.query(States).first().attributes_id
+        instance._state_attributes_ids["old"] = attributes_id
+
+        finished = purge_old_data(instance, 4, repack=False)
+        assert finished
+        assert session.query(States).count() == 2
+        assert state_attributes.count() == 1
+        assert "old" not in instance._state_attributes_ids
+
+
 def test_purge_old_events(hass, hass_recorder):
     """Test deleting old events."""
     hass = hass_recorder()
@@ -48,16 +99,8 @@ def test_purge_old_events(hass, hass_recorder):
 
         # run purge_old_data()
         finished = purge_old_data(hass.data[DATA_INSTANCE], 4, repack=False)
-        assert not finished
-        assert events.count() == 4
-
-        finished = purge_old_data(hass.data[DATA_INSTANCE], 4, repack=False)
-        assert not finished
-        assert events.count() == 2
-
-        # we should only have 2 events left
-        finished = purge_old_data(hass.data[DATA_INSTANCE], 4, repack=False)
         assert finished
+        # we should only have 2 events left
         assert events.count() == 2
 
 
@@ -138,11 +181,42 @@ def test_purge_method(hass, hass_recorder):
             hass.data[DATA_INSTANCE].block_till_done()
             wait_recording_done(hass)
             assert (
-                mock_logger.debug.mock_calls[5][1][0]
+                mock_logger.debug.mock_calls[-1][1][0]
                 == "Vacuuming SQL DB to free space"
             )
 
 
+def test_purge_incremental_vacuum(hass, hass_recorder):
+    """Test sqlite space is reclaimed incrementally without repack."""
+    hass = hass_recorder()
+    _add_test_states(hass)
+    instance = hass.data[DATA_INSTANCE]
+
+    assert (
+        instance.engine.execute("PRAGMA auto_vacuum").scalar()
+        == SQLITE_AUTO_VACUUM_INCREMENTAL
+    )
+
+    with patch("homeassistant.components.recorder.purge._LOGGER") as mock_logger:
+        assert purge_old_data(instance, 4, repack=False)
+
+    assert (
+        mock_logger.debug.mock_calls[-1][1][0]
+        == "Incrementally vacuuming SQL DB to free space"
+    )
+    assert instance.engine.execute("PRAGMA freelist_count").scalar() == 0
+
+
+def test_purge_no_blocking_repack_on_server_databases():
+    """Test server databases are not vacuumed or optimized after a purge."""
+    for dialect in ("postgresql", "mysql"):
+        instance = MagicMock()
+        instance.engine.dialect.name = dialect
+        _repack_incremental(instance)
+        assert not instance.engine.execute.called
+        assert not instance.engine.connect.called
+
+
 def _add_test_states(hass):
     """Add multiple states to the db for testing."""
     now = datetime.now()
@@ -180,6 +254,46 @@ def _add_test_states(hass):
             )
 
 
+def _add_test_states_with_shared_attributes(hass):
+    """Add states referencing shared attributes to the db for testing."""
+    now = datetime.now()
+    eleven_days_ago = now - timedelta(days=11)
+
+    hass.block_till_done()
+    hass.data[DATA_INSTANCE].block_till_done()
+    wait_recording_done(hass)
+
+    with recorder.session_scope(hass=hass) as session:
+        for timestamp, shared_attrs in (
+            (eleven_days_ago, '{"test_attr": 4}'),
+            (eleven_days_ago, '{"test_attr": 5}'),
+            (now, '{"test_attr": 5}'),
+            (now, '{"test_attr": 5}'),
+        ):
+            state_attributes = (
+                session.query(StateAttributes)
+                .filter_by(shared_attrs=shared_attrs)
+                .first()
+            )
+            if state_attributes is None:
+                state_attributes = StateAttributes(
+                    hash=StateAttributes.hash_shared_attrs(shared_attrs),
+                    shared_attrs=shared_attrs,
+                )
+            session.add(
+                States(
+                    entity_id="test.recorder2",
+                    domain="sensor",
+                    state="on",
+                    state_attributes=state_attributes,
+                    last_changed=timestamp,
+                    last_updated=timestamp,
+                    created=timestamp,
+                )
+            )
+            session.flush()
+
+
 def _add_test_events(hass):
     """Add a few events for testing."""
     now = datetime.now()
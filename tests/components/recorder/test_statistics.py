@@ -0,0 +1,208 @@
+"""The tests for the recorder statistics."""
+# pylint: disable=protected-access
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.components.recorder.const import DATA_INSTANCE
+from homeassistant.components.recorder.models import (
+    Statistics,
+    StatisticsRuns,
+    StatisticsShortTerm,
+)
+from homeassistant.components.recorder.statistics import (
+    PERIOD_5MINUTE,
+    _time_weighted_statistics,
+    compile_missing_statistics,
+    compile_statistics,
+    short_term_period_start,
+    statistics_during_period,
+)
+from homeassistant.components.recorder.util import session_scope
+from homeassistant.const import ATTR_DEVICE_CLASS, DEVICE_CLASS_ENERGY
+import homeassistant.util.dt as dt_util
+
+from .common import wait_recording_done
+
+
+def _set_states(hass, start, entity_id, values, attributes=None):
+    """Set states of an entity at an offset in seconds from start."""
+    for offset, value in values:
+        with patch(
+            "homeassistant.core.dt_util.utcnow",
+            return_value=start + timedelta(seconds=offset),
+        ):
+            hass.states.set(entity_id, value, attributes)
+    wait_recording_done(hass)
+
+
+def test_short_term_period_start():
+    """Test the start of the last completed five minute period."""
+    now = dt_util.utcnow().replace(hour=10, minute=7, second=10)
+    assert short_term_period_start(now) == now.replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+def test_compile_statistics(hass_recorder):
+    """Test compiling five minute and hourly statistics."""
+    hass = hass_recorder()
+    instance = hass.data[DATA_INSTANCE]
+    start = dt_util.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+
+    _set_states(hass, start, "sensor.temperature", [(0, "10"), (60, "20"), (180, "30")])
+    _set_states(hass, start, "sensor.text", [(0, "on"), (60, "off")])
+    _set_states(hass, start, "binary_sensor.motion", [(0, "1")])
+
+    compile_statistics(instance, start)
+    # Compiling the same period again is a no-op
+    compile_statistics(instance, start)
+
+    stats = statistics_during_period(hass, start, period=PERIOD_5MINUTE)
+    assert stats == {
+        "sensor.temperature": [
+            {
+                "statistic_id": "sensor.temperature",
+                "start": start,
+                "mean": 22.0,
+                "min": 10.0,
+                "max": 30.0,
+                "last": 30.0,
+                "sum": None,
+            }
+        ]
+    }
+
+    for minutes in range(5, 60, 5):
+        compile_statistics(instance, start + timedelta(minutes=minutes))
+
+    with session_scope(hass=hass) as session:
+        assert session.query(StatisticsShortTerm).count() == 12
+        assert session.query(Statistics).count() == 1
+
+    stats = statistics_during_period(hass, start, statistic_ids=["sensor.temperature"])
+    assert stats == {
+        "sensor.temperature": [
+            {
+                "statistic_id": "sensor.temperature",
+                "start": start,
+                "mean": (22.0 + 11 * 30.0) / 12,
+                "min": 10.0,
+                "max": 30.0,
+                "last": 30.0,
+                "sum": None,
+            }
+        ]
+    }
+    assert statistics_during_period(hass, start + timedelta(hours=1)) == {}
+
+
+def test_compile_statistics_counter(hass_recorder):
+    """Test compiling the sum of a counter."""
+    hass = hass_recorder()
+    instance = hass.data[DATA_INSTANCE]
+    start = dt_util.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+    attributes = {ATTR_DEVICE_CLASS: DEVICE_CLASS_ENERGY}
+
+    _set_states(hass, start, "sensor.energy", [(0, "5"), (60, "8")], attributes)
+    compile_statistics(instance, start)
+    _set_states(
+        hass, start + timedelta(minutes=5), "sensor.energy", [(0, "10"), (60, "2")]
+    )
+    hass.states.set("sensor.energy", "2", attributes)
+    compile_statistics(instance, start + timedelta(minutes=5))
+
+    stats = statistics_during_period(hass, start, period=PERIOD_5MINUTE)
+    assert [row["sum"] for row in stats["sensor.energy"]] == [3.0, 4.0]
+
+
+def test_compile_missing_statistics(hass_recorder):
+    """Test the periods since the last compiled one are caught up."""
+    hass = hass_recorder()
+    instance = hass.data[DATA_INSTANCE]
+    hass.states.set("sensor.temperature", "10")
+    wait_recording_done(hass)
+
+    # The recorder compiled the last period when it started
+    with session_scope(hass=hass) as session:
+        assert session.query(StatisticsRuns).count() == 1
+        last_run = session.query(StatisticsRuns).one().start
+
+    # Two hours later, twenty four periods are caught up in two runs
+    utc_now = dt_util.utcnow() + timedelta(hours=2)
+    with patch(
+        "homeassistant.components.recorder.statistics.MAX_MISSING_PERIODS_PER_RUN",
+        12,
+    ):
+        assert not compile_missing_statistics(instance, utc_now)
+        with session_scope(hass=hass) as session:
+            assert session.query(StatisticsRuns).count() == 13
+        assert compile_missing_statistics(instance, utc_now)
+        assert compile_missing_statistics(instance, utc_now)
+
+    with session_scope(hass=hass) as session:
+        assert session.query(StatisticsRuns).count() == 25
+        assert session.query(StatisticsShortTerm).count() == 24
+        starts = [
+            row.start
+            for row in session.query(StatisticsShortTerm).order_by(
+                StatisticsShortTerm.start
+            )
+        ]
+    assert starts == [last_run + timedelta(minutes=5 * idx) for idx in range(1, 25)]
+
+
+def test_compile_hourly_statistics_time_weighted(hass_recorder):
+    """Test the hourly mean is weighted by the time the state was numeric."""
+    hass = hass_recorder()
+    instance = hass.data[DATA_INSTANCE]
+    start = dt_util.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+
+    _set_states(
+        hass,
+        start,
+        "sensor.temperature",
+        [(0, "10"), (60, "unavailable"), (240, "30")],
+    )
+    for minutes in range(0, 60, 5):
+        compile_statistics(instance, start + timedelta(minutes=minutes))
+
+    stats = statistics_during_period(hass, start, period=PERIOD_5MINUTE)
+    assert stats["sensor.temperature"][0]["mean"] == 20.0
+
+    stats = statistics_during_period(hass, start, statistic_ids=["sensor.temperature"])
+    assert stats["sensor.temperature"][0]["mean"] == pytest.approx(
+        (10 * 60 + 30 * 3360) / 3420
+    )
+
+
+def test_time_weighted_statistics():
+    """Test the time weighted statistics ignore non numeric states."""
+    start = dt_util.utcnow()
+    end = start + timedelta(minutes=5)
+
+    assert _time_weighted_statistics(start, end, None, [], False) is None
+    assert _time_weighted_statistics(start, end, 4.0, [], False) == {
+        "mean": 4.0,
+        "min": 4.0,
+        "max": 4.0,
+        "last": 4.0,
+        "sum": None,
+    }
+    assert (
+        _time_weighted_statistics(
+            start,
+            end,
+            None,
+            [(start + timedelta(minutes=1), 2.0), (start + timedelta(minutes=2), None)],
+            False,
+        )
+        == {"mean": 2.0, "min": 2.0, "max": 2.0, "last": 2.0, "sum": None}
+    )
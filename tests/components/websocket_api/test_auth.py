@@ -119,6 +119,7 @@ async def test_auth_active_with_token(
     auth_msg = await no_auth_websocket_client.receive_json()
 
     assert auth_msg["type"] == TYPE_AUTH_OK
+    assert "coalesce_messages" not in auth_msg
 
 
 async def test_auth_active_user_inactive(hass, aiohttp_client, hass_access_token):
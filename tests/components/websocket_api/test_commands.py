@@ -1,4 +1,6 @@
 """Tests for WebSocket API commands."""
+from unittest.mock import patch
+
 from async_timeout import timeout
 
 from homeassistant.components.websocket_api import const
@@ -11,6 +13,7 @@ from homeassistant.components.websocket_api.const import URL
 from homeassistant.core import Context, callback
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import entity
+from homeassistant.helpers.template import COMPILED_TEMPLATE_CACHE_SIZE, Template
 from homeassistant.loader import async_get_integration
 from homeassistant.setup import async_setup_component
 
@@ -206,6 +209,43 @@ async def test_get_states(hass, websocket_client):
     assert msg["result"] == states
 
 
+async def test_get_states_cached_fragments(hass, websocket_client, hass_admin_user):
+    """Test get_states reuses the JSON of unchanged states."""
+    hass.states.async_set("greeting.hello", "world")
+    hass.states.async_set("greeting.bye", "universe")
+
+    with patch(
+        "homeassistant.components.websocket_api.commands.const.JSON_DUMP",
+        wraps=const.JSON_DUMP,
+    ) as mock_dump:
+        await websocket_client.send_json({"id": 5, "type": "get_states"})
+        msg = await websocket_client.receive_json()
+        assert msg["success"]
+        assert len(mock_dump.mock_calls) == 2
+
+        hass.states.async_set("greeting.hello", "moon")
+        hass.states.async_remove("greeting.bye")
+        await hass.async_block_till_done()
+
+        await websocket_client.send_json({"id": 6, "type": "get_states"})
+        msg = await websocket_client.receive_json()
+        assert msg["result"] == [hass.states.get("greeting.hello").as_dict()]
+        assert len(mock_dump.mock_calls) == 3
+
+        hass_admin_user.groups = []
+        hass_admin_user.mock_policy(
+            {"entities": {"entity_ids": {"greeting.hello": True}}}
+        )
+        hass.states.async_set("greeting.other", "stars")
+
+        await websocket_client.send_json({"id": 7, "type": "get_states"})
+        msg = await websocket_client.receive_json()
+        assert msg["result"] == [hass.states.get("greeting.hello").as_dict()]
+        assert len(mock_dump.mock_calls) == 3
+
+    assert list(hass.data[const.DATA_STATES_JSON]._fragments) == ["greeting.hello"]
+
+
 async def test_get_services(hass, websocket_client):
     """Test get_services command."""
     await websocket_client.send_json({"id": 5, "type": "get_services"})
@@ -320,6 +360,103 @@ async def test_states_filters_visible(hass, hass_admin_user, websocket_client):
     assert msg["result"][0]["entity_id"] == "test.entity"
 
 
+async def test_subscribe_entities(hass, websocket_client):
+    """Test subscribe_entities sends a snapshot and then only the changes."""
+    context = Context()
+    hass.states.async_set("light.permitted", "off", {"color": "red"}, context=context)
+    state = hass.states.get("light.permitted")
+
+    await websocket_client.send_json({"id": 7, "type": "subscribe_entities"})
+
+    msg = await websocket_client.receive_json()
+    assert msg["id"] == 7
+    assert msg["type"] == const.TYPE_RESULT
+    assert msg["success"]
+
+    msg = await websocket_client.receive_json()
+    assert msg["id"] == 7
+    assert msg["type"] == "event"
+    assert msg["event"] == {
+        "a": {
+            "light.permitted": {
+                "s": "off",
+                "a": {"color": "red"},
+                "c": context.id,
+                "lc": state.last_changed.timestamp(),
+            }
+        }
+    }
+
+    # Changes in the same loop iteration are sent in one message
+    hass.states.async_set("light.permitted", "on", {"color": "red"}, context=context)
+    hass.states.async_set("light.permitted", "on", {"brightness": 100}, context=context)
+    hass.states.async_set("light.new", "on")
+    new_state = hass.states.get("light.permitted")
+
+    msg = await websocket_client.receive_json()
+    assert msg["id"] == 7
+    assert msg["type"] == "event"
+    assert msg["event"] == {
+        "c": {
+            "light.permitted": {
+                "+": {
+                    "s": "on",
+                    "a": {"brightness": 100},
+                    "lc": new_state.last_changed.timestamp(),
+                },
+                "-": {"a": ["color"]},
+            }
+        },
+        "a": {
+            "light.new": {
+                "s": "on",
+                "a": {},
+                "c": hass.states.get("light.new").context.id,
+                "lc": hass.states.get("light.new").last_changed.timestamp(),
+            }
+        },
+    }
+
+    hass.states.async_remove("light.new")
+
+    msg = await websocket_client.receive_json()
+    assert msg["event"] == {"r": ["light.new"]}
+
+
+async def test_subscribe_entities_filtered(hass, websocket_client, hass_admin_user):
+    """Test subscribe_entities only sends the requested and visible entities."""
+    hass_admin_user.groups = []
+    hass_admin_user.mock_policy(
+        {"entities": {"entity_ids": {"light.permitted": True, "light.other": True}}}
+    )
+    hass.states.async_set("light.permitted", "off")
+    hass.states.async_set("light.other", "off")
+    hass.states.async_set("light.not_permitted", "off")
+
+    await websocket_client.send_json(
+        {
+            "id": 7,
+            "type": "subscribe_entities",
+            "entity_ids": ["light.permitted", "light.not_permitted"],
+        }
+    )
+
+    msg = await websocket_client.receive_json()
+    assert msg["success"]
+
+    msg = await websocket_client.receive_json()
+    assert list(msg["event"]["a"]) == ["light.permitted"]
+
+    hass.states.async_set("light.other", "on")
+    hass.states.async_set("light.not_permitted", "on")
+    hass.states.async_set("light.permitted", "off", {"color": "red"})
+
+    msg = await websocket_client.receive_json()
+    assert list(msg["event"]) == ["c"]
+    assert msg["event"]["c"]["light.permitted"]["+"]["a"] == {"color": "red"}
+    assert list(msg["event"]["c"]) == ["light.permitted"]
+
+
 async def test_get_states_not_allows_nan(hass, websocket_client):
     """Test get_states command not allows NaN floats."""
     hass.states.async_set("greeting.hello", "world", {"hello": float("NaN")})
@@ -631,6 +768,23 @@ async def test_render_template_returns_with_match_all(hass, websocket_client):
     assert msg["success"]
 
 
+async def test_template_cache_info(hass, websocket_client):
+    """Test the statistics of the compiled template cache."""
+    for _ in range(2):
+        Template("{{ states('light.cache_info') }}", hass).ensure_valid()
+
+    await websocket_client.send_json({"id": 5, "type": "template/cache_info"})
+
+    msg = await websocket_client.receive_json()
+    assert msg["id"] == 5
+    assert msg["type"] == const.TYPE_RESULT
+    assert msg["success"]
+    assert msg["result"]["hits"] >= 1
+    assert msg["result"]["misses"] >= 1
+    assert msg["result"]["size"] >= 1
+    assert msg["result"]["max_size"] == COMPILED_TEMPLATE_CACHE_SIZE
+
+
 async def test_manifest_list(hass, websocket_client):
     """Test loading manifests."""
     http = await async_get_integration(hass, "http")
@@ -1,11 +1,22 @@
 """Test Websocket API http module."""
+import asyncio
 from datetime import timedelta
-from unittest.mock import patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from aiohttp import WSMsgType
+from aiohttp.http_websocket import WebSocketReader
+from aiohttp.streams import DataQueue
 import pytest
 
 from homeassistant.components.websocket_api import const, http
+from homeassistant.components.websocket_api.auth import (
+    TYPE_AUTH,
+    TYPE_AUTH_OK,
+    TYPE_AUTH_REQUIRED,
+)
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.setup import async_setup_component
 from homeassistant.util.dt import utcnow
 
 from tests.common import async_fire_time_changed
@@ -26,13 +37,311 @@ def mock_low_peak():
 
 
 async def test_pending_msg_overflow(hass, mock_low_queue, websocket_client):
-    """Test get_panels command."""
+    """Test a client is disconnected when it falls too far behind."""
+    await websocket_client.send_json({"id": 1, "type": "subscribe_events"})
+    msg = await websocket_client.receive_json()
+    assert msg["success"]
+
     for idx in range(10):
-        await websocket_client.send_json({"id": idx + 1, "type": "ping"})
-    msg = await websocket_client.receive()
+        hass.bus.async_fire("test_event", {"idx": idx})
+
+    while True:
+        msg = await websocket_client.receive()
+        if msg.type != WSMsgType.TEXT:
+            break
     assert msg.type == WSMsgType.close
 
 
+async def test_pending_msg_backpressure(hass, mock_low_peak, websocket_client):
+    """Test commands wait for the client to catch up instead of disconnecting."""
+    with patch("homeassistant.components.websocket_api.http.MAX_PENDING_MSG", 10):
+        for idx in range(20):
+            await websocket_client.send_json({"id": idx + 1, "type": "ping"})
+
+        for idx in range(20):
+            msg = await websocket_client.receive_json()
+            assert msg["id"] == idx + 1
+            assert msg["type"] == "pong"
+
+
+async def test_pending_msg_peak_adapts_to_write_rate(
+    hass, mock_low_peak, hass_ws_client, caplog
+):
+    """Test clients that receive quickly may stay over the default peak."""
+    orig_handler = http.WebSocketHandler
+    instance = None
+
+    def instantiate_handler(*args):
+        nonlocal instance
+        instance = orig_handler(*args)
+        return instance
+
+    with patch(
+        "homeassistant.components.websocket_api.http.WebSocketHandler",
+        instantiate_handler,
+    ):
+        websocket_client = await hass_ws_client()
+
+    instance._async_update_write_rate(1000, 1)
+    assert instance._write_peak() == 5 * 1000 * const.PENDING_MSG_PEAK_TIME // 2048
+
+    # Kill writer task and fill queue past the default peak
+    for _ in range(10):
+        instance._to_write.put_nowait(None)
+    instance._send_message({})
+    assert instance._peak_checker_unsub is None
+
+    async_fire_time_changed(
+        hass, utcnow() + timedelta(seconds=const.PENDING_MSG_PEAK_TIME + 1)
+    )
+    await hass.async_block_till_done()
+    assert "Client unable to keep up with pending messages" not in caplog.text
+    assert not websocket_client.closed
+
+
+async def test_receive_while_catching_up(hass, aiohttp_client, hass_access_token):
+    """Test pings and a close are handled while the client catches up."""
+    assert await async_setup_component(hass, "websocket_api", {})
+    await hass.async_block_till_done()
+    orig_handler = http.WebSocketHandler
+    instance = None
+
+    def instantiate_handler(*args):
+        nonlocal instance
+        instance = orig_handler(*args)
+        return instance
+
+    client = await aiohttp_client(hass.http.app)
+    with patch(
+        "homeassistant.components.websocket_api.http.WebSocketHandler",
+        instantiate_handler,
+    ):
+        ws = await client.ws_connect(http.URL, autoping=False)
+    await ws.receive_json()
+    await ws.send_json({"type": TYPE_AUTH, "access_token": hass_access_token})
+    await ws.receive_json()
+    assert hass.data[const.DATA_CONNECTIONS] == 1
+    disconnected = asyncio.Event()
+
+    @callback
+    def async_disconnected():
+        disconnected.set()
+
+    async_dispatcher_connect(
+        hass, const.SIGNAL_WEBSOCKET_DISCONNECTED, async_disconnected
+    )
+
+    # Keep the writer from resuming the commands, the command the
+    # handler was already waiting for is still handled
+    with patch.object(instance._write_ready, "set"):
+        instance._write_ready.clear()
+        await ws.send_json({"id": 1, "type": "ping"})
+        assert (await ws.receive_json())["id"] == 1
+
+        await ws.ping()
+        msg = await ws.receive()
+        assert msg.type == WSMsgType.PONG
+
+        await ws.send_json({"id": 2, "type": "ping"})
+        with pytest.raises(asyncio.TimeoutError):
+            await ws.receive_json(timeout=0.1)
+
+    instance._write_ready.set()
+    assert (await ws.receive_json())["id"] == 2
+
+    with patch.object(instance._write_ready, "set"):
+        instance._write_ready.clear()
+        await ws.send_json({"id": 3, "type": "ping"})
+        assert (await ws.receive_json())["id"] == 3
+        await ws.close()
+        await asyncio.wait_for(disconnected.wait(), 1)
+        assert hass.data[const.DATA_CONNECTIONS] == 0
+
+
+async def test_pending_msg_max_adapts_to_write_rate(hass, hass_ws_client):
+    """Test clients that receive quickly are allowed a larger backlog."""
+    orig_handler = http.WebSocketHandler
+    instance = None
+
+    def instantiate_handler(*args):
+        nonlocal instance
+        instance = orig_handler(*args)
+        return instance
+
+    with patch(
+        "homeassistant.components.websocket_api.http.WebSocketHandler",
+        instantiate_handler,
+    ):
+        await hass_ws_client()
+
+    assert instance._max_pending() == const.MAX_PENDING_MSG
+
+    # Writes without a backlog do not tell how fast the client receives
+    with patch("homeassistant.components.websocket_api.http.time.monotonic") as now:
+        now.return_value = 0
+        instance._async_track_backlog(1)
+        assert instance._write_rate == 0
+
+        for message in range(10):
+            instance._to_write.put_nowait(message)
+        instance._async_track_backlog(1)
+        now.return_value = 0.5
+        instance._async_track_backlog(500)
+        assert instance._write_rate == 0
+
+        now.return_value = 2
+        instance._async_track_backlog(1000)
+        assert instance._write_rate == 750
+        assert instance._max_pending() == 750 * const.PENDING_MSG_PEAK_TIME
+
+        while not instance._to_write.empty():
+            instance._to_write.get_nowait()
+        instance._async_track_backlog(1)
+        assert instance._backlog_start is None
+
+    instance._async_update_write_rate(100000, 1)
+    assert instance._max_pending() == const.MAX_PENDING_MSG_LIMIT
+
+
+async def test_coalesce_messages(hass, aiohttp_client, hass_access_token):
+    """Test queued messages are sent in one frame when negotiated."""
+    assert await async_setup_component(hass, "websocket_api", {})
+    await hass.async_block_till_done()
+    client = await aiohttp_client(hass.http.app)
+
+    async with client.ws_connect(http.URL) as ws:
+        msg = await ws.receive_json()
+        assert msg["type"] == TYPE_AUTH_REQUIRED
+
+        await ws.send_json(
+            {
+                "type": TYPE_AUTH,
+                "access_token": hass_access_token,
+                "coalesce_messages": True,
+            }
+        )
+        msg = await ws.receive_json()
+        assert msg["type"] == TYPE_AUTH_OK
+        assert msg["coalesce_messages"] is True
+
+        await ws.send_json({"id": 1, "type": "subscribe_events"})
+        msg = await ws.receive_json()
+        assert msg["success"]
+
+        hass.bus.async_fire("test_event", {"idx": 1})
+        hass.bus.async_fire("test_event", {"idx": 2})
+        hass.bus.async_fire("test_event", {"idx": 3})
+
+        msg = await ws.receive_json()
+        assert [event["event"]["data"]["idx"] for event in msg] == [1, 2, 3]
+
+
+async def test_compression(hass, aiohttp_client, hass_access_token):
+    """Test larger messages are compressed with a shared context."""
+    assert await async_setup_component(
+        hass,
+        "websocket_api",
+        {"websocket_api": {"compression_level": 9, "compression_min_size": 512}},
+    )
+    await hass.async_block_till_done()
+    for idx in range(20):
+        hass.states.async_set(f"light.kitchen_{idx}", "on", {"brightness": 100})
+    client = await aiohttp_client(hass.http.app)
+
+    async with client.ws_connect(http.URL, compress=15) as ws:
+        assert ws.compress == 15
+        await ws.receive_json()
+        await ws.send_json({"type": TYPE_AUTH, "access_token": hass_access_token})
+        await ws.receive_json()
+
+        # Messages below the minimum size are sent uncompressed
+        uncompressed = hass.data[const.DATA_BYTES_UNCOMPRESSED]
+        assert hass.data[const.DATA_BYTES_COMPRESSED] == uncompressed
+
+        await ws.send_json({"id": 1, "type": "get_states"})
+        msg = await ws.receive_json()
+        assert len(msg["result"]) == 20
+
+    sent = hass.data[const.DATA_BYTES_UNCOMPRESSED] - uncompressed
+    assert sent > 512
+    assert hass.data[const.DATA_BYTES_COMPRESSED] < uncompressed + sent / 4
+
+
+async def test_deflate_writer_frames(hass):
+    """Test the frames of the deflate writer are read by the aiohttp reader."""
+    written = []
+    transport = Mock(write=written.append, is_closing=Mock(return_value=False))
+    protocol = Mock(_drain_helper=AsyncMock())
+    writer = http.DeflateWebSocketWriter(
+        hass,
+        protocol,
+        transport,
+        compress=15,
+        notakeover=False,
+        limit=64,
+        compression_level=9,
+        compression_min_size=128,
+    )
+    messages = ["small", "large " * 100, "large again " * 100, "x" * 70000]
+    for message in messages:
+        await writer.send(message)
+    await writer.ping()
+
+    # The transport is drained past the limit
+    assert protocol._drain_helper.await_count == 1
+    # Only the larger frames have the permessage-deflate bit set
+    assert [frame[0] for frame in written] == [0x81, 0xC1, 0xC1, 0xC1, 0x89]
+
+    queue = DataQueue(hass.loop)
+    reader = WebSocketReader(queue, 2 ** 20, compress=True)
+    reader.feed_data(b"".join(written))
+    received = [await queue.read() for _ in range(5)]
+    assert [msg.data for msg in received[:4]] == messages
+    assert received[4].type == WSMsgType.PING
+
+    assert hass.data[const.DATA_BYTES_UNCOMPRESSED] == sum(map(len, messages))
+    assert (
+        hass.data[const.DATA_BYTES_COMPRESSED]
+        < hass.data[const.DATA_BYTES_UNCOMPRESSED] / 10
+    )
+
+
+async def test_compression_disabled(hass, aiohttp_client):
+    """Test compression is not negotiated at level 0."""
+    assert await async_setup_component(
+        hass, "websocket_api", {"websocket_api": {"compression_level": 0}}
+    )
+    await hass.async_block_till_done()
+    client = await aiohttp_client(hass.http.app)
+
+    async with client.ws_connect(http.URL, compress=15) as ws:
+        assert ws.compress == 0
+        msg = await ws.receive_json()
+        assert msg["type"] == TYPE_AUTH_REQUIRED
+
+
+async def test_compression_unsupported_aiohttp(hass, aiohttp_client, hass_access_token):
+    """Test the aiohttp writer is used when its internals are not known."""
+    assert await async_setup_component(
+        hass, "websocket_api", {"websocket_api": {"compression_min_size": 0}}
+    )
+    await hass.async_block_till_done()
+    client = await aiohttp_client(hass.http.app)
+
+    with patch(
+        "homeassistant.components.websocket_api.http.DEFLATE_WRITER_SUPPORTED", False
+    ):
+        async with client.ws_connect(http.URL, compress=15) as ws:
+            assert ws.compress == 15
+            msg = await ws.receive_json()
+            assert msg["type"] == TYPE_AUTH_REQUIRED
+            await ws.send_json({"type": TYPE_AUTH, "access_token": hass_access_token})
+            msg = await ws.receive_json()
+            assert msg["type"] == TYPE_AUTH_OK
+
+    assert const.DATA_BYTES_UNCOMPRESSED not in hass.data
+
+
 async def test_pending_msg_peak(hass, mock_low_peak, hass_ws_client, caplog):
     """Test pending msg overflow command."""
     orig_handler = http.WebSocketHandler
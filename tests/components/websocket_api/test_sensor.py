@@ -2,7 +2,12 @@
 
 from homeassistant.bootstrap import async_setup_component
 from homeassistant.components.websocket_api.auth import TYPE_AUTH_REQUIRED
+from homeassistant.components.websocket_api.const import (
+    DATA_BYTES_COMPRESSED,
+    DATA_BYTES_UNCOMPRESSED,
+)
 from homeassistant.components.websocket_api.http import URL
+from homeassistant.helpers.entity_component import async_update_entity
 
 from .test_auth import test_auth_active_with_token
 
@@ -36,3 +41,12 @@ async def test_websocket_api(hass, aiohttp_client, hass_access_token, legacy_aut
 
     state = hass.states.get("sensor.connected_clients")
     assert state.state == "0"
+
+    await async_update_entity(hass, "sensor.sent_bytes_uncompressed")
+    await async_update_entity(hass, "sensor.sent_bytes_compressed")
+    uncompressed = int(hass.states.get("sensor.sent_bytes_uncompressed").state)
+    compressed = int(hass.states.get("sensor.sent_bytes_compressed").state)
+    assert uncompressed == hass.data[DATA_BYTES_UNCOMPRESSED]
+    assert compressed == hass.data[DATA_BYTES_COMPRESSED]
+    assert uncompressed > 0
+    assert compressed > 0
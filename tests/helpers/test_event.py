@@ -19,6 +19,8 @@ from homeassistant.helpers.event import (
     TrackTemplate,
     TrackTemplateResult,
     async_call_later,
+    async_set_template_render_time_budget,
+    async_state_change_fan_out,
     async_track_point_in_time,
     async_track_point_in_utc_time,
     async_track_same_state,
@@ -34,6 +36,7 @@ from homeassistant.helpers.event import (
     async_track_time_change,
     async_track_time_interval,
     async_track_utc_time_change,
+    async_timer_wheel_info,
     track_point_in_utc_time,
 )
 from homeassistant.helpers.template import Template
@@ -125,6 +128,63 @@ async def test_track_point_in_time_drift_rearm(hass):
     assert len(specific_runs) == 1
 
 
+async def test_track_point_in_time_shares_loop_timer(hass):
+    """Test points in time share one event loop timer."""
+    runs = []
+    now = dt_util.utcnow()
+    first = now + timedelta(seconds=10)
+    second = now + timedelta(seconds=10, milliseconds=500)
+    third = now + timedelta(minutes=5)
+
+    assert async_timer_wheel_info(hass) == {"pending": 0, "next_fire": None}
+
+    with patch.object(hass.loop, "call_later", wraps=hass.loop.call_later) as mock:
+        async_track_point_in_utc_time(hass, callback(lambda x: runs.append(1)), first)
+        async_track_point_in_utc_time(hass, callback(lambda x: runs.append(3)), third)
+        unsub_second = async_track_point_in_utc_time(
+            hass, callback(lambda x: runs.append(2)), second
+        )
+        unsub_second()
+
+    # Later points and cancelling do not touch the loop timer
+    assert len(mock.mock_calls) == 1
+    assert async_timer_wheel_info(hass) == {"pending": 2, "next_fire": first}
+
+    async_fire_time_changed(hass, second)
+    await hass.async_block_till_done()
+    assert runs == [1]
+    assert async_timer_wheel_info(hass) == {"pending": 1, "next_fire": third}
+
+    async_fire_time_changed(hass, third + timedelta(seconds=1))
+    await hass.async_block_till_done()
+    assert runs == [1, 3]
+    assert async_timer_wheel_info(hass) == {"pending": 0, "next_fire": None}
+
+
+async def test_track_point_in_time_cancelled_by_earlier_action(hass):
+    """Test a point in time cancelled by an action due at the same time."""
+    runs = []
+    now = dt_util.utcnow()
+    point_in_time = now + timedelta(seconds=5)
+
+    @callback
+    def cancel_other(_):
+        runs.append("first")
+        unsub()
+
+    async_track_point_in_utc_time(hass, cancel_other, point_in_time)
+    unsub = async_track_point_in_utc_time(
+        hass,
+        callback(lambda x: runs.append("second")),
+        point_in_time + timedelta(milliseconds=1),
+    )
+
+    async_fire_time_changed(hass, point_in_time + timedelta(seconds=1))
+    await hass.async_block_till_done()
+    assert runs == ["first"]
+    assert async_timer_wheel_info(hass)["pending"] == 0
+
+
 async def test_track_state_change_from_to_state_match(hass):
     """Test track_state_change with from and to state matchers."""
     from_and_to_state_runs = []
@@ -897,7 +957,10 @@ async def test_track_template_error_can_recover(hass, caplog):
     await hass.async_block_till_done()
     assert not error_calls
 
-    hass.states.async_remove("switch.data_system")
+    # The template is rendered once a referenced entity changes
+    hass.states.async_set("sensor.data_system", "cow", {"opmode": 0})
+    hass.states.async_remove("sensor.data_system")
+    await hass.async_block_till_done()
 
     assert "UndefinedError" in caplog.text
 
@@ -1307,51 +1370,163 @@ async def test_track_template_result_and_conditional(hass):
         hass, [TrackTemplate(template, None)], specific_run_callback
     )
     await hass.async_block_till_done()
-    assert info.listeners == {
+    # Both entities are referenced literally, the branches do not matter
+    listeners = {
         "all": False,
         "domains": set(),
-        "entities": {"light.a"},
+        "entities": {"light.a", "light.b"},
         "time": False,
     }
+    assert info.listeners == listeners
 
     hass.states.async_set("light.b", "on")
     await hass.async_block_till_done()
-    assert len(specific_runs) == 0
+    assert specific_runs == ["off"]
 
     hass.states.async_set("light.a", "on")
     await hass.async_block_till_done()
-    assert len(specific_runs) == 1
-    assert specific_runs[0] == "on"
-    assert info.listeners == {
-        "all": False,
-        "domains": set(),
-        "entities": {"light.a", "light.b"},
-        "time": False,
-    }
+    assert len(specific_runs) == 2
+    assert specific_runs[1] == "on"
+    assert info.listeners == listeners
 
     hass.states.async_set("light.b", "off")
     await hass.async_block_till_done()
-    assert len(specific_runs) == 2
-    assert specific_runs[1] == "off"
+    assert len(specific_runs) == 3
+    assert specific_runs[2] == "off"
+    assert info.listeners == listeners
+
+    hass.states.async_set("light.a", "off")
+    await hass.async_block_till_done()
+    assert len(specific_runs) == 3
+
+    hass.states.async_set("light.b", "on")
+    await hass.async_block_till_done()
+    assert len(specific_runs) == 3
+
+    hass.states.async_set("light.a", "on")
+    await hass.async_block_till_done()
+    assert len(specific_runs) == 4
+    assert specific_runs[3] == "on"
+
+
+async def test_track_template_result_static_references(hass):
+    """Test a template referencing literal entity ids is not rendered at setup."""
+    hass.states.async_set("light.a", "off")
+    template = Template(
+        "{{ is_state('light.a', 'on') or state_attr('sensor.b', 'value') }}", hass
+    )
+    runs = []
+
+    with patch.object(
+        Template, "async_render_to_info", wraps=template.async_render_to_info
+    ) as render_to_info:
+        info = async_track_template_result(
+            hass,
+            [TrackTemplate(template, None)],
+            lambda event, updates: runs.append(updates.pop().result),
+        )
+        await hass.async_block_till_done()
+        assert not render_to_info.called
+
     assert info.listeners == {
         "all": False,
         "domains": set(),
-        "entities": {"light.a", "light.b"},
+        "entities": {"light.a", "sensor.b"},
         "time": False,
     }
 
-    hass.states.async_set("light.a", "off")
+    hass.states.async_set("sensor.b", "on", {"value": 5})
     await hass.async_block_till_done()
-    assert len(specific_runs) == 2
+    assert runs == [5]
 
-    hass.states.async_set("light.b", "on")
+    template = Template("{{ states.light | count }}", hass)
+    assert template.async_static_render_info() is None
+
+
+async def test_track_template_result_renders_once_per_iteration(hass):
+    """Test state changes in one loop iteration render a template once."""
+    template = Template("{{ states('sensor.power') }}", hass)
+    runs = []
+
+    async_track_template_result(
+        hass,
+        [TrackTemplate(template, None)],
+        lambda event, updates: runs.append((event, updates.pop().result)),
+    )
+
+    with patch.object(
+        Template, "async_render_to_info", wraps=template.async_render_to_info
+    ) as render_to_info:
+        for value in range(5):
+            hass.states.async_set("sensor.power", value)
+        await hass.async_block_till_done()
+
+    assert render_to_info.call_count == 1
+    assert len(runs) == 1
+    event, result = runs[0]
+    assert event.data["new_state"].state == "4"
+    assert result == 4
+
+
+async def test_track_template_result_render_time_budget(hass):
+    """Test templates over the time budget are rendered in the next iteration."""
+    async_set_template_render_time_budget(hass, 0)
+    runs = []
+
+    @ha.callback
+    def first_run_callback(event, updates):
+        runs.append("first")
+        hass.loop.call_soon(runs.append, "loop")
+
+    @ha.callback
+    def second_run_callback(event, updates):
+        runs.append("second")
+
+    for run_callback in (first_run_callback, second_run_callback):
+        async_track_template_result(
+            hass,
+            [TrackTemplate(Template("{{ states('sensor.power') }}", hass), None)],
+            run_callback,
+        )
+
+    hass.states.async_set("sensor.power", "5")
     await hass.async_block_till_done()
-    assert len(specific_runs) == 2
+    assert runs == ["first", "loop", "second"]
 
-    hass.states.async_set("light.a", "on")
+
+async def test_track_template_result_listener_raises(hass, caplog):
+    """Test a raising listener does not stop other templates from rendering."""
+    runs = []
+
+    @ha.callback
+    def raising_callback(event, updates):
+        raise ValueError("boom")
+
+    @ha.callback
+    def run_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    async_track_template_result(
+        hass,
+        [TrackTemplate(Template("{{ states('sensor.a') }}", hass), None)],
+        raising_callback,
+    )
+    async_track_template_result(
+        hass,
+        [TrackTemplate(Template("{{ states('sensor.b') }}", hass), None)],
+        run_callback,
+    )
+
+    hass.states.async_set("sensor.a", "on")
+    hass.states.async_set("sensor.b", "on")
     await hass.async_block_till_done()
-    assert len(specific_runs) == 3
-    assert specific_runs[2] == "on"
+    assert runs == ["on"]
+    assert "Error while rendering templates" in caplog.text
+
+    hass.states.async_set("sensor.a", "off")
+    hass.states.async_set("sensor.b", "off")
+    await hass.async_block_till_done()
+    assert runs == ["on", "off"]
 
 
 async def test_track_template_result_iterator(hass):
@@ -3049,6 +3224,36 @@ async def test_async_call_later(hass):
     assert remove is mock()
 
 
+async def test_track_state_change_event_fan_out(hass):
+    """Test the number of state change listeners per entity."""
+    calls = []
+
+    @callback
+    def remove_other(event):
+        calls.append("first")
+        unsub_other()
+
+    assert async_state_change_fan_out(hass) == {}
+
+    unsub_first = async_track_state_change_event(
+        hass, ["light.bowl", "light.kitchen"], remove_other
+    )
+    unsub_other = async_track_state_change_event(
+        hass, "light.kitchen", callback(lambda event: calls.append("other"))
+    )
+    assert async_state_change_fan_out(hass) == {"light.kitchen": 2, "light.bowl": 1}
+    assert list(async_state_change_fan_out(hass)) == ["light.kitchen", "light.bowl"]
+
+    # A listener removed while an event is dispatched is still called for it
+    hass.states.async_set("light.kitchen", "on")
+    await hass.async_block_till_done()
+    assert calls == ["first", "other"]
+    assert async_state_change_fan_out(hass) == {"light.kitchen": 1, "light.bowl": 1}
+
+    unsub_first()
+    assert async_state_change_fan_out(hass) == {}
+
+
 async def test_track_state_change_event_chain_multple_entity(hass):
     """Test that adding a new state tracker inside a tracker does not fire right away."""
     tracker_called = []
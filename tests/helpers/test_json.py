@@ -1,11 +1,27 @@
 """Test Home Assistant remote methods and classes."""
+import json
+from types import MappingProxyType
+from unittest.mock import patch
+
 import pytest
 
 from homeassistant import core
-from homeassistant.helpers.json import JSONEncoder
+from homeassistant.helpers import json as json_helper
+from homeassistant.helpers.json import JSONEncoder, json_bytes, json_dumps
 from homeassistant.util import dt as dt_util
 
 
+@pytest.fixture(params=["stdlib", "orjson"])
+def encoder(request):
+    """Serialize with the standard library or with the fast encoder."""
+    fast_encode = None
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        fast_encode = json_helper._orjson_encoder()
+    with patch("homeassistant.helpers.json._FAST_ENCODE", fast_encode):
+        yield request.param
+
+
 def test_json_encoder(hass):
     """Test the JSON Encoder."""
     ha_json_enc = JSONEncoder()
@@ -19,3 +35,48 @@ def test_json_encoder(hass):
 
     now = dt_util.utcnow()
     assert ha_json_enc.default(now) == now.isoformat()
+
+
+def test_json_dumps(encoder):
+    """Test serializing Home Assistant objects."""
+    now = dt_util.utcnow()
+    state = core.State("test.test", "hello", {"changed": now})
+    event = core.Event("test_event", {"state": state})
+    data = {
+        "state": state,
+        "event": event,
+        "time": now,
+        "set": {"a"},
+        "frozenset": frozenset(["b"]),
+        "proxy": MappingProxyType({"c": 1}),
+    }
+
+    assert json.loads(json_dumps(data)) == {
+        "state": json.loads(json.dumps(state, cls=JSONEncoder)),
+        "event": json.loads(json.dumps(event, cls=JSONEncoder)),
+        "time": now.isoformat(),
+        "set": ["a"],
+        "frozenset": ["b"],
+        "proxy": {"c": 1},
+    }
+    assert json_bytes(data) == json_dumps(data).encode("utf-8")
+
+    with pytest.raises(TypeError):
+        json_dumps({"bad": object()})
+
+    for value in (float("nan"), float("inf"), float("-inf")):
+        with pytest.raises(ValueError):
+            json_dumps({"bad": [value]})
+        with pytest.raises(ValueError):
+            json_bytes({"bad": [value]})
+
+
+def test_json_bytes_fast_encoder(encoder):
+    """Test the fast encoder is used and falls back to the standard library."""
+    compact = encoder == "orjson"
+    assert json_bytes({"a": [1]}) == (b'{"a":[1]}' if compact else b'{"a": [1]}')
+    # None is not mistaken for a non-finite float
+    assert json.loads(json_bytes({"a": None, "b": 1.5})) == {"a": None, "b": 1.5}
+    # Integers orjson can not serialize are left to the standard library
+    assert json.loads(json_bytes({"a": 2 ** 70})) == {"a": 2 ** 70}
+    assert json_dumps({1: "a"}) == ('{"1":"a"}' if compact else '{"1": "a"}')
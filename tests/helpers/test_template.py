@@ -1,8 +1,11 @@
 """Test Home Assistant template helper methods."""
+import asyncio
+from collections import OrderedDict
 from datetime import datetime
 import math
 import random
-from unittest.mock import patch
+import threading
+from unittest.mock import Mock, patch
 
 import pytest
 import pytz
@@ -19,11 +22,13 @@ from homeassistant.const import (
     VOLUME_LITERS,
 )
 from homeassistant.exceptions import TemplateError
-from homeassistant.helpers import template
+from homeassistant.helpers import device_registry as dr, template
 from homeassistant.setup import async_setup_component
 import homeassistant.util.dt as dt_util
 from homeassistant.util.unit_system import UnitSystem
 
+from tests.common import MockConfigEntry, mock_device_registry, mock_registry
+
 
 def _set_up_units(hass):
     """Set up the tests."""
@@ -2055,8 +2060,8 @@ def test_urlencode(hass):
     assert tpl.async_render() == "the%20quick%20brown%20fox%20%3D%20true"
 
 
-async def test_cache_garbage_collection():
-    """Test caching a template."""
+async def test_cache_kept_after_garbage_collection():
+    """Test the compiled template is kept after the templates are collected."""
     template_string = (
         "{% set dict = {'foo': 'x&y', 'bar': 42} %} {{ dict | urlencode }}"
     )
@@ -2072,20 +2077,65 @@ async def test_cache_garbage_collection():
         (template_string),
     )
     tpl2.ensure_valid()
-    assert template._NO_HASS_ENV.template_cache.get(
-        template_string
-    )  # pylint: disable=protected-access
+    assert tpl2._compiled_code is tpl._compiled_code
 
     del tpl
-    assert template._NO_HASS_ENV.template_cache.get(
-        template_string
-    )  # pylint: disable=protected-access
     del tpl2
-    assert not template._NO_HASS_ENV.template_cache.get(
+    assert template._NO_HASS_ENV.template_cache.get(
         template_string
     )  # pylint: disable=protected-access
 
 
+async def test_cache_least_recently_used(hass):
+    """Test the least recently used compiled template is dropped."""
+    with patch.object(template, "COMPILED_TEMPLATE_CACHE_SIZE", 2):
+        for template_string in ("{{ 1 }}", "{{ 2 }}", "{{ 1 }}", "{{ 3 }}"):
+            template.Template(template_string, hass).ensure_valid()
+
+        assert template.async_cache_info(hass) == {
+            "hits": 1,
+            "misses": 3,
+            "size": 2,
+            "max_size": 2,
+        }
+
+    template_cache = hass.data[template._ENVIRONMENT].template_cache
+    assert list(template_cache) == ["{{ 1 }}", "{{ 3 }}"]
+
+
+async def test_cache_compiled_from_threads(hass):
+    """Test a template evicted by another thread while it is looked up."""
+    env = template.TemplateEnvironment(hass)
+    env.compile("{{ 1 }}")
+    evicted = threading.Event()
+    looked_up = threading.Event()
+
+    class SlowCache(OrderedDict):
+        """Cache that lets another thread run after looking up a template."""
+
+        def get(self, key, default=None):
+            value = super().get(key, default)
+            if key == "{{ 1 }}":
+                looked_up.set()
+                evicted.wait(0.5)
+            return value
+
+    env.template_cache = SlowCache(env.template_cache)
+
+    def evict():
+        looked_up.wait()
+        env.compile("{{ 2 }}")
+        evicted.set()
+
+    with patch.object(template, "COMPILED_TEMPLATE_CACHE_SIZE", 1):
+        await asyncio.gather(
+            hass.async_add_executor_job(env.compile, "{{ 1 }}"),
+            hass.async_add_executor_job(evict),
+        )
+
+    assert list(env.template_cache) == ["{{ 2 }}"]
+
+
 def test_is_template_string():
     """Test is template string."""
     assert template.is_template_string("{{ x }}") is True
@@ -2434,3 +2484,127 @@ async def test_parse_result(hass):
         ("0011101.00100001010001", "0011101.00100001010001"),
     ):
         assert template.Template(tpl, hass).async_render() == result
+
+
+async def test_aggregate(hass):
+    """Test the aggregate function over the states of a domain."""
+    hass.states.async_set("sensor.power_1", "10", {"device_class": "power"})
+    hass.states.async_set("sensor.power_2", "5.5", {"device_class": "power"})
+    hass.states.async_set("sensor.power_3", "unavailable", {"device_class": "power"})
+    hass.states.async_set("sensor.temperature", "21", {"device_class": "temperature"})
+    hass.states.async_set("light.kitchen", "on", {"brightness": 100})
+    hass.states.async_set("light.hallway", "on", {"brightness": 50})
+
+    info = render_to_info(hass, "{{ aggregate('sum', 'sensor', 'power') }}")
+    assert_result_info(info, 15.5, [], ["sensor"])
+    assert info.rate_limit == template.DOMAIN_STATES_RATE_LIMIT
+
+    info = render_to_info(hass, "{{ aggregate('max', 'sensor') }}")
+    assert_result_info(info, 21.0, [], ["sensor"])
+
+    info = render_to_info(hass, "{{ aggregate('count', 'sensor', 'power') }}")
+    assert_result_info(info, 3, [], ["sensor"])
+
+    info = render_to_info(
+        hass, "{{ aggregate('mean', 'light', attribute='brightness') }}"
+    )
+    assert_result_info(info, 75.0, [], ["light"])
+
+    info = render_to_info(hass, "{{ aggregate('min', 'light') }}")
+    assert_result_info(info, None, [], ["light"])
+
+    info = render_to_info(hass, "{{ aggregate('count') }}")
+    assert_result_info(info, 6, [], [], True)
+    assert info.rate_limit == template.ALL_STATES_RATE_LIMIT
+
+    with pytest.raises(TemplateError):
+        template.Template("{{ aggregate('median', 'sensor') }}", hass).async_render()
+
+
+async def test_aggregate_filter(hass):
+    """Test the aggregate filter over states and entities."""
+    hass.states.async_set("sensor.power_1", "10", {"device_class": "power"})
+    hass.states.async_set("sensor.power_2", "5.5", {"device_class": "power"})
+    hass.states.async_set("sensor.temperature", "21", {"device_class": "temperature"})
+
+    info = render_to_info(
+        hass, "{{ states.sensor | aggregate('sum', device_class='power') }}"
+    )
+    assert_result_info(info, 15.5, [], ["sensor"])
+
+    info = render_to_info(
+        hass,
+        "{{ ['sensor.power_1', 'sensor.temperature', 'sensor.missing']"
+        " | aggregate('mean') }}",
+    )
+    assert_result_info(
+        info, 15.5, ["sensor.power_1", "sensor.temperature", "sensor.missing"]
+    )
+
+    info = render_to_info(
+        hass, "{{ expand('sensor.power_1', 'sensor.power_2') | aggregate('min') }}"
+    )
+    assert_result_info(info, 5.5, ["sensor.power_1", "sensor.power_2"])
+
+
+async def test_aggregate_area(hass):
+    """Test the aggregate function limited to the entities of an area."""
+    config_entry = MockConfigEntry(domain="light")
+    config_entry.add_to_hass(hass)
+    device_registry = mock_device_registry(hass)
+    entity_registry = mock_registry(hass)
+    device_entry = device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        connections={(dr.CONNECTION_NETWORK_MAC, "12:34:56:AB:CD:EF")},
+    )
+    device_registry.async_update_device(device_entry.id, area_id="kitchen")
+    entity_registry.async_get_or_create("light", "hue", "1", device_id=device_entry.id)
+    moved = entity_registry.async_get_or_create(
+        "light", "hue", "2", device_id=device_entry.id
+    )
+    entity_registry.async_update_entity(moved.entity_id, area_id="hallway")
+    entity_registry.async_get_or_create("light", "hue", "3")
+
+    hass.states.async_set("light.hue_1", "on")
+    hass.states.async_set("light.hue_2", "on")
+    hass.states.async_set("light.hue_3", "on")
+
+    assert (
+        template.Template(
+            "{{ aggregate('count', 'light', area='kitchen') }}", hass
+        ).async_render()
+        == 1
+    )
+    assert (
+        template.Template(
+            "{{ states.light | aggregate('count', area='hallway') }}", hass
+        ).async_render()
+        == 1
+    )
+    assert (
+        template.Template(
+            "{{ aggregate('count', 'light', area='garage') }}", hass
+        ).async_render()
+        == 0
+    )
+
+
+async def test_aggregate_area_cached(hass):
+    """Test the entities of an area are cached until the registries change."""
+    entity_registry = mock_registry(hass)
+    mock_device_registry(hass)
+    entry = entity_registry.async_get_or_create("light", "hue", "1")
+    entity_registry.async_update_entity(entry.entity_id, area_id="kitchen")
+    hass.states.async_set("light.hue_1", "on")
+    await hass.async_block_till_done()
+    tpl = template.Template("{{ aggregate('count', 'light', area='kitchen') }}", hass)
+
+    assert tpl.async_render() == 1
+    with patch.object(
+        entity_registry, "entities", Mock(values=Mock(side_effect=AssertionError))
+    ):
+        assert tpl.async_render() == 1
+
+    entity_registry.async_update_entity(entry.entity_id, area_id="hallway")
+    await hass.async_block_till_done()
+    assert tpl.async_render() == 0
@@ -458,6 +458,43 @@ async def test_eventbus_callback_event_listener(hass):
     assert len(callback_calls) == 1
 
 
+async def test_eventbus_callback_event_listeners_batched(hass):
+    """Test callback event listeners run in order when one of them fails."""
+    calls = []
+
+    @ha.callback
+    def first_listener(event):
+        calls.append("first")
+
+    @ha.callback
+    def failing_listener(event):
+        raise ValueError("Failed")
+
+    @ha.callback
+    def match_all_listener(event):
+        calls.append(event.event_type)
+
+    hass.bus.async_listen("test_callback", first_listener)
+    unsub = hass.bus.async_listen("test_callback", failing_listener)
+    with patch.object(hass.loop, "call_exception_handler") as exception_handler:
+        hass.bus.async_fire("test_callback")
+        await hass.async_block_till_done()
+    assert calls == ["first"]
+    assert isinstance(exception_handler.call_args[0][0]["exception"], ValueError)
+    unsub()
+
+    # Listeners added after an event was fired are called as well
+    unsub = hass.bus.async_listen(MATCH_ALL, match_all_listener)
+    hass.bus.async_fire("test_callback")
+    await hass.async_block_till_done()
+    assert calls == ["first", "test_callback", "first"]
+
+    unsub()
+    hass.bus.async_fire("test_callback")
+    await hass.async_block_till_done()
+    assert calls == ["first", "test_callback", "first", "first"]
+
+
 async def test_eventbus_coroutine_event_listener(hass):
     """Test coroutine event listener."""
     coroutine_calls = []
@@ -574,6 +611,32 @@ async def test_statemachine_entity_ids(hass):
     assert states == ["light.bowl", "switch.ac"]
 
 
+async def test_statemachine_domain_filter(hass):
+    """Test domain filtered lookups follow added and removed states."""
+    hass.states.async_set("light.bowl", "on")
+    hass.states.async_set("switch.ac", "off")
+    hass.states.async_set("light.kitchen", "off")
+
+    assert hass.states.async_entity_ids("LIGHT") == ["light.bowl", "light.kitchen"]
+    assert hass.states.async_entity_ids_count("light") == 2
+    assert sorted(hass.states.async_entity_ids(["light", "switch", "light"])) == [
+        "light.bowl",
+        "light.kitchen",
+        "switch.ac",
+    ]
+    assert hass.states.async_entity_ids_count(("light", "switch")) == 3
+    assert [state.state for state in hass.states.async_all("light")] == ["on", "off"]
+
+    hass.states.async_set("light.bowl", "off")
+    assert [state.state for state in hass.states.async_all("light")] == ["off", "off"]
+
+    hass.states.async_remove("switch.ac")
+    assert hass.states.async_entity_ids("switch") == []
+    assert hass.states.async_entity_ids_count("switch") == 0
+    assert hass.states.async_all("switch") == []
+    assert hass.states.async_all("sensor") == []
+
+
 async def test_statemachine_remove(hass):
     """Test remove method."""
     hass.states.async_set("light.bowl", "on", {})
@@ -637,6 +700,29 @@ async def test_statemachine_force_update(hass):
     assert len(events) == 1
 
 
+async def test_statemachine_reuses_unchanged_parts(hass):
+    """Test the next state shares the entity id and unchanged attributes."""
+    hass.states.async_set("light.Bowl", "on", {"brightness": 100})
+    state = hass.states.get("light.bowl")
+
+    hass.states.async_set("light.Bowl", "off", {"brightness": 100})
+    state2 = hass.states.get("light.bowl")
+    assert state2.state == "off"
+    assert state2.entity_id is state.entity_id
+    assert state2.domain is state.domain
+    assert state2.object_id is state.object_id
+    assert state2.attributes is state.attributes
+    assert state2.last_changed == state2.last_updated
+
+    hass.states.async_set("light.Bowl", "off", {"brightness": 50})
+    state3 = hass.states.get("light.bowl")
+    assert state3.attributes == {"brightness": 50}
+    assert state3.last_changed == state2.last_changed
+
+    with pytest.raises(InvalidStateError):
+        hass.states.async_set("light.Bowl", "o" * 256)
+
+
 def test_service_call_repr():
     """Test ServiceCall repr."""
     call = ha.ServiceCall("homeassistant", "start")
@@ -953,32 +1039,31 @@ async def test_bad_timezone_raises_value_error(hass):
         await hass.config.async_update(time_zone="not_a_timezone")
 
 
+def _mock_timer_hass(listen_bus=True):
+    """Return a mock hass with a real timer."""
+    hass = MagicMock()
+    hass.bus._listeners = {EVENT_TIME_CHANGED: [MagicMock()]} if listen_bus else {}
+    hass.timer = ha.Timer(hass)
+    return hass
+
+
 @patch("homeassistant.core.monotonic")
 def test_create_timer(mock_monotonic, loop):
     """Test create timer."""
-    hass = MagicMock()
-    funcs = []
-    orig_callback = ha.callback
-
-    def mock_callback(func):
-        funcs.append(func)
-        return orig_callback(func)
+    hass = _mock_timer_hass()
 
     mock_monotonic.side_effect = 10.2, 10.8, 11.3
 
-    with patch.object(ha, "callback", mock_callback), patch(
+    with patch(
         "homeassistant.core.dt_util.utcnow",
         return_value=datetime(2018, 12, 31, 3, 4, 5, 333333),
     ):
         ha._async_create_timer(hass)
 
-    assert len(funcs) == 2
-    fire_time_event, stop_timer = funcs
-
     assert len(hass.loop.call_later.mock_calls) == 1
     delay, callback, target = hass.loop.call_later.mock_calls[0][1]
     assert abs(delay - 0.666667) < 0.001
-    assert callback is fire_time_event
+    assert callback == hass.timer._async_tick
     assert abs(target - 10.866667) < 0.001
 
     with patch(
@@ -991,34 +1076,30 @@ def test_create_timer(mock_monotonic, loop):
     assert len(hass.bus.async_fire.mock_calls) == 1
     assert len(hass.loop.call_later.mock_calls) == 2
 
-    event_type, callback = hass.bus.async_listen_once.mock_calls[0][1]
+    event_type, stop_timer = hass.bus.async_listen_once.mock_calls[0][1]
     assert event_type == EVENT_HOMEASSISTANT_STOP
-    assert callback is stop_timer
 
     delay, callback, target = hass.loop.call_later.mock_calls[1][1]
     assert abs(delay - 0.9) < 0.001
-    assert callback is fire_time_event
+    assert callback == hass.timer._async_tick
     assert abs(target - 12.2) < 0.001
 
     event_type, event_data = hass.bus.async_fire.mock_calls[0][1]
     assert event_type == EVENT_TIME_CHANGED
     assert event_data[ATTR_NOW] == datetime(2018, 12, 31, 3, 4, 6, 100000)
 
+    stop_timer(None)
+    assert len(hass.loop.call_later.return_value.cancel.mock_calls) == 1
+
 
 @patch("homeassistant.core.monotonic")
 def test_timer_out_of_sync(mock_monotonic, loop):
     """Test create timer."""
-    hass = MagicMock()
-    funcs = []
-    orig_callback = ha.callback
-
-    def mock_callback(func):
-        funcs.append(func)
-        return orig_callback(func)
+    hass = _mock_timer_hass()
 
     mock_monotonic.side_effect = 10.2, 13.3, 13.4
 
-    with patch.object(ha, "callback", mock_callback), patch(
+    with patch(
         "homeassistant.core.dt_util.utcnow",
         return_value=datetime(2018, 12, 31, 3, 4, 5, 333333),
     ):
@@ -1047,17 +1128,65 @@ def test_timer_out_of_sync(mock_monotonic, loop):
 
         assert event_context_0 == event_context_1
 
-        assert len(funcs) == 2
-        fire_time_event, _ = funcs
-
     assert len(hass.loop.call_later.mock_calls) == 2
 
     delay, callback, target = hass.loop.call_later.mock_calls[1][1]
     assert abs(delay - 0.8) < 0.001
-    assert callback is fire_time_event
+    assert callback == hass.timer._async_tick
     assert abs(target - 14.2) < 0.001
 
 
+@patch("homeassistant.core.monotonic")
+def test_timer_listeners(mock_monotonic, loop):
+    """Test the timer calls its listeners in one tick and only ticks for them."""
+    hass = _mock_timer_hass(listen_bus=False)
+    mock_monotonic.return_value = 10.0
+    now = datetime(2018, 12, 31, 3, 4, 5, 500000)
+    calls = []
+
+    with patch("homeassistant.core.dt_util.utcnow", return_value=now):
+        ha._async_create_timer(hass)
+
+        # Suspended while nothing listens
+        assert len(hass.loop.call_later.mock_calls) == 0
+
+        unsub_1 = hass.timer.async_listen(lambda now: calls.append((1, now)))
+        unsub_2 = hass.timer.async_listen(lambda now: calls.append((2, now)))
+        assert len(hass.loop.call_later.mock_calls) == 1
+
+        _, callback, target = hass.loop.call_later.mock_calls[0][1]
+        callback(target)
+
+    assert calls == [(1, now), (2, now)]
+    # Nothing listens on the bus
+    assert len(hass.bus.async_fire.mock_calls) == 0
+    assert len(hass.loop.call_later.mock_calls) == 2
+
+    unsub_1()
+    unsub_2()
+
+    with patch("homeassistant.core.dt_util.utcnow", return_value=now):
+        _, callback, target = hass.loop.call_later.mock_calls[1][1]
+        callback(target)
+
+    assert len(calls) == 2
+    # The tick is suspended again
+    assert len(hass.loop.call_later.mock_calls) == 2
+
+
+async def test_timer_resumes_for_bus_listeners(hass):
+    """Test the timer resumes when EVENT_TIME_CHANGED is listened to."""
+    hass.timer.async_start()
+    assert hass.timer._handle is None
+
+    unsub = hass.bus.async_listen(EVENT_TIME_CHANGED, lambda event: None)
+    assert hass.timer._handle is not None
+
+    unsub()
+    hass.timer.async_stop()
+    assert hass.timer._handle is None
+
+
 async def test_hass_start_starts_the_timer(loop):
     """Test when hass starts, it starts the timer."""
     hass = ha.HomeAssistant()